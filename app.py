@@ -3,228 +3,531 @@ OCR Service Backend - Chuyên xử lý OCR tiếng Việt
 Sử dụng PaddleOCR - thư viện OCR tốt nhất cho tiếng Việt
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 import os
 import io
+import copy
 import base64
 import time
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-import fitz  # PyMuPDF
 from PIL import Image
 import numpy as np
-import cv2
 import re  # Để check HTML tags
-import requests  # Để gọi Text Correction API
+import unicodedata
+import logging
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Import OCR
-from paddleocr import PaddleOCR
+# Structured logging (JSON lines, level từ LOG_LEVEL) - cấu hình trước mọi log khác
+from ocr_logging import configure_logging, get_logger, new_request_id, request_id_var
+configure_logging()
+log = get_logger('app')
+
+# Import engine registry (PaddleOCR tạo lazy - import app không load model)
+from engine_registry import EngineRegistry
+
+# Import file type helpers (extension + magic bytes, không cần engine)
+from file_types import ALLOWED_EXTENSIONS, allowed_file, is_pdf_file, is_image_file
 
 # Import Text/HTML utility functions
 from text_html_utils import extract_text_from_html, text_to_html_paragraphs, text_to_html_paragraphs_with_alignment
 
+# Import image conversion utilities (pixmap/PIL -> numpy BGR)
+from image_utils import pixmap_to_bgr, to_bgr_array, bgr_to_pil
+
+# Import result cache (memory LRU + disk)
+from result_cache import ResultCache, make_cache_key
+
+# Import job queue (async OCR jobs)
+from job_queue import JobManager, JobQueueFull, JOB_DONE, JOB_FAILED
+
+# Import recognition batcher (dynamic batching)
+from recognition_batcher import RecognitionBatcher
+
+# Import correction client (pooled session + concurrent correction)
+from correction_client import CorrectionClient, CorrectionSkipped
+
+# Import circuit breaker (bảo vệ khi Text Correction API down)
+from circuit_breaker import CircuitBreaker
+
+# Import correction memo (cache sửa chính tả theo dòng)
+from correction_memo import CorrectionMemo
+
+# Import page pipeline (worker pool OCR)
+from page_pipeline import CompletedPage, OCRWorkerPool, default_start_method, prefetch, resolve_worker_count
+
+# Import metrics (thời gian từng stage, /metrics dạng Prometheus)
+from ocr_metrics import REGISTRY, BusyTracker, collect_stage_timings, record_stage, timed_stage
+
+# Import profiling (profile một request /extract-text, opt-in)
+from ocr_profiling import PROFILE_MODES, profile_call
+
 # Text Correction API endpoint (load from .env, default to localhost:5001)
 TEXT_CORRECTION_API_URL = os.getenv('TEXT_CORRECTION_API_URL', 'http://localhost:5001/correct')
 TEXT_CORRECTION_AVAILABLE = True  # Luôn available vì dùng API
 
-def correct_vietnamese_text(text, use_correction=True, use_gpu=False, max_retries=2):
-    """
-    Gọi API Text Correction để chỉnh sửa chính tả tiếng Việt
-    API endpoint: http://localhost:5001/correct
-    GỌI MỘT LẦN cho toàn bộ text (không chia nhỏ) - NHANH và CHUẨN
-    GPT-4o-mini sẽ tự động giữ nguyên format xuống dòng và spacing
-    Có retry logic để đảm bảo luôn xử lý được
+# Client Text Correction: connection pool keep-alive + gửi song song (giới hạn số request đang bay)
+TEXT_CORRECTION_TIMEOUT = float(os.getenv('TEXT_CORRECTION_TIMEOUT', '120'))
+TEXT_CORRECTION_MAX_IN_FLIGHT = int(os.getenv('TEXT_CORRECTION_MAX_IN_FLIGHT', '4'))
+# Circuit breaker: lỗi liên tiếp >= threshold -> bỏ qua correction trong RESET giây rồi mới thử lại
+# Retry dùng exponential backoff có jitter (BACKOFF_BASE * 2^n, tối đa BACKOFF_MAX giây)
+TEXT_CORRECTION_BREAKER_THRESHOLD = int(os.getenv('TEXT_CORRECTION_BREAKER_THRESHOLD', '5'))
+TEXT_CORRECTION_BREAKER_RESET = float(os.getenv('TEXT_CORRECTION_BREAKER_RESET', '30'))
+TEXT_CORRECTION_BACKOFF_BASE = float(os.getenv('TEXT_CORRECTION_BACKOFF_BASE', '0.5'))
+TEXT_CORRECTION_BACKOFF_MAX = float(os.getenv('TEXT_CORRECTION_BACKOFF_MAX', '8'))
+correction_breaker = CircuitBreaker(
+    failure_threshold=TEXT_CORRECTION_BREAKER_THRESHOLD,
+    recovery_timeout=TEXT_CORRECTION_BREAKER_RESET,
+    name='text_correction'
+)
+# Memo sửa chính tả theo dòng: dòng lặp lại (quốc hiệu, tiêu ngữ, footer...) không gửi lại API (0 = tắt)
+# CORRECTION_MEMO_DB: file SQLite để giữ memo qua restart (để trống = chỉ memory)
+CORRECTION_MEMO_MAX_ENTRIES = int(os.getenv('CORRECTION_MEMO_MAX_ENTRIES', '10000'))
+CORRECTION_MEMO_DB = os.getenv('CORRECTION_MEMO_DB', '').strip() or None
+correction_memo = None
+if CORRECTION_MEMO_MAX_ENTRIES > 0:
+    if CORRECTION_MEMO_DB and os.path.dirname(CORRECTION_MEMO_DB):
+        os.makedirs(os.path.dirname(CORRECTION_MEMO_DB), exist_ok=True)
+    correction_memo = CorrectionMemo(
+        max_entries=CORRECTION_MEMO_MAX_ENTRIES,
+        db_path=CORRECTION_MEMO_DB,
+        namespace=TEXT_CORRECTION_API_URL
+    )
+correction_client = CorrectionClient(
+    TEXT_CORRECTION_API_URL,
+    timeout=TEXT_CORRECTION_TIMEOUT,
+    max_in_flight=TEXT_CORRECTION_MAX_IN_FLIGHT,
+    breaker=correction_breaker,
+    backoff_base=TEXT_CORRECTION_BACKOFF_BASE,
+    backoff_max=TEXT_CORRECTION_BACKOFF_MAX,
+    memo=correction_memo
+)
+
+# Chỉ sửa chính tả dòng PaddleOCR chưa chắc chắn: confidence < threshold (0-1) hoặc có ký tự/pattern
+# không giống tiếng Việt. Dòng confidence cao giữ nguyên. GATING=false -> gửi cả trang như trước
+CORRECTION_CONFIDENCE_GATING = os.getenv('CORRECTION_CONFIDENCE_GATING', 'true').lower() == 'true'
+CORRECTION_CONFIDENCE_THRESHOLD = float(os.getenv('CORRECTION_CONFIDENCE_THRESHOLD', '0.9'))
+
+_VIETNAMESE_LETTERS = 'àáảãạăằắẳẵặâầấẩẫậèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵđ'
+# Ký tự ngoài bảng chữ tiếng Việt / số / dấu câu thông dụng (vd ñ, ü, ø, ký tự lạ do OCR nhận nhầm)
+_NON_VIETNAMESE_CHAR_RE = re.compile(
+    r"[^\sA-Za-z0-9" + _VIETNAMESE_LETTERS + _VIETNAMESE_LETTERS.upper() +
+    r".,;:!?()\[\]{}\"'“”‘’«»/\\\-–—_%&+*=<>@#№°§…|]"
+)
+# Từ trộn chữ và số (l0, 0ng, Vi3t) - lỗi OCR điển hình
+_MIXED_ALNUM_RE = re.compile(r"\b(?=[^\W_]*\d)(?=[^\W_]*[^\W\d_])[^\W_]+\b")
+
+def line_needs_correction(line, confidence):
+    """True nếu dòng OCR cần gửi đi sửa chính tả (confidence thấp hoặc có pattern không giống tiếng Việt)"""
+    if confidence is None or confidence < CORRECTION_CONFIDENCE_THRESHOLD:
+        return True
+    line = unicodedata.normalize('NFC', line)
+    return bool(_NON_VIETNAMESE_CHAR_RE.search(line) or _MIXED_ALNUM_RE.search(line))
+
+def correct_ocr_text(text, lines_with_alignment=None, max_retries=2):
     """
-    if not use_correction or not text or not text.strip():
-        return text
-    
-    # Retry logic để đảm bảo luôn xử lý được
-    for attempt in range(max_retries + 1):
-        try:
-            # Gọi API một lần cho toàn bộ text - NHANH và CHUẨN
-            response = requests.post(
-                TEXT_CORRECTION_API_URL,
-                json={'text': text},
-                timeout=120  # Timeout 120 giây cho text dài
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                if result.get('success'):
-                    corrected_text = result.get('corrected_text', text)
-                    if attempt > 0:
-                        print(f"✅ Text Correction thành công sau {attempt + 1} lần thử")
-                    return corrected_text
-                else:
-                    # Nếu API trả về lỗi, retry nếu chưa hết số lần
-                    error_msg = result.get('error', 'Unknown error')
-                    if attempt < max_retries:
-                        print(f"⚠️  API trả về lỗi (lần {attempt + 1}): {error_msg}, đang retry...")
-                        time.sleep(1)  # Đợi 1 giây trước khi retry
-                        continue
-                    print(f"⚠️  API trả về lỗi sau {max_retries + 1} lần thử: {error_msg}, giữ nguyên text gốc")
-                    return text
-            else:
-                # Nếu request failed, retry nếu chưa hết số lần
-                if attempt < max_retries:
-                    print(f"⚠️  API request failed với status code {response.status_code} (lần {attempt + 1}), đang retry...")
-                    time.sleep(1)
-                    continue
-                print(f"⚠️  API request failed với status code {response.status_code} sau {max_retries + 1} lần thử, giữ nguyên text gốc")
-                return text
-                
-        except requests.exceptions.ConnectionError:
-            if attempt < max_retries:
-                print(f"⚠️  Không thể kết nối đến Text Correction API ({TEXT_CORRECTION_API_URL}) - lần {attempt + 1}, đang retry...")
-                time.sleep(2)  # Đợi 2 giây trước khi retry
-                continue
-            print(f"⚠️  Không thể kết nối đến Text Correction API ({TEXT_CORRECTION_API_URL}) sau {max_retries + 1} lần thử")
-            print("💡 Đảm bảo API server đang chạy: cd ocr-protonx && python app.py")
-            return text
-        except requests.exceptions.Timeout:
-            if attempt < max_retries:
-                print(f"⚠️  API timeout (lần {attempt + 1}), đang retry...")
-                time.sleep(1)
-                continue
-            print(f"⚠️  API timeout sau {max_retries + 1} lần thử (text quá dài hoặc server chậm), giữ nguyên text gốc")
-            return text
-        except Exception as e:
-            if attempt < max_retries:
-                print(f"⚠️  Lỗi khi gọi Text Correction API (lần {attempt + 1}): {str(e)}, đang retry...")
-                time.sleep(1)
-                continue
-            print(f"⚠️  Lỗi khi gọi Text Correction API sau {max_retries + 1} lần thử: {str(e)}, giữ nguyên text gốc")
-            return text
+    Sửa chính tả text OCR, chỉ gửi các dòng cần sửa (confidence-gated)
+    Dòng của text tương ứng 1-1 với lines_with_alignment (mỗi dòng có 'confidence')
     
-    # Nếu đến đây thì đã hết retry, trả về text gốc
-    return text
+    Returns:
+        Tuple (corrected_text, {'corrected_lines', 'skipped_lines'})
+        
+    Raises:
+        CorrectionSkipped: API không khả dụng - caller giữ text gốc
+    """
+    with timed_stage('correction', log):
+        lines = text.split('\n')
+        total_lines = sum(1 for line in lines if line.strip())
+        confidences = [line_info.get('confidence') for line_info in (lines_with_alignment or [])]
+        
+        # Không có confidence từng dòng (vd kết quả cache cũ) hoặc tắt gating -> sửa cả text như trước
+        if not CORRECTION_CONFIDENCE_GATING or len(confidences) != len(lines):
+            return correction_client.correct(text, max_retries=max_retries), {'corrected_lines': total_lines, 'skipped_lines': 0}
+        
+        selected = {i for i, (line, confidence) in enumerate(zip(lines, confidences))
+                    if line.strip() and line_needs_correction(line, confidence)}
+        stats = {'corrected_lines': len(selected), 'skipped_lines': total_lines - len(selected)}
+        if not selected:
+            return text, stats
+        
+        # Gửi các dòng được chọn theo thứ tự trang (dòng liền nhau gửi liền nhau) trong một request
+        corrected = correction_client.correct_lines(lines, selected=selected, max_retries=max_retries)
+        return '\n'.join(corrected), stats
 
-print("\n" + "="*60)
-print("📡 Text Correction: Sử dụng API")
-print("="*60)
-print(f"→ API endpoint: {TEXT_CORRECTION_API_URL}")
-print("→ Sau khi PaddleOCR xong → Gọi API để sửa chính tả tiếng Việt")
-print("="*60 + "\n")
+def text_correction_mode():
+    """
+    Code path correct_ocr_text dùng - output khác nhau giữa các mode nên nằm trong result cache key
+    - 'text': gửi cả trang; 'lines': sửa theo dòng qua memo (dòng đã gặp trả lời local)
+    - 'gated+...': chỉ gửi dòng cần sửa theo confidence (trang không có confidence từng dòng dùng mode sau '+')
+    """
+    mode = 'lines' if correction_memo else 'text'
+    if CORRECTION_CONFIDENCE_GATING:
+        mode = f"gated+{mode}"
+    return mode
 
 app = Flask(__name__)
 CORS(app)
 
+@app.before_request
+def bind_request_id():
+    """Mỗi request một request_id (lấy từ header X-Request-ID nếu có) - gắn vào mọi log của request"""
+    request_id = request.headers.get('X-Request-ID', '').strip()[:64] or new_request_id()
+    request.environ['ocr.request_id_token'] = request_id_var.set(request_id)
+    if request.path != '/metrics':
+        HTTP_IN_FLIGHT.inc()
+        request.environ['ocr.in_flight'] = True
+
+@app.after_request
+def add_request_id_header(response):
+    request_id = request_id_var.get()
+    if request_id:
+        response.headers['X-Request-ID'] = request_id
+    return response
+
+@app.teardown_request
+def unbind_request_id(exc=None):
+    if request.environ.pop('ocr.in_flight', False):
+        HTTP_IN_FLIGHT.dec()
+    token = request.environ.pop('ocr.request_id_token', None)
+    if token is not None:
+        try:
+            request_id_var.reset(token)
+        except ValueError:
+            pass  # Token tạo trong context khác (server chạy hook trên thread khác)
+
 # Configuration
 UPLOAD_FOLDER = 'uploads'
-# Hỗ trợ nhiều format PDF và image
-ALLOWED_EXTENSIONS = {
-    # PDF formats
-    'pdf',
-    # Image formats
-    'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'tiff', 'tif',
-    'jfif', 'pjpeg', 'pjp', 'svg', 'ico', 'heic', 'heif'
-}
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB
 
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-# Initialize PaddleOCR với config tối ưu cho tiếng Việt - ĐẢM BẢO KHÔNG MẤT CHỮ
-print("Đang khởi tạo PaddleOCR cho tiếng Việt...")
-ocr_engine = PaddleOCR(
-    use_angle_cls=True,  # Sử dụng góc độ classification
-    lang='vi',  # Tiếng Việt
-    use_gpu=False,  # Set True nếu có GPU
-    show_log=False,
-    # Config để đảm bảo không mất chữ
-    det_db_thresh=0.3,  # Lower threshold để detect nhiều text hơn
-    det_db_box_thresh=0.5,  # Lower để không bỏ sót
-    rec_batch_num=6,  # Batch size để xử lý tốt hơn
-    max_text_length=500  # Cho phép text dài hơn
+# Result cache cho /extract-text - key = hash(bytes file + options ảnh hưởng output)
+# RESULT_CACHE_MAX_ENTRIES: số kết quả giữ trong memory (0 = tắt cache)
+# RESULT_CACHE_DISK: 'true' để lưu thêm trên disk (UPLOAD_FOLDER/cache/results) - sống qua restart
+# RESULT_CACHE_DISK_MAX_MB / RESULT_CACHE_DISK_MAX_ENTRIES: giới hạn disk tier, vượt thì xoá file LRU (0 = không giới hạn)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '256'))
+RESULT_CACHE_DISK = os.getenv('RESULT_CACHE_DISK', 'false').lower() == 'true'
+result_cache = ResultCache(
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    disk_dir=os.path.join(UPLOAD_FOLDER, 'cache', 'results') if RESULT_CACHE_DISK else None,
+    name='results',
+    max_disk_bytes=int(float(os.getenv('RESULT_CACHE_DISK_MAX_MB', '512')) * 1024 * 1024),
+    max_disk_entries=int(os.getenv('RESULT_CACHE_DISK_MAX_ENTRIES', '10000'))
+)
+
+# Async job API (/jobs) cho tài liệu dài
+# JOB_WORKERS: số job chạy đồng thời, JOB_MAX_QUEUE: số job chờ tối đa (đầy -> 429)
+# JOB_RESULT_TTL: số giây giữ kết quả job sau khi xong
+# JOB_MAX_FINISHED: số job đã xong giữ kết quả tối đa - vượt thì xoá job cũ nhất dù chưa hết TTL (0 = không giới hạn)
+# JOB_DB_PATH: file SQLite lưu trạng thái / kết quả job, dùng chung giữa các gunicorn worker
+#              (GET /jobs/<id> vào worker nào cũng thấy job). Để trống = job chỉ nằm trong memory của worker
+JOB_DB_PATH = os.getenv('JOB_DB_PATH', os.path.join(UPLOAD_FOLDER, 'jobs.db')).strip() or None
+if JOB_DB_PATH and os.path.dirname(JOB_DB_PATH):
+    os.makedirs(os.path.dirname(JOB_DB_PATH), exist_ok=True)
+job_manager = JobManager(
+    max_workers=int(os.getenv('JOB_WORKERS', '2')),
+    max_queue_depth=int(os.getenv('JOB_MAX_QUEUE', '16')),
+    result_ttl=int(os.getenv('JOB_RESULT_TTL', '3600')),
+    max_finished_jobs=int(os.getenv('JOB_MAX_FINISHED', '256')),
+    db_path=JOB_DB_PATH
+)
+
+# Page cache cho PDF - key = hash nội dung trang đã render
+# PDF sửa lại vài trang chỉ OCR lại các trang thay đổi
+# PAGE_CACHE_MAX_ENTRIES: số trang giữ trong memory (0 = tắt)
+# PAGE_CACHE_DISK: 'true' để lưu thêm trên disk (UPLOAD_FOLDER/cache/pages)
+# PAGE_CACHE_DISK_MAX_MB / PAGE_CACHE_DISK_MAX_ENTRIES: giới hạn disk tier (0 = không giới hạn)
+PAGE_CACHE_MAX_ENTRIES = int(os.getenv('PAGE_CACHE_MAX_ENTRIES', '1024'))
+PAGE_CACHE_DISK = os.getenv('PAGE_CACHE_DISK', os.getenv('RESULT_CACHE_DISK', 'false')).lower() == 'true'
+page_cache = ResultCache(
+    max_entries=PAGE_CACHE_MAX_ENTRIES,
+    disk_dir=os.path.join(UPLOAD_FOLDER, 'cache', 'pages') if PAGE_CACHE_DISK else None,
+    name='pages',
+    max_disk_bytes=int(float(os.getenv('PAGE_CACHE_DISK_MAX_MB', '1024')) * 1024 * 1024),
+    max_disk_entries=int(os.getenv('PAGE_CACHE_DISK_MAX_ENTRIES', '50000'))
 )
-print("✅ PaddleOCR đã sẵn sàng với config tối ưu!")
 
-def allowed_file(filename):
-    """Check if file extension is allowed"""
-    if not filename or '.' not in filename:
-        return False
-    ext = filename.rsplit('.', 1)[1].lower()
-    return ext in ALLOWED_EXTENSIONS
+# Config PaddleOCR tối ưu cho tiếng Việt - ĐẢM BẢO KHÔNG MẤT CHỮ
+PADDLE_OCR_CONFIG = {
+    'use_angle_cls': True,  # Sử dụng góc độ classification
+    'lang': 'vi',  # Tiếng Việt
+    'use_gpu': False,  # Set True nếu có GPU
+    'show_log': False,
+    # Config để đảm bảo không mất chữ
+    'det_db_thresh': 0.3,  # Lower threshold để detect nhiều text hơn
+    'det_db_box_thresh': 0.5,  # Lower để không bỏ sót
+    'rec_batch_num': int(os.getenv('OCR_REC_BATCH_NUM', '6')),  # Batch size để xử lý tốt hơn
+    'max_text_length': 500  # Cho phép text dài hơn
+}
+
+# Worker pool OCR cho PDF nhiều trang
+# OCR_WORKERS: 0 = tuần tự (mặc định), N = N worker process, 'auto' = số core CPU
+OCR_WORKERS = resolve_worker_count(os.getenv('OCR_WORKERS', '0'))
+# Số trang tối đa đang nằm trong pool cùng lúc (mặc định 2 x số worker)
+OCR_POOL_MAX_PENDING = int(os.getenv('OCR_POOL_MAX_PENDING', '0')) or None
+# Số thread CPU cho PaddleOCR trong mỗi worker - mặc định chia đều core cho các worker
+OCR_WORKER_CPU_THREADS = int(os.getenv('OCR_WORKER_CPU_THREADS', '0')) or max(1, (os.cpu_count() or 1) // max(1, OCR_WORKERS))
+# Start method của worker pool: mặc định forkserver (Linux/Mac) / spawn (Windows) - fork không an toàn
+# vì pool được tạo khi process đã có nhiều thread
+OCR_WORKER_START_METHOD = os.getenv('OCR_WORKER_START_METHOD', '').strip() or None
 
-def is_pdf_file(filename, file_buffer):
-    """Check if file is PDF by content, not just extension"""
+# Dynamic batching cho recognition: gom crop dòng text từ nhiều trang/request đồng thời
+# trong cửa sổ OCR_BATCH_WAIT_MS rồi nhận dạng một lần (tối đa OCR_BATCH_MAX_SIZE crop)
+# Nên tăng OCR_REC_BATCH_NUM tương ứng để PaddleOCR chạy batch lớn thật sự
+OCR_BATCHING = os.getenv('OCR_BATCHING', 'false').lower() == 'true'
+OCR_BATCH_MAX_SIZE = int(os.getenv('OCR_BATCH_MAX_SIZE', '64'))
+OCR_BATCH_WAIT_MS = float(os.getenv('OCR_BATCH_WAIT_MS', '10'))
+
+# Render PDF: hệ số scale và số trang tối đa được render trước (trong lúc OCR trang hiện tại)
+PDF_RENDER_SCALE = float(os.getenv('PDF_RENDER_SCALE', '2.5'))
+PDF_RENDER_PREFETCH = int(os.getenv('PDF_RENDER_PREFETCH', '2'))
+# Hybrid PDF: trang có text layer tiếng Việt dùng được -> lấy text trực tiếp, không OCR
+# (request gửi forceOCR=true để OCR mọi trang)
+PDF_TEXT_LAYER_FAST_PATH = os.getenv('PDF_TEXT_LAYER_FAST_PATH', 'true').lower() == 'true'
+PDF_TEXT_LAYER_MIN_CHARS = int(os.getenv('PDF_TEXT_LAYER_MIN_CHARS', '50'))
+
+def create_ocr_engine(**overrides):
+    """Tạo một PaddleOCR instance với config chuẩn (có thể override từng tham số)"""
+    from paddleocr import PaddleOCR  # import lazy: kéo theo paddle (vài giây, vài trăm MB)
+    config = dict(PADDLE_OCR_CONFIG)
+    config.update(overrides)
+    return PaddleOCR(**config)
+
+# PaddleOCR với config tối ưu cho tiếng Việt - tạo lazy qua registry ở lần dùng đầu
+# Server load trước khi nhận request: gunicorn master trước fork (load_ocr_engine) / warm-up thread
+OCR_ENGINE_NAME = 'paddleocr'
+engines = EngineRegistry()
+engines.register(OCR_ENGINE_NAME, create_ocr_engine)
+ocr_engine_lock = threading.Lock()
+
+def get_ocr_engine():
+    """PaddleOCR của process hiện tại (tạo ở lần gọi đầu)"""
+    return engines.get(OCR_ENGINE_NAME)
+
+def __getattr__(name):
+    # Tương thích code cũ dùng app.ocr_engine
+    if name == 'ocr_engine':
+        return get_ocr_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Readiness (GET /ready): not_loaded -> loading -> loaded -> warming -> ready (failed nếu lỗi)
+# Chỉ sẵn sàng nhận traffic sau khi warm-up xong
+# (lần OCR đầu tiên khởi tạo kernel/bộ nhớ của predictor nên chậm hơn hẳn các lần sau)
+# ENGINE_WARMUP=false: bỏ qua warm-up, ready ngay sau khi start (engine vẫn cold: warm=False)
+ENGINE_WARMUP = os.getenv('ENGINE_WARMUP', 'true').lower() == 'true'
+engine_state = {'status': 'not_loaded', 'warm': False, 'warmup_seconds': None, 'warmup': None, 'error': None}
+
+def load_ocr_engine():
+    """Load engine ngay (gunicorn master gọi trước fork -> worker dùng chung weights qua copy-on-write)"""
+    if not engines.is_loaded(OCR_ENGINE_NAME):
+        engine_state['status'] = 'loading'
     try:
-        # Check extension first (including cases where filename might be None or empty)
-        if filename:
-            filename_lower = filename.lower()
-            if filename_lower.endswith('.pdf') or 'pdf' in filename_lower:
-                # Verify by content too
-                file_buffer.seek(0)
-                header = file_buffer.read(4)
-                file_buffer.seek(0)
-                if header.startswith(b'%PDF'):
-                    return True
-        
-        # Check magic bytes (PDF starts with %PDF) - primary check
-        file_buffer.seek(0)
-        # Read more bytes to be sure (PDF header can have whitespace)
-        header = file_buffer.read(1024)
-        file_buffer.seek(0)
-        
-        # Check for PDF magic bytes (can have whitespace before %PDF)
-        if b'%PDF' in header[:1024]:
-            return True
-            
-        # Also check for PDF in first bytes (sometimes Chrome adds data)
-        if header.startswith(b'%PDF') or header.strip().startswith(b'%PDF'):
-            return True
-            
-        return False
+        engine = get_ocr_engine()
     except Exception as e:
-        print(f"⚠️  Error checking PDF: {str(e)}")
-        # Fallback: if filename suggests PDF, trust it
-        if filename and filename.lower().endswith('.pdf'):
-            return True
-        return False
-
-def is_image_file(filename, file_buffer):
-    """Check if file is image by trying to open with PIL"""
+        engine_state.update(status='failed', error=str(e))
+        raise
+    if engine_state['status'] in ('not_loaded', 'loading'):
+        engine_state['status'] = 'loaded'
+    return engine
+
+def log_startup_config():
+    """Log cấu hình khi server start (không log lúc import)"""
+    log.info("📡 Text Correction: Sử dụng API - sau khi PaddleOCR xong gọi API để sửa chính tả tiếng Việt",
+             extra={'api_url': TEXT_CORRECTION_API_URL})
+
+# Profile từng request: /extract-text gửi profile=true (hoặc sample / cprofile) -> response có thêm 'profile'
+# Chỉ hoạt động khi PROFILING_ENABLED=true (tốn CPU, lộ cấu trúc code - không bật public)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'sample').lower()
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILING_SAMPLE_INTERVAL_MS', '5'))
+
+# Metrics (GET /metrics): histogram thời gian từng stage (ocr_metrics.STAGE_SECONDS) + các metric dưới đây
+# METRICS_BUSY_WINDOW: cửa sổ (giây) tính tỉ lệ thời gian engine OCR bận
+METRICS_BUSY_WINDOW = float(os.getenv('METRICS_BUSY_WINDOW', '60'))
+REQUEST_SECONDS = REGISTRY.histogram(
+    'ocr_request_duration_seconds', 'Thời gian xử lý một file (PDF/ảnh, sau khi đọc upload)', ('kind', 'cached')
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge('ocr_http_requests_in_flight', 'Số HTTP request đang xử lý')
+ENGINE_WAITING = REGISTRY.gauge('ocr_engine_waiting_threads', 'Số thread đang chờ engine OCR (hàng đợi engine)')
+# Worker pool: mỗi worker một engine -> capacity = số worker
+engine_busy = BusyTracker(window_seconds=METRICS_BUSY_WINDOW, capacity=OCR_WORKERS if OCR_WORKERS > 1 else 1)
+ENGINE_WARMUP_SECONDS = REGISTRY.histogram(
+    'ocr_engine_warmup_duration_seconds', 'Thời gian warm-up engine OCR theo component (det, cls, rec, total)',
+    ('component',), buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+)
+REGISTRY.gauge('ocr_engine_warm', '1 khi engine OCR đã warm-up xong').set_function(
+    lambda: 1 if engine_state['warm'] else 0)
+REGISTRY.gauge(
+    'ocr_engine_busy_ratio', 'Tỉ lệ thời gian engine OCR bận trong cửa sổ METRICS_BUSY_WINDOW (0-1)'
+).set_function(engine_busy.ratio)
+
+@contextmanager
+def engine_slot():
+    """Giữ ocr_engine_lock (PaddleOCR predictor không thread-safe) - đếm thread chờ và thời gian engine bận"""
+    ENGINE_WAITING.inc()
     try:
-        # First try to open with PIL (works for most formats)
-        file_buffer.seek(0)
-        buffer_copy = file_buffer.read()
-        file_buffer.seek(0)
-        
-        # Try to open with PIL
+        ocr_engine_lock.acquire()
+    finally:
+        ENGINE_WAITING.dec()
+    try:
+        with engine_busy.busy():
+            yield
+    finally:
+        ocr_engine_lock.release()
+
+# Kích thước trang thường gặp (pt) - nhân PDF_RENDER_SCALE ra pixel như trang PDF render thật
+WARMUP_PAGE_SIZES = {
+    'a4': (595, 842),
+    'a4-landscape': (842, 595),
+    'letter': (612, 792),
+    'a5': (420, 595),
+}
+
+def parse_warmup_sizes(value):
+    """'a4,letter,1240x1754' -> [(width, height) pixel] - tên trang theo PDF_RENDER_SCALE, WxH là pixel"""
+    sizes = []
+    for item in (value or '').split(','):
+        item = item.strip().lower()
+        if not item:
+            continue
+        if item in WARMUP_PAGE_SIZES:
+            width, height = WARMUP_PAGE_SIZES[item]
+            sizes.append((int(width * PDF_RENDER_SCALE), int(height * PDF_RENDER_SCALE)))
+            continue
         try:
-            img = Image.open(io.BytesIO(buffer_copy))
-            img.verify()  # Verify it's a valid image
-            return True
-        except:
-            pass
-        
-        # Check extension as fallback
-        if filename:
-            ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
-            image_exts = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'tiff', 'tif', 'jfif', 'pjpeg', 'pjp', 'ico', 'heic', 'heif'}
-            if ext in image_exts:
-                # Try again with format hint
-                try:
-                    file_buffer.seek(0)
-                    img = Image.open(io.BytesIO(buffer_copy))
-                    img.verify()
-                    return True
-                except:
-                    pass
-        return False
+            width, height = (int(part) for part in item.split('x'))
+            sizes.append((width, height))
+        except ValueError:
+            log.warning("⚠️  ENGINE_WARMUP_SIZES: bỏ qua '%s' (hỗ trợ: %s hoặc WxH)", item, ', '.join(WARMUP_PAGE_SIZES))
+    return sizes
+
+# ENGINE_WARMUP_SIZES: các cỡ trang warm-up - detection resize theo tỉ lệ ảnh nên mỗi tỉ lệ trang
+# là một shape input khác (kernel/bộ nhớ riêng của predictor)
+ENGINE_WARMUP_SIZES = parse_warmup_sizes(os.getenv('ENGINE_WARMUP_SIZES', 'a4,a4-landscape,letter'))
+
+def make_warmup_image(width, height):
+    """Trang tổng hợp width x height có các dòng chữ ở nhiều cỡ/vị trí (trái, giữa, phải) - BGR"""
+    import cv2
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    scale = width / 1000
+    lines = [
+        ('CONG HOA XA HOI CHU NGHIA VIET NAM', 0.55, 1.0),
+        ('Doc lap - Tu do - Hanh phuc', 0.55, 0.9),
+        ('QUYET DINH SO 123/QD-UBND', 0.5, 1.2),
+        ('Dieu 1. Phe duyet ke hoach phat trien kinh te - xa hoi nam 2024', 0.08, 0.8),
+        ('Dieu 2. Cac co quan, don vi co trach nhiem thi hanh Quyet dinh nay', 0.08, 0.8),
+        ('CHU TICH', 0.7, 0.9),
+    ]
+    y = int(height * 0.08)
+    for text, x_ratio, size in lines:
+        font_scale = size * scale
+        (text_width, text_height), _ = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, 2)
+        x = int(width * x_ratio - text_width / 2) if x_ratio >= 0.5 else int(width * x_ratio)
+        cv2.putText(image, text, (max(0, x), y), cv2.FONT_HERSHEY_SIMPLEX, font_scale, (0, 0, 0),
+                    max(1, int(2 * scale)), cv2.LINE_AA)
+        y += int(text_height * 3)
+    return image
+
+def warm_up_ocr_engine(engine, sizes=None):
+    """
+    Chạy detection, angle classification, recognition trên trang tổng hợp từng cỡ trong sizes
+    (lần chạy đầu của predictor khởi tạo graph/kernel/bộ nhớ) -> {'det', 'cls', 'rec', 'total': giây}
+    """
+    sorted_boxes, get_rotate_crop_image, _ = _load_paddle_crop_helpers()
+    timings = {'det': 0.0, 'cls': 0.0, 'rec': 0.0}
+    for width, height in (sizes if sizes is not None else ENGINE_WARMUP_SIZES):
+        image = make_warmup_image(width, height)
+        start = time.perf_counter()
+        dt_boxes, _ = engine.text_detector(image)
+        timings['det'] += time.perf_counter() - start
+
+        if dt_boxes is not None and len(dt_boxes) > 0:
+            crops = [get_rotate_crop_image(image, copy.deepcopy(box)) for box in sorted_boxes(dt_boxes)]
+        else:
+            crops = [image[:max(32, height // 20), :width // 2]]  # Không detect được gì -> vẫn warm-up rec
+        if PADDLE_OCR_CONFIG.get('use_angle_cls'):
+            start = time.perf_counter()
+            crops, _, _ = engine.text_classifier(crops)
+            timings['cls'] += time.perf_counter() - start
+        start = time.perf_counter()
+        engine.text_recognizer(crops)
+        timings['rec'] += time.perf_counter() - start
+    timings['total'] = sum(timings.values())
+    return timings
+
+def _record_warmup(timings):
+    for component, seconds in timings.items():
+        ENGINE_WARMUP_SECONDS.observe(seconds, component=component)
+
+def warm_up_engine():
+    """
+    Warm-up engine của process này (+ các OCR worker process nếu OCR_WORKERS > 1)
+    -> engine_state 'ready' + warm=True; lỗi -> 'failed' (GET /ready vẫn 503)
+    """
+    start = time.perf_counter()
+    try:
+        engine = load_ocr_engine()
+        engine_state['status'] = 'warming'
+        with engine_slot():
+            timings = warm_up_ocr_engine(engine)
+        _record_warmup(timings)
+        engine_state['warmup'] = {component: round(seconds, 3) for component, seconds in timings.items()}
+
+        pool = get_ocr_worker_pool()
+        if pool is not None:
+            # Mỗi worker process có engine riêng (tạo trong _init_ocr_worker) -> start pool và warm-up từng worker
+            worker_timings = pool.warm_up(_warm_up_in_worker)
+            for timings in worker_timings.values():
+                _record_warmup(timings)
+            engine_state['worker_pool'] = {'workers': pool.max_workers, 'warm': len(worker_timings)}
     except Exception as e:
-        print(f"⚠️  Error checking image: {str(e)}")
-        return False
+        engine_state.update(status='failed', error=str(e))
+        log.error("❌ Warm-up PaddleOCR lỗi: %s", e)
+        return
+    engine_state.update(status='ready', warm=True, warmup_seconds=round(time.perf_counter() - start, 3),
+                        load_seconds=engines.stats()[OCR_ENGINE_NAME]['load_seconds'])
+    log.info("🔥 PaddleOCR đã warm-up", extra={
+        'duration_ms': round(engine_state['warmup_seconds'] * 1000, 2),
+        'sizes': ['%dx%d' % size for size in ENGINE_WARMUP_SIZES],
+        'components_s': engine_state['warmup'],
+        'worker_pool': engine_state.get('worker_pool')
+    })
+
+def start_engine_warmup():
+    """Warm-up engine trên thread nền (mỗi process phục vụ request gọi một lần, SAU khi fork)"""
+    if not ENGINE_WARMUP:
+        # Nhận traffic ngay, request đầu tiên chịu phần load + khởi tạo engine (warm=False)
+        engine_state['status'] = 'ready'
+        return
+    threading.Thread(target=warm_up_engine, name='engine-warmup', daemon=True).start()
+
+def after_fork():
+    """
+    Gọi trong mỗi worker process ngay sau fork (gunicorn post_fork - xem gunicorn.conf.py)
+    Engine (model weights) kế thừa từ master qua copy-on-write; mở lại các tài nguyên không dùng chung
+    được qua fork và warm-up engine trong worker (chạy inference ở master trước fork dễ treo thread pool)
+    """
+    if correction_memo is not None:
+        correction_memo.reopen()
+    start_engine_warmup()
+
+def before_worker_exit():
+    """Dọn dẹp khi worker dừng (gunicorn worker_exit): dừng OCR worker pool con"""
+    if _ocr_worker_pool is not None:
+        _ocr_worker_pool.shutdown(wait=False)
 
 def preprocess_image_for_ocr(image):
     """
     Preprocess image để tối ưu OCR cho tiếng Việt - KHÔNG LÀM MẤT CHỮ
     Preprocessing nhẹ để không làm mất thông tin text
     """
+    import cv2
     try:
         # Đảm bảo image là RGB mode
         if image.mode != 'RGB':
@@ -264,9 +567,65 @@ def preprocess_image_for_ocr(image):
         else:
             return image  # Return original nếu có vấn đề
     except Exception as e:
-        print(f"⚠️  Lỗi khi preprocess image: {str(e)}, giữ nguyên image gốc")
+        log.warning("⚠️  Lỗi khi preprocess image: %s, giữ nguyên image gốc", e)
         return image  # Return original nếu có lỗi
 
+VIETNAMESE_CHARS = 'àáảãạăằắẳẵặâầấẩẫậèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵđ'
+
+def has_vietnamese_chars(text):
+    """Check text có ký tự tiếng Việt (có dấu) hay không"""
+    return any('\u0103' <= char <= '\u1ef9' or char in VIETNAMESE_CHARS for char in text)
+
+def extract_page_text_layer(page, scale=None):
+    """
+    Lấy text trực tiếp từ text layer của một trang PDF (born-digital) - KHÔNG OCR
+    Mỗi dòng của text layer thành một item có bounding box (quy đổi sang pixel theo scale render)
+    để group dòng, spacing và alignment hoạt động giống kết quả OCR
+    
+    Returns:
+        Dict giống ocr_image (thêm 'source': 'text_layer'),
+        hoặc None nếu text layer không dùng được (trang scan, text rác, quá ít text) -> cần OCR
+    """
+    scale = scale or PDF_RENDER_SCALE
+    items = []
+    
+    for block in page.get_text('dict').get('blocks', []):
+        if block.get('type', 0) != 0:  # Bỏ qua image block
+            continue
+        for line in block.get('lines', []):
+            text = ''.join(span.get('text', '') for span in line.get('spans', []))
+            if not text.strip():
+                continue
+            x0, y0, x1, y1 = [v * scale for v in line['bbox']]
+            items.append({
+                'y': y0,
+                'x': x0,
+                'text': text,
+                'confidence': 1.0,
+                'box': [[x0, y0], [x1, y0], [x1, y1], [x0, y1]]
+            })
+    
+    # Text layer phải đủ dài, có tiếng Việt và không lỗi font (ký tự thay thế U+FFFD)
+    page_text = ' '.join(item['text'] for item in items)
+    if len(page_text.strip()) < PDF_TEXT_LAYER_MIN_CHARS or len(page_text.split()) < 5:
+        return None
+    if not has_vietnamese_chars(page_text):
+        return None
+    if page_text.count('\ufffd') > len(page_text) * 0.01:
+        return None
+    
+    texts, confidences, lines_with_alignment = group_items_into_lines(items, page.rect.width * scale)
+    if not texts:
+        return None
+    
+    return {
+        'text': "\n".join(texts),
+        'confidence': sum(confidences) / len(confidences) * 100,
+        'words': len(texts),
+        'lines_with_alignment': lines_with_alignment,
+        'source': 'text_layer'
+    }
+
 def extract_text_from_pdf(file_buffer):
     """
     Extract text từ PDF (nếu PDF có text layer)
@@ -280,6 +639,7 @@ def extract_text_from_pdf(file_buffer):
         elif not isinstance(file_buffer, bytes):
             file_buffer = bytes(file_buffer)
         
+        import fitz  # PyMuPDF - import lazy
         doc = fitz.open(stream=file_buffer, filetype="pdf")
         total_pages = len(doc)
         text_parts = []
@@ -291,7 +651,7 @@ def extract_text_from_pdf(file_buffer):
                 if text.strip():
                     text_parts.append(f"--- Trang {page_num + 1} ---\n{text}")
             except Exception as page_err:
-                print(f"  ⚠️  Lỗi khi đọc trang {page_num + 1}: {str(page_err)}")
+                log.warning("⚠️  Lỗi khi đọc trang: %s", page_err, extra={'page': page_num + 1})
                 continue
         
         full_text = "\n\n".join(text_parts)
@@ -299,8 +659,7 @@ def extract_text_from_pdf(file_buffer):
         # Phân tích chất lượng text
         text_length = len(full_text)
         word_count = len(full_text.split())
-        has_vietnamese = any('\u0103' <= char <= '\u1ef9' or char in 'àáảãạăằắẳẵặâầấẩẫậèéẻẽẹêềếểễệìíỉĩịòóỏõọôồốổỗộơờớởỡợùúủũụưừứửữựỳýỷỹỵđ' 
-                           for char in full_text)
+        has_vietnamese = has_vietnamese_chars(full_text)
         
         is_real_text = text_length > 100 and word_count > 10 and has_vietnamese
         
@@ -322,80 +681,106 @@ def extract_text_from_pdf(file_buffer):
             except:
                 pass
 
+def open_pdf_document(file_buffer):
+    """Mở PDF bằng PyMuPDF từ bytes / BytesIO"""
+    # Đảm bảo file_buffer là bytes
+    if isinstance(file_buffer, io.BytesIO):
+        file_buffer.seek(0)
+        file_buffer = file_buffer.read()
+    elif not isinstance(file_buffer, bytes):
+        file_buffer = bytes(file_buffer)
+    
+    import fitz  # PyMuPDF - import lazy (chỉ khi xử lý PDF)
+    return fitz.open(stream=file_buffer, filetype="pdf")
+
+def iter_pdf_pages(doc, failed_pages=None, scale=None, text_layer=False):
+    """
+    Render từng trang PDF sang ảnh numpy BGR uint8 - GENERATOR, chỉ render khi được lấy
+    Không giữ lại các trang đã yield -> memory không tăng theo số trang
+    Nếu một trang lỗi, ghi vào failed_pages (nếu có) và tiếp tục
+    
+    Args:
+        doc: fitz.Document đã mở (caller chịu trách nhiệm đóng)
+        failed_pages: List để ghi số trang (1-based) không render được
+        scale: Hệ số render (mặc định PDF_RENDER_SCALE)
+        text_layer: True -> trang có text layer tiếng Việt dùng được sẽ yield CompletedPage
+                    (kết quả lấy thẳng từ text layer, không render/OCR)
+    """
+    import fitz
+    scale = scale or PDF_RENDER_SCALE
+    total_pages = len(doc)
+    
+    for page_num in range(total_pages):
+        pix = None
+        try:
+            page = doc[page_num]
+            
+            # Fast path: trang born-digital -> lấy text layer, bỏ qua render và OCR
+            if text_layer:
+                try:
+                    with timed_stage('text_layer'):
+                        text_result = extract_page_text_layer(page, scale)
+                except Exception as text_err:
+                    log.warning("⚠️  Không đọc được text layer: %s, dùng OCR", text_err, extra={'page': page_num + 1})
+                    text_result = None
+                if text_result is not None:
+                    log.debug("⚡ Trang dùng text layer (không OCR)", extra={'page': page_num + 1, 'total_pages': total_pages})
+                    yield CompletedPage(text_result, source='text_layer')
+                    continue
+            
+            with timed_stage('rasterize'):
+                # Render với scale cao để OCR tốt hơn - RGB, không alpha
+                mat = fitz.Matrix(scale, scale)
+                pix = page.get_pixmap(matrix=mat, colorspace=fitz.csRGB, alpha=False)
+                
+                # Đọc thẳng sample buffer của pixmap -> numpy BGR (không PNG encode/decode, không PIL)
+                img_array = pixmap_to_bgr(pix)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("✅ Trang đã chuyển sang ảnh", extra={
+                    'page': page_num + 1, 'total_pages': total_pages,
+                    'width': img_array.shape[1], 'height': img_array.shape[0]
+                })
+        except Exception as page_err:
+            log.warning("⚠️  Lỗi khi chuyển trang sang ảnh: %s", page_err, extra={'page': page_num + 1})
+            if failed_pages is not None:
+                failed_pages.append(page_num + 1)
+            continue
+        finally:
+            # Giải phóng pixmap để tránh memory leak
+            if pix is not None:
+                pix = None
+        
+        yield img_array
+
 def pdf_to_images(file_buffer):
     """
-    Convert PDF pages to images để OCR
+    Convert PDF pages to images để OCR (materialize toàn bộ trang vào list)
     Xử lý từng trang với error handling - nếu một trang lỗi, skip và tiếp tục
+    Lưu ý: process_pdf dùng iter_pdf_pages để không giữ mọi trang trong memory
     """
     try:
-        # Đảm bảo file_buffer là bytes
-        if isinstance(file_buffer, io.BytesIO):
-            file_buffer.seek(0)
-            file_buffer = file_buffer.read()
-        elif not isinstance(file_buffer, bytes):
-            file_buffer = bytes(file_buffer)
-        
-        doc = fitz.open(stream=file_buffer, filetype="pdf")
+        doc = open_pdf_document(file_buffer)
         total_pages = len(doc)
-        images = []
         failed_pages = []
         
-        print(f"📄 PDF có {total_pages} trang, đang chuyển sang ảnh...")
+        log.debug("📄 PDF có %d trang, đang chuyển sang ảnh...", total_pages)
         
         try:
-            for page_num in range(total_pages):
-                pix = None
-                try:
-                    page = doc[page_num]
-                    # Render với scale cao để OCR tốt hơn
-                    mat = fitz.Matrix(2.5, 2.5)  # 2.5x scale
-                    pix = page.get_pixmap(matrix=mat)
-                    
-                    # Convert to PIL Image - đảm bảo format đúng
-                    img_data = pix.tobytes("png")
-                    img_bytes = io.BytesIO(img_data)
-                    img = Image.open(img_bytes)
-                    
-                    # Đảm bảo image là RGB mode (PaddleOCR cần RGB)
-                    if img.mode != 'RGB':
-                        if img.mode == 'RGBA':
-                            # Tạo background trắng cho RGBA
-                            rgb_img = Image.new('RGB', img.size, (255, 255, 255))
-                            rgb_img.paste(img, mask=img.split()[3] if len(img.split()) >= 4 else None)
-                            img = rgb_img
-                        elif img.mode in ('L', 'P', 'LA', 'PA'):
-                            # Grayscale hoặc palette -> convert to RGB
-                            img = img.convert('RGB')
-                        else:
-                            img = img.convert('RGB')
-                    
-                    # Copy image để đảm bảo độc lập và giải phóng memory
-                    img_copy = img.copy()
-                    images.append(img_copy)
-                    print(f"  ✅ Trang {page_num + 1}/{total_pages} đã chuyển sang ảnh (mode: {img_copy.mode})")
-                except Exception as page_err:
-                    print(f"  ⚠️  Lỗi khi chuyển trang {page_num + 1} sang ảnh: {str(page_err)}")
-                    failed_pages.append(page_num + 1)
-                    continue
-                finally:
-                    # Giải phóng pixmap để tránh memory leak
-                    if pix is not None:
-                        pix = None
+            images = [bgr_to_pil(img_array) for img_array in iter_pdf_pages(doc, failed_pages)]
         finally:
             # Đảm bảo document được đóng
-            if doc is not None:
-                try:
-                    doc.close()
-                except:
-                    pass
+            try:
+                doc.close()
+            except:
+                pass
         
         if failed_pages:
-            print(f"⚠️  {len(failed_pages)} trang không thể chuyển sang ảnh: {failed_pages}")
+            log.warning("⚠️  %d trang không thể chuyển sang ảnh", len(failed_pages), extra={'failed_pages': failed_pages})
         
         if not images:
             raise Exception("Không thể chuyển bất kỳ trang nào sang ảnh")
         
-        print(f"✅ Đã chuyển {len(images)}/{total_pages} trang sang ảnh thành công")
+        log.debug("✅ Đã chuyển %d/%d trang sang ảnh thành công", len(images), total_pages)
         return images
     except Exception as e:
         raise Exception(f"Lỗi khi chuyển PDF sang ảnh: {str(e)}")
@@ -417,7 +802,14 @@ def detect_text_alignment(line_items, image_width):
     # Tính vị trí của toàn bộ line (leftmost và rightmost)
     leftmost = min([item['x'] for item in line_items])
     rightmost = max([max([pt[0] for pt in item['box']]) for item in line_items])
+    return classify_alignment(leftmost, rightmost, image_width, line_items[0].get('text', ''))
+
+def classify_alignment(leftmost, rightmost, image_width, first_text=''):
+    """
+    Alignment của một dòng từ toạ độ trái nhất / phải nhất (pixel) - xem detect_text_alignment
     
+    Returns: 'left', 'center', 'right'
+    """
     # Tính margins (khoảng cách từ edge) - tính bằng pixel
     left_margin_px = leftmost
     right_margin_px = image_width - rightmost
@@ -433,10 +825,12 @@ def detect_text_alignment(line_items, image_width):
     line_center = (leftmost + rightmost) / 2
     center_ratio = line_center / image_width
     
-    # Debug info - BẬT để test và debug alignment
-    if len(line_items) > 0:
-        first_text = line_items[0].get('text', '')[:20]
-        print(f"  [Alignment] '{first_text}...' | L:{left_margin_px:.0f}px({left_margin_ratio:.1%}) R:{right_margin_px:.0f}px({right_margin_ratio:.1%}) C:{center_ratio:.1%} W:{line_width:.0f}px")
+    # Debug info - chỉ format khi bật LOG_LEVEL=DEBUG (hàm này chạy cho từng dòng)
+    debug = log.isEnabledFor(logging.DEBUG)
+    if debug:
+        log.debug("[Alignment] '%s...' | L:%.0fpx(%.1f%%) R:%.0fpx(%.1f%%) C:%.1f%% W:%.0fpx",
+                  first_text[:20], left_margin_px, left_margin_ratio * 100, right_margin_px,
+                  right_margin_ratio * 100, center_ratio * 100, line_width)
     
     # Tính chênh lệch margins
     margin_diff_px = abs(left_margin_px - right_margin_px)
@@ -445,7 +839,8 @@ def detect_text_alignment(line_items, image_width):
     # Rule 1: Nếu line chiếm > 90% width -> left (full width paragraph)
     if line_width / image_width > 0.90:
         result = 'left'
-        print(f"    → Rule 1: Full width -> {result}")
+        if debug:
+            log.debug("  → Rule 1: Full width -> %s", result)
         return result
     
     # Rule 2: So sánh margins trực tiếp - ĐƠN GIẢN NHẤT
@@ -455,7 +850,8 @@ def detect_text_alignment(line_items, image_width):
         # Nhưng phải có margin ở cả 2 bên (không quá gần edge)
         if left_margin_ratio > 0.02 and right_margin_ratio > 0.02:
             result = 'center'
-            print(f"    → Rule 2: Margins balanced -> {result}")
+            if debug:
+                log.debug("  → Rule 2: Margins balanced -> %s", result)
             return result
     
     # Rule 3: So sánh margins - left margin nhỏ hơn -> left
@@ -463,7 +859,8 @@ def detect_text_alignment(line_items, image_width):
         # Chênh lệch phải đáng kể (> 5% width hoặc > 50px)
         if (right_margin_px - left_margin_px) > max(50, image_width * 0.05):
             result = 'left'
-            print(f"    → Rule 3: Left margin smaller -> {result}")
+            if debug:
+                log.debug("  → Rule 3: Left margin smaller -> %s", result)
             return result
     
     # Rule 4: So sánh margins - right margin nhỏ hơn -> right
@@ -471,18 +868,21 @@ def detect_text_alignment(line_items, image_width):
         # Chênh lệch phải đáng kể (> 5% width hoặc > 50px)
         if (left_margin_px - right_margin_px) > max(50, image_width * 0.05):
             result = 'right'
-            print(f"    → Rule 4: Right margin smaller -> {result}")
+            if debug:
+                log.debug("  → Rule 4: Right margin smaller -> %s", result)
             return result
     
     # Rule 5: Dựa trên vị trí tuyệt đối (edge detection)
     if left_margin_ratio < 0.02:  # Rất gần edge trái
         result = 'left'
-        print(f"    → Rule 5a: Near left edge -> {result}")
+        if debug:
+            log.debug("  → Rule 5a: Near left edge -> %s", result)
         return result
     
     if right_margin_ratio < 0.02:  # Rất gần edge phải
         result = 'right'
-        print(f"    → Rule 5b: Near right edge -> {result}")
+        if debug:
+            log.debug("  → Rule 5b: Near right edge -> %s", result)
         return result
     
     # Rule 6: Fallback - dựa trên center position
@@ -493,9 +893,40 @@ def detect_text_alignment(line_items, image_width):
     else:
         result = 'center'
     
-    print(f"    → Rule 6: Fallback (center={center_ratio:.1%}) -> {result}")
+    if debug:
+        log.debug("  → Rule 6: Fallback (center=%.1f%%) -> %s", center_ratio * 100, result)
     return result
 
+def spacing_to_spaces(pixel_spacings):
+    """
+    Số dấu cách giữa các item từ khoảng cách pixel (vectorized)
+    ~6-8px mỗi dấu cách (tùy font) -> 7px/space, ít nhất 1, tối đa 20 để tránh quá dài
+    """
+    return np.minimum(np.maximum(np.trunc(pixel_spacings / 7), 1), 20).astype(np.int64).tolist()
+
+def join_line_parts(texts, spaces=None):
+    """
+    Ghép text các item của một dòng (đã sort theo x) - GIỮ FORMAT PDF
+    
+    Args:
+        texts: Text từng item
+        spaces: Số dấu cách trước item i+1 (spaces[i]); None = dòng một item
+    """
+    if spaces is None:
+        # Single item - join với space, GIỮ NGUYÊN tất cả text
+        # Strip chỉ ở đầu/cuối, giữ nguyên spaces trong text
+        return ' '.join([text.strip() if text.strip() else text for text in texts if text])
+    
+    result_parts = []
+    for i, text in enumerate(texts):
+        if not text:  # Skip nếu không có text
+            continue
+        if i > 0:
+            result_parts.append(' ' * spaces[i - 1])
+        # Strip chỉ ở đầu/cuối, giữ nguyên spaces trong text
+        result_parts.append(text.strip() if text.strip() else text)
+    return ''.join(result_parts)
+
 def format_line_with_spacing(line_items, image_width=None):
     """
     Format một dòng với spacing và xác định alignment
@@ -512,97 +943,196 @@ def format_line_with_spacing(line_items, image_width=None):
     if image_width and image_width > 0:
         alignment = detect_text_alignment(line_items, image_width)
     
-    # Format text với spacing
+    # Format text với spacing - khoảng cách = x đầu item sau - x cuối (rightmost) item trước
+    texts = [item.get('text', '') for item in line_items]
     if len(line_items) > 1:
-        # Calculate spacing between items dựa trên bounding boxes
-        spacings = []
-        for i in range(len(line_items) - 1):
-            # Calculate end of current item (rightmost x)
-            current_end = max([pt[0] for pt in line_items[i]['box']])
-            # Calculate start of next item (leftmost x)
-            next_start = line_items[i + 1]['x']
-            spacing = next_start - current_end
-            spacings.append(spacing)
-        
-        # Format with multiple spaces để preserve alignment - GIỮ FORMAT PDF
-        result_parts = []
-        for i, item in enumerate(line_items):
-            text = item.get('text', '')
-            if not text:  # Skip nếu không có text
-                continue
-                
-            if i > 0:
-                # Add spaces based on spacing - chính xác hơn
-                # ~6-8px per space character (tùy font)
-                pixel_spacing = spacings[i-1]
-                spaces_needed = max(1, int(pixel_spacing / 7))  # 7px per space
-                # Giới hạn tối đa 20 spaces để tránh quá dài
-                result_parts.append(' ' * min(spaces_needed, 20))
-            # Strip chỉ ở đầu/cuối, giữ nguyên spaces trong text
-            result_parts.append(text.strip() if text.strip() else text)
-        
-        text_result = ''.join(result_parts) if result_parts else ''
+        spacings = [
+            line_items[i + 1]['x'] - max([pt[0] for pt in line_items[i]['box']])
+            for i in range(len(line_items) - 1)
+        ]
+        text_result = join_line_parts(texts, spacing_to_spaces(np.asarray(spacings, dtype=np.float64)))
     else:
-        # Single item - join với space, GIỮ NGUYÊN tất cả text
-        texts = []
-        for item in line_items:
-            text = item.get('text', '')
-            if text:  # Chỉ thêm nếu có text
-                # Strip chỉ ở đầu/cuối, giữ nguyên spaces trong text
-                texts.append(text.strip() if text.strip() else text)
-        
-        text_result = ' '.join(texts) if texts else ''
+        text_result = join_line_parts(texts)
     
     return {"text": text_result, "alignment": alignment}
 
+def _load_paddle_crop_helpers():
+    """Helper của PaddleOCR để sort box và cắt crop dòng text (giống TextSystem)"""
+    try:
+        from paddleocr.tools.infer.predict_system import sorted_boxes
+        from paddleocr.tools.infer.utility import get_rotate_crop_image, get_minarea_rect_crop
+    except ImportError:
+        # paddleocr thêm thư mục package vào sys.path -> import được dạng 'tools.infer'
+        from tools.infer.predict_system import sorted_boxes
+        from tools.infer.utility import get_rotate_crop_image, get_minarea_rect_crop
+    return sorted_boxes, get_rotate_crop_image, get_minarea_rect_crop
+
+def _recognize_crops(crops):
+    """
+    Angle classification + recognition cho list crop - chỉ chạy trên thread của RecognitionBatcher
+    Giữ engine_slot: detection (batched_ocr), warm-up và OCR tuần tự dùng chung engine này
+    """
+    engine = get_ocr_engine()
+    with engine_slot():
+        if PADDLE_OCR_CONFIG.get('use_angle_cls'):
+            crops, _, _ = engine.text_classifier(crops)
+        rec_res, _ = engine.text_recognizer(crops)
+    return rec_res
+
+_recognition_batcher = None
+_recognition_batcher_pid = None
+
+def get_recognition_batcher():
+    """Lazy tạo RecognitionBatcher cho process hiện tại (thread scheduler không sống qua fork)"""
+    global _recognition_batcher, _recognition_batcher_pid
+    if _recognition_batcher is None or _recognition_batcher_pid != os.getpid():
+        _recognition_batcher = RecognitionBatcher(
+            _recognize_crops,
+            max_batch_size=OCR_BATCH_MAX_SIZE,
+            max_wait_ms=OCR_BATCH_WAIT_MS
+        )
+        _recognition_batcher_pid = os.getpid()
+    return _recognition_batcher
+
+def batched_ocr(img_array):
+    """
+    OCR một ảnh: detection chạy ngay trên thread hiện tại, recognition đi qua RecognitionBatcher
+    để gộp với crop của các trang/request khác
+    Output cùng format với ocr_engine.ocr(img, cls=True)
+    """
+    sorted_boxes, get_rotate_crop_image, get_minarea_rect_crop = _load_paddle_crop_helpers()
+    
+    engine = get_ocr_engine()
+    ori_im = img_array.copy()
+    with engine_slot():
+        dt_boxes, _ = engine.text_detector(img_array)
+    if dt_boxes is None or len(dt_boxes) == 0:
+        return [None]
+    
+    dt_boxes = sorted_boxes(dt_boxes)
+    if getattr(engine.args, 'det_box_type', 'quad') == 'quad':
+        crop_fn = get_rotate_crop_image
+    else:
+        crop_fn = get_minarea_rect_crop
+    crops = [crop_fn(ori_im, copy.deepcopy(box)) for box in dt_boxes]
+    
+    rec_res = get_recognition_batcher().recognize(crops)
+    
+    # Lọc theo drop_score giống TextSystem
+    drop_score = getattr(engine, 'drop_score', 0.5)
+    return [[[box.tolist(), res] for box, res in zip(dt_boxes, rec_res) if res[1] >= drop_score]]
+
+def _box_right_edges(items):
+    """x lớn nhất của box từng item - tính một lần cho cả trang"""
+    try:
+        boxes = np.asarray([item['box'] for item in items], dtype=np.float64)
+        if boxes.ndim == 3:
+            return boxes[:, :, 0].max(axis=1)
+    except (ValueError, TypeError):
+        pass  # Box không cùng số điểm
+    return np.array([max([pt[0] for pt in item['box']]) for item in items], dtype=np.float64)
+
+def group_items_into_lines(items, img_width):
+    """
+    Group các text item thành dòng, giữ spacing và alignment
+    Dùng chung cho kết quả PaddleOCR và text layer của PDF
+    
+    Toạ độ của cả trang được chuyển sang numpy một lần: sort, biên trái/phải từng dòng
+    và khoảng cách giữa các item tính vectorized (trang dày đặc có hàng nghìn box)
+    
+    Args:
+        items: List dict {'x', 'y', 'text', 'confidence', 'box'} (toạ độ pixel)
+        img_width: Độ rộng trang/ảnh (pixel) để xác định alignment
+        
+    Returns:
+        Tuple (texts, confidences, lines_with_alignment)
+    """
+    texts = []
+    confidences = []
+    lines_with_alignment = []  # Store lines with alignment info
+    if not items:
+        return texts, confidences, lines_with_alignment
+    
+    xs = np.array([item['x'] for item in items], dtype=np.float64)
+    ys = np.array([item['y'] for item in items], dtype=np.float64)
+    right_edges = _box_right_edges(items)
+    
+    # Sort by Y position (làm tròn 10px, top to bottom), then X (left to right)
+    # lexsort ổn định như sorted(); np.round làm tròn half-to-even giống round()
+    order = np.lexsort((xs, np.round(ys / 10) * 10))
+    
+    # Group into lines: item cách y của item ĐẦU dòng < 20px -> cùng dòng
+    # (mốc y chỉ đổi khi sang dòng mới nên phải quét tuần tự, nhưng chỉ trên list float)
+    sorted_ys = ys[order].tolist()
+    line_starts = [0]
+    current_line_y = sorted_ys[0]
+    for pos in range(1, len(sorted_ys)):
+        if not abs(sorted_ys[pos] - current_line_y) < 20:
+            line_starts.append(pos)
+            current_line_y = sorted_ys[pos]
+    line_bounds = line_starts[1:] + [len(order)]
+    
+    # Biên trái/phải của từng dòng (cho alignment) - một lần reduceat cho cả trang
+    line_lefts = np.minimum.reduceat(xs[order], line_starts).tolist()
+    line_rights = np.maximum.reduceat(right_edges[order], line_starts).tolist()
+    
+    for line_no, (start, end) in enumerate(zip(line_starts, line_bounds)):
+        # Sort by X position trong dòng (stable - giữ thứ tự y khi trùng x)
+        line_order = order[start:end]
+        line_order = line_order[np.argsort(xs[line_order], kind='stable')]
+        line_items = [items[i] for i in line_order.tolist()]
+        line_texts = [item.get('text', '') for item in line_items]
+        
+        # Xác định alignment
+        alignment = 'left'
+        if img_width and img_width > 0:
+            alignment = classify_alignment(line_lefts[line_no], line_rights[line_no], img_width, line_texts[0])
+        
+        # Format text với spacing dựa trên bounding boxes
+        if len(line_order) > 1:
+            spacings = xs[line_order[1:]] - right_edges[line_order[:-1]]
+            formatted_line = join_line_parts(line_texts, spacing_to_spaces(spacings))
+        else:
+            formatted_line = join_line_parts(line_texts)
+        
+        # Đảm bảo không mất text - nếu formatted_line rỗng nhưng có text, dùng text gốc
+        if not formatted_line or not formatted_line.strip():
+            fallback_text = ' '.join([text for text in line_texts if text])
+            if fallback_text:
+                formatted_line = fallback_text
+        
+        if formatted_line:  # Chỉ append nếu có text
+            line_confidence = sum([item['confidence'] for item in line_items]) / len(line_items)
+            texts.append(formatted_line)
+            confidences.append(line_confidence)
+            lines_with_alignment.append({
+                'text': formatted_line,
+                'alignment': alignment,
+                'confidence': line_confidence  # Dùng để quyết định dòng nào cần sửa chính tả
+            })
+
+    return texts, confidences, lines_with_alignment
+
 def ocr_image(image, use_preprocessing=False):
     """
     OCR một ảnh với PaddleOCR - Giữ layout (tables, columns, spacing)
     ĐẢM BẢO KHÔNG MẤT CHỮ - Default: TẮT preprocessing để không làm mất text
+    
+    Args:
+        image: PIL Image hoặc numpy array BGR uint8 (H, W, 3)
     """
     try:
-        # Đảm bảo image là PIL Image object
-        if not isinstance(image, Image.Image):
-            raise Exception("Image must be PIL Image object")
-        
         # Preprocess NHẸ nếu cần - Default TẮT để không làm mất chữ
         if use_preprocessing:
-            print("⚠️  Preprocessing enabled - có thể ảnh hưởng đến chất lượng text")
+            log.debug("⚠️  Preprocessing enabled - có thể ảnh hưởng đến chất lượng text")
+            if isinstance(image, np.ndarray):
+                image = bgr_to_pil(to_bgr_array(image))
             image = preprocess_image_for_ocr(image)
         
-        # Đảm bảo image là RGB mode - QUAN TRỌNG
-        if image.mode != 'RGB':
-            if image.mode == 'RGBA':
-                # Tạo background trắng cho RGBA
-                rgb_image = Image.new('RGB', image.size, (255, 255, 255))
-                alpha = image.split()[3] if len(image.split()) >= 4 else None
-                if alpha:
-                    rgb_image.paste(image, mask=alpha)
-                else:
-                    rgb_image.paste(image)
-                image = rgb_image
-            elif image.mode in ('L', 'P', 'LA', 'PA'):
-                # Grayscale hoặc palette -> convert to RGB
-                image = image.convert('RGB')
-            else:
-                # Các mode khác -> convert to RGB
-                image = image.convert('RGB')
-        
-        # Convert PIL Image to numpy array
-        # PIL Image (RGB) -> numpy array (RGB format)
-        img_array = np.array(image, dtype=np.uint8)
-        
-        # Validate img_array shape
-        if len(img_array.shape) != 3 or img_array.shape[2] != 3:
-            raise Exception(f"Invalid image array shape after conversion: {img_array.shape}, expected (H, W, 3)")
-        
-        # PaddleOCR expects BGR format (OpenCV standard)
-        # Convert RGB to BGR
-        img_array = cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
-        
-        # Final validation - đảm bảo là uint8
-        if img_array.dtype != np.uint8:
-            img_array = img_array.astype(np.uint8)
+        # Chuẩn hóa về numpy BGR uint8 (PaddleOCR expects BGR - OpenCV standard)
+        # - numpy BGR (từ iter_pdf_pages): dùng trực tiếp, không copy
+        # - PIL Image: convert RGB -> BGR
+        img_array = to_bgr_array(image)
         
         # Validate shape one more time
         if len(img_array.shape) != 3 or img_array.shape[2] != 3:
@@ -613,12 +1143,17 @@ def ocr_image(image, use_preprocessing=False):
             raise Exception("Image array is empty")
         
         # Perform OCR - ĐẢM BẢO KHÔNG MẤT CHỮ
-        result = ocr_engine.ocr(img_array, cls=True)
+        # PaddleOCR predictor không thread-safe -> serialize các lời gọi trong cùng process
+        with timed_stage('ocr', log):
+            if OCR_BATCHING:
+                result = batched_ocr(img_array)
+            else:
+                with engine_slot():
+                    result = get_ocr_engine().ocr(img_array, cls=True)
         
         # Debug: Log kết quả OCR
         if result:
-            total_detected = len(result[0]) if result[0] else 0
-            print(f"📊 PaddleOCR detected {total_detected} text items")
+            log.debug("📊 PaddleOCR detected %d text items", len(result[0]) if result[0] else 0)
         
         # Extract text với layout preservation - ĐẢM BẢO KHÔNG MẤT CHỮ
         texts = []
@@ -670,17 +1205,16 @@ def ocr_image(image, use_preprocessing=False):
                         })
                         total_items += 1
                     except Exception as e:
-                        print(f"⚠️  Lỗi khi extract text từ line: {str(e)}, line: {line}")
+                        log.warning("⚠️  Lỗi khi extract text từ line: %s, line: %r", e, line)
                         skipped_items += 1
                         continue
             
-            print(f"📊 OCR Extraction Stats:")
-            print(f"   ✅ Extracted: {total_items} items")
-            print(f"   ⚠️  Skipped: {skipped_items} items (empty text)")
-            print(f"   📈 Success rate: {(total_items / len(result[0]) * 100) if result[0] else 0:.1f}%")
-            
-            # Sort by Y position (top to bottom), then X (left to right)
-            lines_sorted.sort(key=lambda x: (round(x['y'] / 10) * 10, x['x']))
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("📊 OCR Extraction Stats", extra={
+                    'extracted_items': total_items,
+                    'skipped_items': skipped_items,  # empty text
+                    'success_rate': round(total_items / len(result[0]) * 100, 1) if result[0] else 0
+                })
             
             # Get image width từ image size - QUAN TRỌNG cho alignment detection
             img_width = img_array.shape[1] if len(img_array.shape) > 1 else None
@@ -698,61 +1232,8 @@ def ocr_image(image, use_preprocessing=False):
                     img_width = 1000  # Default fallback
             
             # Group into lines and preserve layout với alignment
-            current_line_items = []
-            current_line_y = None
-            lines_with_alignment = []  # Store lines with alignment info
-            
-            for item in lines_sorted:
-                # Group items on same line (Y position similar)
-                # Tăng threshold để group tốt hơn và không mất text
-                if current_line_y is None or abs(item['y'] - current_line_y) < 20:
-                    current_line_items.append(item)
-                    if current_line_y is None:
-                        current_line_y = item['y']
-                else:
-                    # New line - format previous line với layout và alignment
-                    if current_line_items:
-                        formatted_result = format_line_with_spacing(current_line_items, img_width)
-                        formatted_line = formatted_result.get('text', '')
-                        alignment = formatted_result.get('alignment', 'left')
-                        
-                        # Đảm bảo không mất text - nếu formatted_line rỗng nhưng có text, dùng text gốc
-                        if not formatted_line or not formatted_line.strip():
-                            # Fallback: join tất cả text từ items
-                            fallback_text = ' '.join([item['text'] for item in current_line_items if item.get('text')])
-                            if fallback_text:
-                                formatted_line = fallback_text
-                        
-                        if formatted_line:  # Chỉ append nếu có text
-                            texts.append(formatted_line)
-                            confidences.append(sum([i['confidence'] for i in current_line_items]) / len(current_line_items))
-                            lines_with_alignment.append({
-                                'text': formatted_line,
-                                'alignment': alignment
-                            })
-                    
-                    current_line_items = [item]
-                    current_line_y = item['y']
-            
-            # Process last line
-            if current_line_items:
-                formatted_result = format_line_with_spacing(current_line_items, img_width)
-                formatted_line = formatted_result.get('text', '')
-                alignment = formatted_result.get('alignment', 'left')
-                
-                # Đảm bảo không mất text
-                if not formatted_line or not formatted_line.strip():
-                    fallback_text = ' '.join([item['text'] for item in current_line_items if item.get('text')])
-                    if fallback_text:
-                        formatted_line = fallback_text
-                
-                if formatted_line:  # Chỉ append nếu có text
-                    texts.append(formatted_line)
-                    confidences.append(sum([i['confidence'] for i in current_line_items]) / len(current_line_items))
-                    lines_with_alignment.append({
-                        'text': formatted_line,
-                        'alignment': alignment
-                    })
+            with timed_stage('line_grouping', log, items=len(lines_sorted)):
+                texts, confidences, lines_with_alignment = group_items_into_lines(lines_sorted, img_width)
         
         full_text = "\n".join(texts)
         avg_confidence = sum(confidences) / len(confidences) * 100 if confidences else 0
@@ -766,9 +1247,150 @@ def ocr_image(image, use_preprocessing=False):
     except Exception as e:
         raise Exception(f"Lỗi khi OCR ảnh: {str(e)}")
 
-def process_pdf(file_buffer, force_ocr=True, use_text_correction=True):
+# Factory engine cho worker process (None = create_ocr_engine) - tool như benchmark_e2e --fake-engine
+# thay bằng engine khác; phải pickle được (truyền sang worker qua initargs)
+ocr_worker_engine_factory = None
+
+def _init_ocr_worker(engine_factory=None):
+    """
+    Chạy một lần trong mỗi worker process - tạo PaddleOCR instance RIÊNG cho worker
+    (không dùng chung engine của process cha)
     """
-    Xử lý PDF file - MẶC ĐỊNH LUÔN DÙNG OCR để đảm bảo chất lượng và nhất quán
+    global _worker_warm
+    engines.set(OCR_ENGINE_NAME, (engine_factory or create_ocr_engine)(cpu_threads=OCR_WORKER_CPU_THREADS))
+    _worker_warm = False  # Cờ có thể kế thừa từ process cha (start method fork) - engine này chưa warm-up
+
+_worker_warm = False
+
+def _warm_up_in_worker():
+    """Task warm-up gửi vào worker pool -> (pid, timings) - None nếu worker này đã warm-up"""
+    global _worker_warm
+    if _worker_warm:
+        return os.getpid(), None
+    _worker_warm = True
+    return os.getpid(), warm_up_ocr_engine(get_ocr_engine())
+
+def _ocr_page_in_worker(image):
+    """OCR một trang trong worker process - kèm thời gian từng stage để process cha ghi metrics"""
+    with collect_stage_timings() as timings:
+        result = ocr_image(image, use_preprocessing=False)  # TẮT preprocessing để không mất chữ
+    result['stage_timings'] = timings.as_seconds()
+    return result
+
+_ocr_worker_pool = None
+
+def get_ocr_worker_pool():
+    """Lazy tạo worker pool (None nếu OCR_WORKERS <= 1 - xử lý tuần tự)"""
+    global _ocr_worker_pool
+    if OCR_WORKERS <= 1:
+        return None
+    if _ocr_worker_pool is None:
+        log.info("🔧 Khởi tạo OCR worker pool: %d worker, %d CPU thread/worker, start method %s",
+                 OCR_WORKERS, OCR_WORKER_CPU_THREADS, OCR_WORKER_START_METHOD or default_start_method())
+        _ocr_worker_pool = OCRWorkerPool(
+            _ocr_page_in_worker,
+            initializer=_init_ocr_worker,
+            initargs=(ocr_worker_engine_factory,),
+            max_workers=OCR_WORKERS,
+            max_pending=OCR_POOL_MAX_PENDING,
+            start_method=OCR_WORKER_START_METHOD
+        )
+    return _ocr_worker_pool
+
+def make_page_cache_key(img_array):
+    """Page cache key = hash nội dung ảnh đã render + config engine"""
+    img_array = np.ascontiguousarray(img_array)
+    return make_cache_key(
+        memoryview(img_array).cast('B'),
+        shape=img_array.shape,
+        engine=PADDLE_OCR_CONFIG,
+        preprocessing=False
+    )
+
+def ocr_pages(images, page_stats=None):
+    """
+    OCR các trang theo thứ tự - yield (idx, result, error)
+    - Trang là CompletedPage (ví dụ lấy từ text layer) -> dùng kết quả có sẵn
+    - Trang đã có trong page cache (cùng nội dung render) -> lấy kết quả cache, không OCR lại
+    - OCR_WORKERS > 1: chạy song song trên worker pool
+    - Ngược lại: OCR tuần tự với engine chung
+    Lỗi của từng trang được trả về qua error, không raise
+    
+    Args:
+        images: Iterable các trang (numpy BGR / PIL Image / CompletedPage)
+        page_stats: Dict (optional) để ghi 'cached_pages' / 'text_layer_pages' / 'ocr_pages'
+    """
+    if page_stats is None:
+        page_stats = {}
+    page_stats.setdefault('cached_pages', 0)
+    page_stats.setdefault('text_layer_pages', 0)
+    page_stats.setdefault('ocr_pages', 0)
+    pending_keys = {}
+    page_sources = {}
+    
+    def with_page_cache(images):
+        for idx, img in enumerate(images):
+            if isinstance(img, CompletedPage):
+                page_sources[idx] = img.source
+                yield img
+                continue
+            if PAGE_CACHE_MAX_ENTRIES <= 0:
+                yield img
+                continue
+            key = make_page_cache_key(img) if isinstance(img, np.ndarray) else None
+            cached = page_cache.get(key) if key else None
+            if cached is not None:
+                page_sources[idx] = 'cache'
+                # Copy để caller có thể sửa kết quả mà không ảnh hưởng cache
+                yield CompletedPage(copy.deepcopy(cached))
+                continue
+            if key:
+                pending_keys[idx] = key
+            yield img
+    
+    pool = get_ocr_worker_pool()
+    if pool is not None:
+        results = pool.map_pages(with_page_cache(images))
+    else:
+        results = _ocr_pages_sequential(with_page_cache(images))
+    
+    for idx, result, ocr_err in results:
+        # Trang OCR trong worker process: ghi thời gian stage (đo trong worker) vào metrics của process này
+        worker_timings = result.pop('stage_timings', None) if isinstance(result, dict) else None
+        if worker_timings:
+            for stage, seconds in worker_timings.items():
+                record_stage(stage, seconds)
+            engine_busy.add(worker_timings.get('ocr', 0.0))
+        source = page_sources.pop(idx, 'ocr')
+        if source == 'cache':
+            page_stats['cached_pages'] += 1
+        elif source == 'text_layer':
+            page_stats['text_layer_pages'] += 1
+        else:
+            page_stats['ocr_pages'] += 1
+        key = pending_keys.pop(idx, None)
+        if key is not None and ocr_err is None and result is not None:
+            page_cache.put(key, copy.deepcopy(result))
+        yield idx, result, ocr_err
+
+def _ocr_pages_sequential(images):
+    """OCR tuần tự với engine chung - yield (idx, result, error)"""
+    for idx, img in enumerate(images):
+        if isinstance(img, CompletedPage):
+            yield idx, img.result, None
+            continue
+        try:
+            yield idx, ocr_image(img, use_preprocessing=False), None  # TẮT preprocessing để không mất chữ
+        except Exception as ocr_err:
+            yield idx, None, ocr_err
+
+def process_pdf(file_buffer, force_ocr=True, use_text_correction=True, progress_callback=None):
+    """
+    Xử lý PDF file
+    - force_ocr=True: LUÔN DÙNG OCR cho mọi trang (nhất quán)
+    - force_ocr=False: hybrid - trang có text layer tiếng Việt dùng được lấy text trực tiếp
+      (kèm toạ độ để giữ alignment), chỉ trang scan/ảnh mới chạy PaddleOCR
+    - progress_callback(processed_pages, total_pages): gọi sau mỗi trang (optional)
     """
     start_time = time.time()
     
@@ -779,31 +1401,34 @@ def process_pdf(file_buffer, force_ocr=True, use_text_correction=True):
     elif not isinstance(file_buffer, bytes):
         file_buffer = bytes(file_buffer)
     
-    # LUÔN DÙNG OCR - không tự động chuyển sang direct extraction
-    print("📄 Đang xử lý PDF bằng OCR...")
-    
+    doc = None
+    pages = None
     try:
-        # Convert PDF to images
-        images = pdf_to_images(file_buffer)
-        print(f"Đã chuyển đổi {len(images)} trang sang ảnh")
+        # Render PDF -> ảnh theo kiểu STREAMING: trang được render trên background thread
+        # ngay trong lúc OCR trang trước, chỉ giữ tối đa PDF_RENDER_PREFETCH trang chờ trong memory
+        doc = open_pdf_document(file_buffer)
+        total_pages = len(doc)
+        render_failed_pages = []
+        log.info("📄 PDF có %d trang, đang render và OCR từng trang...", total_pages,
+                 extra={'total_pages': total_pages, 'mode': 'ocr' if force_ocr else 'hybrid'})
+        pages = prefetch(iter_pdf_pages(doc, render_failed_pages, text_layer=not force_ocr), PDF_RENDER_PREFETCH)
         
-        # OCR từng trang và gọi ProtonX sửa chính tả ngay sau mỗi trang
+        # OCR từng trang, gửi sửa chính tả chạy nền ngay sau mỗi trang (song song với OCR trang sau)
         # Xử lý từng trang với error handling riêng - nếu một trang lỗi, skip và tiếp tục
         all_texts = []
         all_confidences = []
         failed_pages = []
+        page_count = 0
+        page_stats = {}
+        pending_corrections = []  # (vị trí trong all_texts, idx trang, text gốc, Future)
         
-        for idx, img in enumerate(images):
+        for idx, result, ocr_err in ocr_pages(pages, page_stats):
+            page_count += 1
             try:
-                print(f"\n[{idx + 1}/{len(images)}] Đang OCR trang {idx + 1}...")
+                log.debug("Đã OCR trang", extra={'page': idx + 1, 'total_pages': total_pages})
                 
-                # OCR trang này - đảm bảo image được copy để tránh reference issues
-                try:
-                    # Copy image để đảm bảo độc lập
-                    img_copy = img.copy() if hasattr(img, 'copy') else img
-                    result = ocr_image(img_copy, use_preprocessing=False)  # TẮT preprocessing để không mất chữ
-                except Exception as ocr_err:
-                    print(f"  ⚠️  Lỗi khi OCR trang {idx + 1}: {str(ocr_err)}")
+                if ocr_err is not None:
+                    log.warning("⚠️  Lỗi khi OCR trang: %s", ocr_err, extra={'page': idx + 1})
                     failed_pages.append(idx + 1)
                     all_texts.append(f"--- Trang {idx + 1} ---\n[Lỗi khi OCR trang này: {str(ocr_err)}]")
                     all_confidences.append(0.0)
@@ -813,38 +1438,73 @@ def process_pdf(file_buffer, force_ocr=True, use_text_correction=True):
                     page_text = result['text']
                     
                     # Gọi API ngay sau khi OCR xong từng trang để sửa chính tả
-                    if use_text_correction:
-                        try:
-                            print(f"  → Gọi Text Correction API để sửa chính tả tiếng Việt trang {idx + 1}...")
-                            corrected_page_text = correct_vietnamese_text(page_text, use_correction=True)
-                            print(f"  ✅ Đã sửa chính tả trang {idx + 1} xong")
-                            all_texts.append(f"--- Trang {idx + 1} ---\n{corrected_page_text}")
-                        except Exception as correction_err:
-                            print(f"  ⚠️  Lỗi khi sửa chính tả trang {idx + 1}: {str(correction_err)}, giữ nguyên text gốc")
-                            all_texts.append(f"--- Trang {idx + 1} ---\n{page_text}")
+                    # Trang lấy từ text layer là text gốc của PDF -> không cần sửa chính tả
+                    if result.get('source') == 'text_layer':
+                        all_texts.append(f"--- Trang {idx + 1} ---\n{page_text}")
+                    elif use_text_correction:
+                        # Gửi correction chạy nền, OCR tiếp trang sau; ghép lại theo thứ tự trang ở cuối
+                        log.debug("→ Gửi Text Correction API để sửa chính tả tiếng Việt", extra={'page': idx + 1})
+                        future = correction_client.submit_task(
+                            correct_ocr_text, page_text, result.get('lines_with_alignment')
+                        )
+                        pending_corrections.append((len(all_texts), idx, page_text, future))
+                        all_texts.append(None)
                     else:
-                        print(f"  ⚠️  Text Correction đã bị tắt, giữ nguyên text gốc trang {idx + 1}")
+                        log.debug("Text Correction đã bị tắt, giữ nguyên text gốc", extra={'page': idx + 1})
                         all_texts.append(f"--- Trang {idx + 1} ---\n{page_text}")
                     
                     all_confidences.append(result.get('confidence', 0.0))
                 else:
-                    print(f"  ⚠️  Trang {idx + 1} không có text được detect")
+                    log.debug("⚠️  Trang không có text được detect", extra={'page': idx + 1})
                     all_texts.append(f"--- Trang {idx + 1} ---\n[Không có text được phát hiện]")
                     all_confidences.append(0.0)
                     
             except Exception as page_err:
-                print(f"  ❌ Lỗi khi xử lý trang {idx + 1}: {str(page_err)}")
+                log.error("❌ Lỗi khi xử lý trang: %s", page_err, extra={'page': idx + 1})
                 failed_pages.append(idx + 1)
                 all_texts.append(f"--- Trang {idx + 1} ---\n[Lỗi: {str(page_err)}]")
                 all_confidences.append(0.0)
                 continue
+            finally:
+                if progress_callback:
+                    progress_callback(page_count, total_pages)
+        
+        # Chờ các correction đang chạy nền và ghép lại đúng thứ tự trang
+        correction_skipped_pages = []
+        correction_stats = {'corrected_lines': 0, 'skipped_lines': 0}
+        for position, idx, page_text, future in pending_corrections:
+            try:
+                corrected_page_text, page_correction_stats = future.result()
+                for key, value in page_correction_stats.items():
+                    correction_stats[key] += value
+                log.debug("✅ Đã sửa chính tả trang xong", extra=dict(page_correction_stats, page=idx + 1))
+            except CorrectionSkipped as skip_err:
+                log.warning("⚠️  Bỏ qua sửa chính tả: %s, giữ nguyên text gốc", skip_err, extra={'page': idx + 1})
+                correction_skipped_pages.append(idx + 1)
+                corrected_page_text = page_text
+            except Exception as correction_err:
+                log.warning("⚠️  Lỗi khi sửa chính tả: %s, giữ nguyên text gốc", correction_err, extra={'page': idx + 1})
+                corrected_page_text = page_text
+            all_texts[position] = f"--- Trang {idx + 1} ---\n{corrected_page_text}"
+        
+        if render_failed_pages:
+            log.warning("⚠️  %d trang không thể chuyển sang ảnh", len(render_failed_pages),
+                        extra={'failed_pages': render_failed_pages})
+        
+        if page_count == 0:
+            raise Exception("Không thể chuyển bất kỳ trang nào sang ảnh")
         
-        # Log kết quả
-        success_pages = len(images) - len(failed_pages)
-        print(f"\n📊 Kết quả xử lý PDF:")
-        print(f"   ✅ Thành công: {success_pages}/{len(images)} trang")
-        if failed_pages:
-            print(f"   ⚠️  Lỗi: {len(failed_pages)} trang ({', '.join(map(str, failed_pages))})")
+        # Log kết quả - một dòng cho cả request
+        success_pages = page_count - len(failed_pages)
+        log.info("📊 Kết quả xử lý PDF: %d/%d trang thành công", success_pages, page_count, extra={
+            'pages': page_count,
+            'success_pages': success_pages,
+            'failed_pages': failed_pages or None,
+            'cached_pages': page_stats.get('cached_pages', 0),
+            'text_layer_pages': page_stats.get('text_layer_pages', 0),
+            'ocr_pages': page_stats.get('ocr_pages', 0),
+            'duration_ms': round((time.time() - start_time) * 1000, 2)
+        })
         
         # Kết hợp tất cả các trang đã được sửa chính tả
         combined_text = "\n\n".join(all_texts)
@@ -852,33 +1512,41 @@ def process_pdf(file_buffer, force_ocr=True, use_text_correction=True):
         # PHÂN TÁCH: text (text thuần) và html (HTML)
         # Nếu combined_text có HTML tags -> extract text thuần và giữ HTML
         # Nếu combined_text là text thuần -> giữ text và convert sang HTML
-        has_html_tags = '<' in combined_text and '>' in combined_text and re.search(r'<[^>]+>', combined_text)
-        
-        if has_html_tags:
-            # Text đang chứa HTML -> extract text thuần
-            plain_text = extract_text_from_html(combined_text)
-            html_content = combined_text
-        else:
-            # Text thuần -> convert sang HTML (không có alignment info từ PDF extraction)
-            plain_text = combined_text
-            html_content = text_to_html_paragraphs(combined_text)
+        with timed_stage('html_build'):
+            has_html_tags = '<' in combined_text and '>' in combined_text and re.search(r'<[^>]+>', combined_text)
+            
+            if has_html_tags:
+                # Text đang chứa HTML -> extract text thuần
+                plain_text = extract_text_from_html(combined_text)
+                html_content = combined_text
+            else:
+                # Text thuần -> convert sang HTML (không có alignment info từ PDF extraction)
+                plain_text = combined_text
+                html_content = text_to_html_paragraphs(combined_text)
         
         avg_confidence = sum(all_confidences) / len(all_confidences) if all_confidences else 0
         processing_time = time.time() - start_time
         
         # Tính số trang thành công
-        success_pages = len(images) - len(failed_pages) if failed_pages else len(images)
+        success_pages = page_count - len(failed_pages) if failed_pages else page_count
         
         result = {
             'success': True,
             'text': plain_text,  # Text thuần (không có HTML tags)
             'html': html_content,  # HTML (có HTML tags)
-            'pages': len(images),
+            'pages': page_count,
             'success_pages': success_pages,
             'failed_pages': failed_pages if failed_pages else [],
             'confidence': avg_confidence,
-            'method': 'ocr',
+            'method': 'hybrid' if page_stats.get('text_layer_pages') else 'ocr',
             'text_correction': use_text_correction,
+            'correction_skipped': bool(correction_skipped_pages),
+            'correction_skipped_pages': correction_skipped_pages,
+            'corrected_lines': correction_stats['corrected_lines'],
+            'skipped_lines': correction_stats['skipped_lines'],
+            'cached_pages': page_stats.get('cached_pages', 0),
+            'text_layer_pages': page_stats.get('text_layer_pages', 0),
+            'ocr_pages': page_stats.get('ocr_pages', 0),
             'processing_time': f"{processing_time:.2f}s",
             'text_length': len(plain_text),
             'word_count': len(plain_text.split())
@@ -887,6 +1555,8 @@ def process_pdf(file_buffer, force_ocr=True, use_text_correction=True):
         # Nếu có trang lỗi, vẫn trả về success nhưng có warning
         if failed_pages:
             result['warning'] = f"Một số trang ({len(failed_pages)} trang) không thể xử lý được"
+        elif correction_skipped_pages:
+            result['warning'] = f"Text Correction API không khả dụng - {len(correction_skipped_pages)} trang giữ nguyên text OCR"
         
         return result
     except Exception as e:
@@ -898,6 +1568,15 @@ def process_pdf(file_buffer, force_ocr=True, use_text_correction=True):
             'processing_time': f"{processing_time:.2f}s",
             'method': 'ocr_failed'
         }
+    finally:
+        # Dừng render thread TRƯỚC khi đóng document
+        if pages is not None:
+            pages.close()
+        if doc is not None:
+            try:
+                doc.close()
+            except:
+                pass
 
 def process_image(file_buffer, use_text_correction=True):
     """
@@ -924,33 +1603,40 @@ def process_image(file_buffer, use_text_correction=True):
         lines_with_alignment = result.get('lines_with_alignment', [])
         
         # LUÔN áp dụng text correction nếu enabled
+        correction_skipped = False
+        correction_stats = {'corrected_lines': 0, 'skipped_lines': 0}
         if use_text_correction:
-            print("Đang gọi Text Correction API để sửa chính tả tiếng Việt (image OCR)...")
-            text = correct_vietnamese_text(text, use_correction=True)
-            # Cập nhật text trong lines_with_alignment sau khi correction
-            # (giữ nguyên alignment, chỉ update text)
-            corrected_lines = text.split('\n')
-            for i, line_info in enumerate(lines_with_alignment):
-                if i < len(corrected_lines):
-                    line_info['text'] = corrected_lines[i]
+            try:
+                text, correction_stats = correct_ocr_text(text, lines_with_alignment)
+                log.debug("✅ Đã sửa chính tả (image OCR)", extra=correction_stats)
+                # Cập nhật text trong lines_with_alignment sau khi correction
+                # (giữ nguyên alignment, chỉ update text)
+                corrected_lines = text.split('\n')
+                for i, line_info in enumerate(lines_with_alignment):
+                    if i < len(corrected_lines):
+                        line_info['text'] = corrected_lines[i]
+            except CorrectionSkipped as e:
+                log.warning("⚠️  Bỏ qua Text Correction: %s, giữ nguyên text gốc", e)
+                correction_skipped = True
         else:
-            print("⚠️  Text Correction đã bị tắt, giữ nguyên text gốc")
+            log.debug("Text Correction đã bị tắt, giữ nguyên text gốc")
         
         processing_time = time.time() - start_time
         
         # PHÂN TÁCH: text (text thuần) và html (HTML)
         # Nếu text có HTML tags -> extract text thuần và giữ HTML
         # Nếu text là text thuần -> giữ text và convert sang HTML với alignment
-        has_html_tags = '<' in text and '>' in text and re.search(r'<[^>]+>', text)
-        
-        if has_html_tags:
-            # Text đang chứa HTML -> extract text thuần
-            plain_text = extract_text_from_html(text)
-            html_content = text
-        else:
-            # Text thuần -> convert sang HTML với alignment
-            plain_text = text
-            html_content = text_to_html_paragraphs_with_alignment(text, lines_with_alignment)
+        with timed_stage('html_build'):
+            has_html_tags = '<' in text and '>' in text and re.search(r'<[^>]+>', text)
+            
+            if has_html_tags:
+                # Text đang chứa HTML -> extract text thuần
+                plain_text = extract_text_from_html(text)
+                html_content = text
+            else:
+                # Text thuần -> convert sang HTML với alignment
+                plain_text = text
+                html_content = text_to_html_paragraphs_with_alignment(text, lines_with_alignment)
         
         result_data = {
             'success': True,
@@ -959,11 +1645,17 @@ def process_image(file_buffer, use_text_correction=True):
             'confidence': result['confidence'],
             'method': 'ocr',
             'text_correction': use_text_correction,
+            'correction_skipped': correction_skipped,
+            'corrected_lines': correction_stats['corrected_lines'],
+            'skipped_lines': correction_stats['skipped_lines'],
             'processing_time': f"{processing_time:.2f}s",
             'text_length': len(plain_text),
             'word_count': len(plain_text.split())
         }
         
+        if correction_skipped:
+            result_data['warning'] = "Text Correction API không khả dụng - giữ nguyên text OCR"
+        
         return result_data
     except Exception as e:
         processing_time = time.time() - start_time
@@ -975,6 +1667,21 @@ def process_image(file_buffer, use_text_correction=True):
             'method': 'ocr_failed'
         }
 
+def make_result_cache_key(file_buffer, is_pdf, use_text_correction, force_ocr=True):
+    """Cache key cho /extract-text - gồm mọi option ảnh hưởng đến output"""
+    return make_cache_key(
+        file_buffer,
+        kind='pdf' if is_pdf else 'image',
+        use_text_correction=use_text_correction,
+        render_scale=PDF_RENDER_SCALE if is_pdf else None,
+        force_ocr=force_ocr if is_pdf else None,
+        engine=PADDLE_OCR_CONFIG,
+        text_correction_api=TEXT_CORRECTION_API_URL if use_text_correction else None,
+        # Gating / memo đổi cách gửi text đi sửa (output có thể khác khi gửi cả trang)
+        text_correction_mode=text_correction_mode() if use_text_correction else None,
+        correction_threshold=CORRECTION_CONFIDENCE_THRESHOLD if (use_text_correction and CORRECTION_CONFIDENCE_GATING) else None
+    )
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
@@ -983,79 +1690,122 @@ def health():
         'status': 'healthy',
         'message': 'OCR service đang hoạt động bình thường',
         'engine': 'PaddleOCR',
+        'engine_status': engine_state['status'],
+        'engine_warm': engine_state['warm'],
         'language': 'Vietnamese (vi)',
         'text_correction': {
             'available': TEXT_CORRECTION_AVAILABLE,
             'method': 'api',
             'api_url': TEXT_CORRECTION_API_URL if TEXT_CORRECTION_AVAILABLE else None,
+            'circuit_breaker': correction_breaker.stats(),
+            'memo': correction_memo.stats() if correction_memo else None,
             'description': 'Sau khi PaddleOCR lấy text → Gọi API để sửa chính tả tiếng Việt chuẩn' if TEXT_CORRECTION_AVAILABLE else None
         },
+        'cache': result_cache.stats(),
+        'page_cache': page_cache.stats(),
+        'jobs': job_manager.stats(),
+        'recognition_batching': get_recognition_batcher().stats() if OCR_BATCHING else None,
         'supported_formats': list(ALLOWED_EXTENSIONS)
     })
 
-@app.route('/extract-text', methods=['POST'])
-def extract_text():
+@app.route('/ready', methods=['GET'])
+def ready():
     """
-    Extract text from PDF or Image
-    POST /extract-text
-    FormData: file (PDF or Image), forceOCR (optional), language (optional)
+    Readiness probe (load balancer / Kubernetes): 200 khi engine đã load và warm-up xong, 503 khi chưa
+    warm: engine đã warm-up (False khi ENGINE_WARMUP=false - ready nhưng cold)
+    /health chỉ cho biết process còn sống (liveness)
     """
-    try:
-        # Check if file is present
-        if 'file' not in request.files:
-            return jsonify({
-                'success': False,
-                'message': 'Không có file được upload'
-            }), 400
-        
-        file = request.files['file']
-        
-        if file.filename == '':
-            return jsonify({
-                'success': False,
-                'message': 'Không có file được chọn'
-            }), 400
-        
-        # Check file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-        
-        if file_size > MAX_FILE_SIZE:
-            return jsonify({
-                'success': False,
-                'message': f'File quá lớn. Kích thước tối đa: {MAX_FILE_SIZE / 1024 / 1024}MB'
-            }), 400
-        
-        # Read file to buffer first (need to check content type)
-        # Reset file pointer trước khi đọc
+    is_ready = engine_state['status'] == 'ready'
+    return jsonify({
+        'ready': is_ready,
+        'warm': engine_state['warm'],
+        'engine': dict(engine_state),
+        'pid': os.getpid()
+    }), 200 if is_ready else 503
+
+# Gauge lấy giá trị lúc scrape: hàng đợi job, correction đang bay, batcher, circuit breaker
+REGISTRY.gauge('ocr_jobs_queued', 'Số job /jobs đang chờ (queue depth)').set_function(
+    lambda: job_manager.stats()['queued'])
+REGISTRY.gauge('ocr_jobs_running', 'Số job /jobs đang chạy').set_function(
+    lambda: job_manager.stats()['running'])
+REGISTRY.gauge('ocr_correction_in_flight', 'Số task sửa chính tả đang chạy nền').set_function(
+    lambda: correction_client.in_flight)
+REGISTRY.gauge('ocr_recognition_batch_queue', 'Số request chờ RecognitionBatcher').set_function(
+    lambda: get_recognition_batcher().stats()['queued_requests'] if OCR_BATCHING else None)
+REGISTRY.gauge('ocr_correction_breaker_open', '1 nếu circuit breaker Text Correction đang open').set_function(
+    lambda: 1 if correction_breaker.stats()['state'] == 'open' else 0)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Metrics dạng Prometheus text (histogram thời gian từng stage, in-flight, queue depth, engine busy)"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+def parse_extract_request():
+    """
+    Đọc và validate file upload + options (dùng chung cho /extract-text và /jobs)
+    
+    Returns:
+        Tuple (error_response, params)
+        - error_response: (response, status_code) nếu request không hợp lệ, ngược lại None
+        - params: dict {'file_buffer', 'is_pdf', 'use_text_correction', 'force_ocr'}
+    """
+    # Check if file is present
+    if 'file' not in request.files:
+        return (jsonify({
+            'success': False,
+            'message': 'Không có file được upload'
+        }), 400), None
+    
+    file = request.files['file']
+    
+    if file.filename == '':
+        return (jsonify({
+            'success': False,
+            'message': 'Không có file được chọn'
+        }), 400), None
+    
+    # Check file size
+    file.seek(0, os.SEEK_END)
+    file_size = file.tell()
+    file.seek(0)
+    
+    if file_size > MAX_FILE_SIZE:
+        return (jsonify({
+            'success': False,
+            'message': f'File quá lớn. Kích thước tối đa: {MAX_FILE_SIZE / 1024 / 1024}MB'
+        }), 400), None
+    
+    # Read file to buffer first (need to check content type)
+    # Reset file pointer trước khi đọc
+    with timed_stage('upload_read'):
         file.seek(0)
         file_buffer = file.read()
-        # Tạo BytesIO mới để đảm bảo clean state
-        file_buffer_io = io.BytesIO(file_buffer)
-        file_buffer_io.seek(0)
-        
-        # Check file type by content, not just extension (more flexible)
-        # Also check content-type header (Chrome PDF viewer might send application/pdf)
-        content_type = request.content_type or request.headers.get('Content-Type', '') or ''
-        filename_lower = (file.filename or '').lower()
-        
+    # Tạo BytesIO mới để đảm bảo clean state
+    file_buffer_io = io.BytesIO(file_buffer)
+    file_buffer_io.seek(0)
+    
+    # Check file type by content, not just extension (more flexible)
+    # Also check content-type header (Chrome PDF viewer might send application/pdf)
+    content_type = request.content_type or request.headers.get('Content-Type', '') or ''
+    filename_lower = (file.filename or '').lower()
+    
+    with timed_stage('type_sniffing'):
         # Check if it's PDF first (by content-type, filename, or content)
         is_pdf = False
         # Check content-type header (Chrome PDF viewer sends application/pdf)
         if 'application/pdf' in content_type:
             is_pdf = True
-            print(f"✅ Detected PDF by Content-Type: {content_type}")
+            log.debug("✅ Detected PDF by Content-Type: %s", content_type)
         elif filename_lower.endswith('.pdf'):
             # Check by content to verify
             is_pdf = is_pdf_file(file.filename, file_buffer_io)
             if is_pdf:
-                print(f"✅ Detected PDF by filename and content: {file.filename}")
+                log.debug("✅ Detected PDF by filename and content: %s", file.filename)
         else:
             # Check by content only
             is_pdf = is_pdf_file(file.filename, file_buffer_io)
             if is_pdf:
-                print(f"✅ Detected PDF by content (no extension): {file.filename}")
+                log.debug("✅ Detected PDF by content (no extension): %s", file.filename)
         
         # If not PDF, check if it's image
         is_image = False
@@ -1065,52 +1815,150 @@ def extract_text():
                 is_image = is_image_file(file.filename, file_buffer_io)
             else:
                 is_image = is_image_file(file.filename, file_buffer_io)
+    
+    if not is_pdf and not is_image:
+        # Try extension check as fallback
+        if not allowed_file(file.filename):
+            return (jsonify({
+                'success': False,
+                'message': f'File type không được hỗ trợ. Hỗ trợ: PDF và các định dạng ảnh (PNG, JPG, JPEG, GIF, BMP, WEBP, TIFF, etc.)'
+            }), 400), None
+    
+    # Get options
+    # Mặc định LUÔN bật text correction (chỉ tắt nếu explicitly set false)
+    use_text_correction_str = request.form.get('useTextCorrection', 'true').lower().strip()
+    use_text_correction = use_text_correction_str != 'false'  # Default: enabled (true nếu không phải 'false')
+    # PDF: mặc định hybrid (text layer + OCR) nếu PDF_TEXT_LAYER_FAST_PATH bật, forceOCR=true để OCR mọi trang
+    force_ocr_str = request.form.get('forceOCR', 'false' if PDF_TEXT_LAYER_FAST_PATH else 'true').lower().strip()
+    force_ocr = force_ocr_str == 'true'
+    
+    log.info("📝 Request OCR", extra={
+        'upload_filename': file.filename,
+        'bytes': file_size,
+        'type': 'pdf' if is_pdf else ('image' if is_image else None),
+        'text_correction': use_text_correction,
+        'force_ocr': force_ocr
+    })
+    
+    if not is_pdf and not is_image:
+        return (jsonify({
+            'success': False,
+            'message': 'Không thể xác định loại file. Vui lòng upload file PDF hoặc ảnh hợp lệ.'
+        }), 400), None
+    
+    return None, {
+        'file_buffer': file_buffer,
+        'is_pdf': is_pdf,
+        'use_text_correction': use_text_correction,
+        'force_ocr': force_ocr
+    }
+
+def run_extraction(file_buffer, is_pdf, use_text_correction=True, force_ocr=True, progress_callback=None,
+                   use_cache=True):
+    """
+    Chạy OCR cho file đã validate - có result cache
+    
+    Args:
+        progress_callback: Hàm (processed_pages, total_pages) được gọi sau mỗi trang (optional)
+        use_cache: False -> luôn xử lý lại, không đọc/ghi result cache (vd khi profile)
         
-        if not is_pdf and not is_image:
-            # Try extension check as fallback
-            if not allowed_file(file.filename):
-                return jsonify({
-                    'success': False,
-                    'message': f'File type không được hỗ trợ. Hỗ trợ: PDF và các định dạng ảnh (PNG, JPG, JPEG, GIF, BMP, WEBP, TIFF, etc.)'
-                }), 400
-        
-        # Get options
-        # Mặc định LUÔN dùng OCR (không cần force_ocr parameter nữa)
-        # Mặc định LUÔN bật text correction (chỉ tắt nếu explicitly set false)
-        use_text_correction_str = request.form.get('useTextCorrection', 'true').lower().strip()
-        use_text_correction = use_text_correction_str != 'false'  # Default: enabled (true nếu không phải 'false')
-        
-        # Log để debug
-        print(f"📝 Text Correction: {'ENABLED' if use_text_correction else 'DISABLED'} (from request: '{use_text_correction_str}')")
-        print(f"🔄 Method: LUÔN DÙNG OCR (nhất quán cho mọi file)")
-        
-        # Process based on detected file type (use content detection)
-        # LUÔN dùng OCR cho cả PDF và Image
-        if is_pdf:
-            result = process_pdf(file_buffer, force_ocr=True, use_text_correction=use_text_correction)
-        elif is_image:
-            result = process_image(file_buffer, use_text_correction=use_text_correction)
+    Returns:
+        Result dict (cùng format process_pdf / process_image)
+    """
+    with collect_stage_timings() as timings:
+        result = _run_extraction(file_buffer, is_pdf, use_text_correction, force_ocr, progress_callback, use_cache)
+    
+    # Thời gian từng stage của request (gồm cả stage chạy trên thread render / correction)
+    log.info("⏱️  Xử lý file xong", extra={
+        'kind': 'pdf' if is_pdf else 'image',
+        'cached': bool(result.get('cached')),
+        'success': bool(result.get('success')),
+        'stages_ms': timings.as_ms()
+    })
+    return result
+
+def _run_extraction(file_buffer, is_pdf, use_text_correction, force_ocr, progress_callback, use_cache):
+    """Phần xử lý của run_extraction (cache + process_pdf / process_image)"""
+    start_time = time.time()
+    
+    # Cache theo nội dung file + options - file đã xử lý trước đó trả về ngay
+    cache_key = None
+    if use_cache and RESULT_CACHE_MAX_ENTRIES > 0:
+        cache_key = make_result_cache_key(file_buffer, is_pdf, use_text_correction, force_ocr)
+        cached_result = result_cache.get(cache_key)
+        if cached_result is not None:
+            log.info("⚡ Cache hit - trả kết quả đã có", extra={'cache_key': cache_key[:12]})
+            result = dict(cached_result)
+            result['cached'] = True
+            result['processing_time'] = f"{time.time() - start_time:.2f}s"
+            if progress_callback:
+                pages = result.get('pages', 1)
+                progress_callback(pages, pages)
+            REQUEST_SECONDS.observe(time.time() - start_time, kind='pdf' if is_pdf else 'image', cached='true')
+            return result
+    
+    # Process based on detected file type (use content detection)
+    if is_pdf:
+        result = process_pdf(file_buffer, force_ocr=force_ocr, use_text_correction=use_text_correction,
+                             progress_callback=progress_callback)
+    else:
+        result = process_image(file_buffer, use_text_correction=use_text_correction)
+        if progress_callback:
+            progress_callback(1, 1)
+    REQUEST_SECONDS.observe(time.time() - start_time, kind='pdf' if is_pdf else 'image', cached='false')
+    
+    # Chỉ cache kết quả thành công trọn vẹn (không cache khi có trang lỗi hoặc bỏ qua correction - có thể là lỗi tạm thời)
+    if cache_key and result.get('success') and not result.get('failed_pages') and not result.get('correction_skipped'):
+        result_cache.put(cache_key, result)
+    
+    return result
+
+def requested_profile_mode():
+    """Mode profile mà request yêu cầu (field 'profile' trong form/query) - None nếu không profile"""
+    value = (request.form.get('profile') or request.args.get('profile') or '').lower().strip()
+    if not value or value == 'false':
+        return None
+    if not PROFILING_ENABLED:
+        log.warning("Request yêu cầu profile nhưng PROFILING_ENABLED=false - bỏ qua")
+        return None
+    if value not in PROFILE_MODES:
+        return PROFILING_MODE if PROFILING_MODE in PROFILE_MODES else 'sample'
+    return value
+
+@app.route('/extract-text', methods=['POST'])
+def extract_text():
+    """
+    Extract text from PDF or Image
+    POST /extract-text
+    FormData: file (PDF or Image), forceOCR (optional), language (optional),
+              profile (optional, cần PROFILING_ENABLED): true / sample / cprofile
+    """
+    try:
+        error_response, params = parse_extract_request()
+        if error_response is not None:
+            return error_response
+        
+        profile_mode = requested_profile_mode()
+        if profile_mode:
+            # Profile chạy lại toàn bộ xử lý (bỏ qua result cache) và trả artifact kèm kết quả
+            result, profile = profile_call(run_extraction, mode=profile_mode,
+                                           interval=PROFILING_SAMPLE_INTERVAL_MS / 1000, use_cache=False, **params)
+            result = dict(result)
+            result['profile'] = profile or {'mode': profile_mode, 'error': 'Đang có request khác được profile (sampling)'}
+            log.info("🔬 Đã profile request", extra={'profile_mode': profile_mode})
         else:
-            return jsonify({
-                'success': False,
-                'message': 'Không thể xác định loại file. Vui lòng upload file PDF hoặc ảnh hợp lệ.'
-            }), 400
+            result = run_extraction(**params)
         
         # Return result
         if result.get('success'):
-            # Debug: Check if HTML is in result
-            if 'html' in result:
-                print(f"✅ Returning result with HTML (length: {len(result['html'])})")
-            else:
-                print("⚠️  Returning result WITHOUT HTML")
+            if 'html' not in result:
+                log.warning("⚠️  Returning result WITHOUT HTML")
             return jsonify(result)
         else:
             return jsonify(result), 200  # Return 200 but with error in body
         
     except Exception as e:
-        print(f"Error in extract_text: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error in extract_text: %s", e)
         return jsonify({
             'success': False,
             'message': f'Đã xảy ra lỗi: {str(e)}',
@@ -1121,10 +1969,86 @@ def extract_text():
         import gc
         gc.collect()
 
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """
+    Tạo job OCR bất đồng bộ - trả về job id ngay
+    POST /jobs
+    FormData: giống /extract-text
+    Response: 202 {'job_id', 'status', ...} hoặc 429 nếu hàng đợi đầy
+    """
+    try:
+        error_response, params = parse_extract_request()
+        if error_response is not None:
+            return error_response
+        
+        metadata = {'filename': request.files['file'].filename, 'type': 'pdf' if params['is_pdf'] else 'image'}
+        try:
+            job = job_manager.submit(run_extraction, metadata=metadata, **params)
+        except JobQueueFull as e:
+            return jsonify({
+                'success': False,
+                'message': f'Hệ thống đang quá tải, vui lòng thử lại sau. {str(e)}'
+            }), 429, {'Retry-After': '30'}
+        
+        log.info("📥 Đã tạo job", extra={'job_id': job.id, 'upload_filename': metadata['filename']})
+        response = job.to_dict()
+        response['success'] = True
+        response['status_url'] = f"/jobs/{job.id}"
+        response['result_url'] = f"/jobs/{job.id}/result"
+        return jsonify(response), 202
+    except Exception as e:
+        log.exception("Error in create_job: %s", e)
+        return jsonify({
+            'success': False,
+            'message': f'Đã xảy ra lỗi: {str(e)}',
+            'error': str(e)
+        }), 500
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Trạng thái và tiến độ (theo trang) của job
+    GET /jobs/<id>
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Không tìm thấy job (sai id hoặc đã hết hạn)'}), 404
+    response = job.to_dict()
+    response['success'] = True
+    return jsonify(response)
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def get_job_result(job_id):
+    """
+    Kết quả job - cùng format response với /extract-text
+    GET /jobs/<id>/result
+    - 200: job xong (result giống /extract-text)
+    - 202: job chưa xong (trả trạng thái hiện tại)
+    - 404: không tìm thấy job
+    - 500: job lỗi
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'message': 'Không tìm thấy job (sai id hoặc đã hết hạn)'}), 404
+    if job.status == JOB_DONE:
+        return jsonify(job.result)
+    if job.status == JOB_FAILED:
+        return jsonify({
+            'success': False,
+            'message': f'Job lỗi: {job.error}',
+            'error': job.error
+        }), 500
+    response = job.to_dict()
+    response['success'] = True
+    response['message'] = 'Job chưa hoàn thành'
+    return jsonify(response), 202
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 4000))  # Port 4000 cho OCR service, 5001 cho Text Correction API
-    print(f"🚀 OCR Service đang chạy trên port {port}")
-    print(f"📝 Chuyên xử lý OCR tiếng Việt với PaddleOCR")
-    print(f"💡 Text Correction API: {TEXT_CORRECTION_API_URL}")
+    log.info("🚀 OCR Service đang chạy trên port %d", port, extra={'api_url': TEXT_CORRECTION_API_URL})
+    log.info("ℹ️  Development server - production dùng: gunicorn -c gunicorn.conf.py app:app")
+    log_startup_config()
+    start_engine_warmup()
     app.run(host='0.0.0.0', port=port, debug=False)
 
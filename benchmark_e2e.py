@@ -0,0 +1,598 @@
+"""
+Benchmark end-to-end: OCR service (process_pdf / process_image / POST /extract-text)
+
+Tài liệu test được sinh offline, deterministic theo --seed (không cần file mẫu):
+  text_pdf     PDF born-digital nhiều trang (quốc hiệu, tiêu đề, đoạn văn hành chính)
+  form_pdf     PDF biểu mẫu 2 cột (nhãn / giá trị, khối chữ ký căn phải)
+  table_pdf    PDF bảng kẻ ô
+  scan_pdf     PDF scan: trang render thành ảnh, xoay nhẹ + nhiễu (chỉ có ảnh, không text layer)
+  scan_image   Ảnh scan xoay nhẹ (PNG)
+  form_image   Ảnh biểu mẫu (PNG)
+  table_image  Ảnh bảng (PNG)
+  api_pdf      POST /extract-text (Flask test client) với scan_pdf
+  api_image    POST /extract-text với scan_image
+
+Text Correction API được thay bằng stub_correction_server.StubCorrectionServer chạy trong process
+(latency / tỉ lệ lỗi cấu hình qua --stub-*).
+Result cache / page cache / correction memo bị tắt để mỗi lần chạy đều xử lý lại từ đầu.
+
+Output JSON: pages/s, latency p50/p95/p99, peak RSS, thời gian từng stage (ocr_stage_duration_seconds)
+cho từng case; so sánh với baseline đã lưu.
+
+Chạy:
+    python benchmark_e2e.py --repeat 5 --output bench.json
+    python benchmark_e2e.py --repeat 5 --save-baseline benchmark_e2e_baseline.json
+    python benchmark_e2e.py --repeat 5 --compare benchmark_e2e_baseline.json --max-regression 0.15
+    python benchmark_e2e.py --generate-only ./bench_docs     # chỉ sinh tài liệu để xem
+
+Scaling theo số OCR worker (OCR_WORKERS): chạy lại một case trong process mới với từng số worker,
+báo pages/s, speedup so với chạy tuần tự và hiệu suất (speedup / số worker):
+    python benchmark_e2e.py --sweep-workers auto --pages 16 --no-correction
+    python benchmark_e2e.py --sweep-workers 0,1,2,4 --fake-engine 200 --no-correction   # không cần PaddleOCR
+--fake-engine MS thay PaddleOCR bằng engine tổng hợp đốt CPU MS ms mỗi trang -> đo overhead của pipeline
+(render, IPC, thứ tự trang) độc lập với model.
+"""
+
+import argparse
+import functools
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+import fitz  # PyMuPDF
+
+from stub_correction_server import StubCorrectionServer
+
+ALL_CASES = ('text_pdf', 'form_pdf', 'table_pdf', 'scan_pdf', 'scan_image', 'form_image', 'table_image',
+             'api_pdf', 'api_image')
+
+# Font có glyph tiếng Việt - font built-in của PyMuPDF (helv) thiếu dấu tiếng Việt
+FONT_CANDIDATES = (
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/dejavu/DejaVuSans.ttf',
+    '/usr/share/fonts/truetype/noto/NotoSans-Regular.ttf',
+    '/usr/share/fonts/noto/NotoSans-Regular.ttf',
+    '/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf',
+    '/Library/Fonts/Arial Unicode.ttf',
+    '/System/Library/Fonts/Supplemental/Arial.ttf',
+    'C:/Windows/Fonts/arial.ttf',
+    'C:/Windows/Fonts/times.ttf',
+)
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 (pt)
+
+# Từ vựng văn bản hành chính để ghép câu
+_SUBJECTS = ['Ủy ban nhân dân tỉnh', 'Sở Tài nguyên và Môi trường', 'Phòng Nội vụ', 'Chủ tịch UBND huyện',
+             'Các cơ quan, đơn vị', 'Ban quản lý dự án', 'Thanh tra tỉnh', 'Sở Kế hoạch và Đầu tư']
+_VERBS = ['có trách nhiệm kiểm tra', 'chủ trì, phối hợp thực hiện', 'hướng dẫn và đôn đốc', 'tổng hợp, báo cáo',
+          'tổ chức triển khai', 'rà soát, đánh giá', 'xem xét, giải quyết', 'theo dõi việc thực hiện']
+_OBJECTS = ['hồ sơ đề nghị cấp giấy chứng nhận quyền sử dụng đất', 'kế hoạch phát triển kinh tế - xã hội năm 2024',
+            'quy chế làm việc của cơ quan', 'việc thu, chi ngân sách nhà nước theo phân cấp hiện hành',
+            'công tác cải cách thủ tục hành chính', 'các dự án đầu tư công trên địa bàn',
+            'đơn khiếu nại, tố cáo của công dân', 'chương trình chuyển đổi số giai đoạn 2021 - 2025']
+_TAILS = ['theo đúng quy định của pháp luật.', 'trước ngày 30 tháng 6 năm 2024.', 'và báo cáo kết quả về Ủy ban.',
+          'bảo đảm chất lượng, hiệu quả.', 'kể từ ngày ký ban hành.', 'trong phạm vi chức năng, nhiệm vụ được giao.']
+_FORM_LABELS = ['Họ và tên', 'Ngày sinh', 'Số CCCD', 'Nơi cư trú', 'Nghề nghiệp', 'Số điện thoại', 'Địa chỉ thửa đất',
+                'Diện tích (m²)', 'Mục đích sử dụng', 'Thời hạn sử dụng', 'Nguồn gốc sử dụng', 'Ghi chú']
+_FORM_VALUES = ['Nguyễn Văn An', 'Trần Thị Bích Ngọc', '079 184 002 315', 'Phường Bến Nghé, Quận 1', 'Giáo viên',
+                '0903 456 789', 'Thửa số 125, tờ bản đồ số 14', '152,5', 'Đất ở tại đô thị', 'Lâu dài',
+                'Nhận chuyển nhượng', 'Không có tranh chấp']
+
+
+def sentence(rng):
+    return f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} {rng.choice(_TAILS)}"
+
+
+def find_font(path=None):
+    """Font file có glyph tiếng Việt (None = dùng helv, thiếu dấu)"""
+    for candidate in ([path] if path else []) + [os.getenv('BENCH_FONT')] + list(FONT_CANDIDATES):
+        if candidate and os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+class DocumentGenerator:
+    """Sinh tài liệu test deterministic (cùng seed + font -> cùng bytes nội dung)"""
+
+    def __init__(self, seed=1234, font_path=None):
+        self.seed = seed
+        self.font_path = font_path
+
+    def _rng(self, name):
+        return random.Random(f"{self.seed}:{name}")
+
+    def _text(self, page, rect, text, fontsize=11, align=0):
+        kwargs = {'fontname': 'vn', 'fontfile': self.font_path} if self.font_path else {'fontname': 'helv'}
+        page.insert_textbox(fitz.Rect(*rect), text, fontsize=fontsize, align=align, **kwargs)
+
+    def _header(self, page, rng, title):
+        self._text(page, (40, 40, 260, 80), "ỦY BAN NHÂN DÂN\nTỈNH BÌNH ĐỊNH", 10, align=1)
+        self._text(page, (270, 40, 565, 80), "CỘNG HÒA XÃ HỘI CHỦ NGHĨA VIỆT NAM\nĐộc lập - Tự do - Hạnh phúc", 10, align=1)
+        self._text(page, (300, 85, 565, 100), f"Bình Định, ngày {rng.randint(1, 28)} tháng {rng.randint(1, 12)} năm 2024", 9, align=1)
+        self._text(page, (40, 110, 555, 130), title, 13, align=1)
+
+    def text_page(self, doc, rng, page_no):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        self._header(page, rng, f"QUYẾT ĐỊNH SỐ {rng.randint(100, 999)}/QĐ-UBND")
+        y = 145
+        for article in range(1, 5):
+            paragraph = f"Điều {article + (page_no * 4)}. " + ' '.join(sentence(rng) for _ in range(rng.randint(3, 5)))
+            self._text(page, (60, y, 540, y + 150), paragraph, 11, align=3)
+            y += 160
+        return page
+
+    def form_page(self, doc, rng):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        self._header(page, rng, "ĐƠN ĐĂNG KÝ BIẾN ĐỘNG ĐẤT ĐAI")
+        y = 150
+        for label in _FORM_LABELS:
+            self._text(page, (60, y, 220, y + 18), f"{label}:", 11)
+            self._text(page, (230, y, 540, y + 18), rng.choice(_FORM_VALUES), 11)
+            y += 30
+        # Hai cột cam kết / xác nhận
+        self._text(page, (60, y + 20, 290, y + 140), "Tôi xin cam đoan nội dung kê khai trên đơn là đúng sự thật. "
+                   + sentence(rng), 10, align=3)
+        self._text(page, (310, y + 20, 540, y + 140), "Xác nhận của UBND cấp xã: " + sentence(rng), 10, align=3)
+        self._text(page, (330, y + 160, 540, y + 200), "NGƯỜI VIẾT ĐƠN\n(Ký, ghi rõ họ tên)", 11, align=1)
+        return page
+
+    def table_page(self, doc, rng, rows=14, cols=4):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        self._header(page, rng, "BẢNG TỔNG HỢP KẾT QUẢ THỰC HIỆN")
+        widths = [40, 230, 110, 100]
+        x0, y0, row_h = 55, 150, 36
+        headers = ['STT', 'Nội dung', 'Đơn vị thực hiện', 'Kết quả (%)']
+        for r in range(rows + 1):
+            x = x0
+            for c in range(cols):
+                rect = fitz.Rect(x, y0 + r * row_h, x + widths[c], y0 + (r + 1) * row_h)
+                page.draw_rect(rect, color=(0, 0, 0), width=0.6)
+                if r == 0:
+                    text = headers[c]
+                elif c == 0:
+                    text = str(r)
+                elif c == 1:
+                    text = rng.choice(_OBJECTS)
+                elif c == 2:
+                    text = rng.choice(_SUBJECTS)
+                else:
+                    text = f"{rng.uniform(40, 100):.1f}"
+                self._text(page, (rect.x0 + 3, rect.y0 + 3, rect.x1 - 3, rect.y1 - 2), text, 8, align=1 if c != 1 else 0)
+                x += widths[c]
+        return page
+
+    @staticmethod
+    def _pdf_bytes(doc):
+        # Cố định metadata (ngày tạo) + không sinh /ID mới -> cùng seed cùng bytes
+        doc.set_metadata({'producer': 'benchmark_e2e', 'creationDate': 'D:20240101000000', 'modDate': 'D:20240101000000'})
+        return doc.tobytes(garbage=3, deflate=True, no_new_id=True)
+
+    def _pdf(self, build):
+        doc = fitz.open()
+        try:
+            build(doc)
+            return self._pdf_bytes(doc)
+        finally:
+            doc.close()
+
+    def text_pdf(self, pages):
+        rng = self._rng('text_pdf')
+        return self._pdf(lambda doc: [self.text_page(doc, rng, i) for i in range(pages)])
+
+    def form_pdf(self, pages):
+        rng = self._rng('form_pdf')
+        return self._pdf(lambda doc: [self.form_page(doc, rng) for _ in range(pages)])
+
+    def table_pdf(self, pages):
+        rng = self._rng('table_pdf')
+        return self._pdf(lambda doc: [self.table_page(doc, rng) for _ in range(pages)])
+
+    def scan(self, page_pdf, name, dpi=150):
+        """Render trang đầu của PDF thành ảnh scan: grayscale, xoay nhẹ, nhiễu - trả về PIL Image"""
+        rng = self._rng(name)
+        doc = fitz.open(stream=page_pdf, filetype='pdf')
+        try:
+            pix = doc[0].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+            image = Image.frombytes('L', (pix.width, pix.height), pix.samples)
+        finally:
+            doc.close()
+        image = image.rotate(rng.uniform(-2.5, 2.5), resample=Image.BICUBIC, expand=True, fillcolor=255)
+        noise = np.random.default_rng(rng.randint(0, 2 ** 31)).normal(0, 12, (image.height, image.width))
+        pixels = np.clip(np.asarray(image, dtype=np.float32) + noise, 0, 255).astype(np.uint8)
+        return Image.fromarray(pixels).convert('RGB')
+
+    @staticmethod
+    def png_bytes(image):
+        buf = io.BytesIO()
+        image.save(buf, format='PNG')
+        return buf.getvalue()
+
+    def scan_pdf(self, pages):
+        """PDF chỉ có ảnh scan (không text layer) - xen kẽ trang văn bản / biểu mẫu / bảng"""
+        builders = [self.text_pdf, self.form_pdf, self.table_pdf]
+        doc = fitz.open()
+        try:
+            for i in range(pages):
+                image = self.scan(builders[i % len(builders)](1), f"scan_pdf:{i}")
+                page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+                page.insert_image(page.rect, stream=self.png_bytes(image))
+            return self._pdf_bytes(doc)
+        finally:
+            doc.close()
+
+    def build(self, pages):
+        """Tất cả tài liệu: {tên: (bytes, 'pdf' | 'image', số trang)}"""
+        return {
+            'text_pdf': (self.text_pdf(pages), 'pdf', pages),
+            'form_pdf': (self.form_pdf(pages), 'pdf', pages),
+            'table_pdf': (self.table_pdf(pages), 'pdf', pages),
+            'scan_pdf': (self.scan_pdf(pages), 'pdf', pages),
+            'scan_image': (self.png_bytes(self.scan(self.text_pdf(1), 'scan_image')), 'image', 1),
+            'form_image': (self.png_bytes(self.scan(self.form_pdf(1), 'form_image')), 'image', 1),
+            'table_image': (self.png_bytes(self.scan(self.table_pdf(1), 'table_image')), 'image', 1),
+        }
+
+
+class SyntheticOCREngine:
+    """
+    Engine giả lập PaddleOCR cho --fake-engine: đốt CPU page_seconds mỗi trang (detection ~60%,
+    recognition ~40%) và trả về các dòng text cố định theo kích thước ảnh
+    Cùng interface app.py dùng: ocr(), text_detector, text_classifier, text_recognizer, args
+    """
+
+    LINES_PER_PAGE = 24
+
+    def __init__(self, page_seconds, **config):
+        self.page_seconds = page_seconds
+        self.args = argparse.Namespace(det_box_type='quad')
+        self.drop_score = 0.5
+
+    @staticmethod
+    def _burn(seconds):
+        # Busy loop (không sleep): chiếm trọn một core như inference thật
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            pass
+
+    def _boxes(self, image):
+        height, width = image.shape[:2]
+        line_height = height / (self.LINES_PER_PAGE + 2)
+        boxes = []
+        for index in range(self.LINES_PER_PAGE):
+            top = line_height * (index + 1)
+            boxes.append([[width * 0.1, top], [width * 0.9, top], [width * 0.9, top + line_height * 0.8],
+                          [width * 0.1, top + line_height * 0.8]])
+        return np.array(boxes, dtype=np.float32)
+
+    def _texts(self, count):
+        rng = random.Random(count)
+        return [(sentence(rng), 0.95) for _ in range(count)]
+
+    def text_detector(self, image):
+        start = time.perf_counter()
+        self._burn(self.page_seconds * 0.6)
+        return self._boxes(image), time.perf_counter() - start
+
+    def text_classifier(self, crops):
+        return crops, [('0', 0.99)] * len(crops), 0.0
+
+    def text_recognizer(self, crops):
+        start = time.perf_counter()
+        self._burn(self.page_seconds * 0.4 * len(crops) / self.LINES_PER_PAGE)
+        return self._texts(len(crops)), time.perf_counter() - start
+
+    def ocr(self, image, cls=True, det=True, rec=True):
+        boxes, _ = self.text_detector(image)
+        texts, _ = self.text_recognizer(boxes)
+        return [[[box.tolist(), text] for box, text in zip(boxes, texts)]]
+
+
+def percentile(values, q):
+    """Percentile nội suy tuyến tính (q: 0-100)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+def peak_rss_kb():
+    try:
+        import resource
+        return {
+            'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+        }
+    except ImportError:
+        return None
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except Exception:
+        return None
+
+
+def run_case(app_module, name, payload, kind, pages, repeat, use_correction, force_ocr):
+    """Chạy một case repeat lần (sau 1 lần warm-up) - trả về dict kết quả"""
+    from ocr_metrics import STAGE_SECONDS
+
+    client = app_module.app.test_client()
+
+    def call():
+        if name.startswith('api_'):
+            data = {
+                'file': (io.BytesIO(payload), 'bench.pdf' if kind == 'pdf' else 'bench.png'),
+                'useTextCorrection': 'true' if use_correction else 'false',
+                'forceOCR': 'true' if force_ocr else 'false',
+            }
+            response = client.post('/extract-text', data=data, content_type='multipart/form-data')
+            return response.get_json()
+        if kind == 'pdf':
+            return app_module.process_pdf(payload, force_ocr=force_ocr, use_text_correction=use_correction)
+        return app_module.process_image(payload, use_text_correction=use_correction)
+
+    call()  # Warm-up (không tính)
+    before = STAGE_SECONDS.totals()
+    latencies = []
+    failures = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        latencies.append(time.perf_counter() - start)
+        if not result or not result.get('success'):
+            failures += 1
+    after = STAGE_SECONDS.totals()
+
+    stages_ms = {}
+    for key, (count, total) in after.items():
+        previous = before.get(key, (0, 0.0))
+        if count > previous[0]:
+            stages_ms[key[0]] = round((total - previous[1]) / repeat * 1000, 2)
+
+    total_time = sum(latencies)
+    return {
+        'kind': kind,
+        'pages': pages,
+        'repeat': repeat,
+        'failures': failures,
+        'pages_per_sec': round(pages * repeat / total_time, 3) if total_time else None,
+        'latency_s': {
+            'mean': round(total_time / repeat, 4),
+            'p50': round(percentile(latencies, 50), 4),
+            'p95': round(percentile(latencies, 95), 4),
+            'p99': round(percentile(latencies, 99), 4),
+        },
+        'stages_ms_per_run': dict(sorted(stages_ms.items(), key=lambda item: -item[1])),
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+
+def compare(results, baseline, max_regression):
+    """So sánh với baseline - trả về list case bị chậm hơn max_regression (tỉ lệ)"""
+    regressions = []
+    print(f"\n{'case':<12} {'p50 s':>9} {'base':>9} {'Δ':>8} {'pages/s':>9} {'base':>9} {'Δ':>8}")
+    for name, result in results['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if not base:
+            continue
+        p50, base_p50 = result['latency_s']['p50'], base['latency_s']['p50']
+        rate, base_rate = result['pages_per_sec'], base['pages_per_sec']
+        p50_delta = (p50 - base_p50) / base_p50 if base_p50 else 0.0
+        rate_delta = (rate - base_rate) / base_rate if base_rate else 0.0
+        print(f"{name:<12} {p50:>9.3f} {base_p50:>9.3f} {p50_delta:>+8.1%} {rate:>9.2f} {base_rate:>9.2f} {rate_delta:>+8.1%}")
+        if p50_delta > max_regression:
+            regressions.append(name)
+    return regressions
+
+
+def sweep_worker_counts(spec):
+    """'0,1,2,4' -> [0, 1, 2, 4]; 'auto' -> 0, 1, 2, 4, 8... đến số core CPU"""
+    if spec.strip().lower() == 'auto':
+        cores = os.cpu_count() or 1
+        counts = [0, 1]
+        count = 2
+        while count < cores:
+            counts.append(count)
+            count *= 2
+        if cores > 1:
+            counts.append(cores)
+        return counts
+    return [int(value) for value in spec.split(',') if value.strip()]
+
+
+def run_worker_sweep(args):
+    """
+    Chạy args.sweep_case trong process con cho từng OCR_WORKERS (pool tạo lúc import app nên mỗi số worker
+    một process mới) -> dict kết quả kèm speedup so với lần chạy đầu (thường OCR_WORKERS=0, tuần tự)
+    """
+    counts = sweep_worker_counts(args.sweep_workers)
+    pages = max(args.pages, 2 * max(counts + [1]))  # Đủ trang để mọi worker đều có việc
+    if pages != args.pages:
+        print(f"ℹ️  --pages {args.pages} -> {pages} để {max(counts)} worker đều có trang")
+
+    command = [sys.executable, os.path.abspath(__file__), '--cases', args.sweep_case, '--pages', str(pages),
+               '--repeat', str(args.repeat), '--seed', str(args.seed), '--stub-latency', args.stub_latency,
+               '--stub-error-rate', str(args.stub_error_rate),
+               '--stub-max-concurrency', str(args.stub_max_concurrency)]
+    if args.font:
+        command += ['--font', args.font]
+    if args.no_correction:
+        command.append('--no-correction')
+    if args.hybrid:
+        command.append('--hybrid')
+    if args.fake_engine is not None:
+        command += ['--fake-engine', str(args.fake_engine)]
+
+    runs = []
+    meta = None
+    print(f"{'workers':>8} {'pages/s':>9} {'p50 s':>9} {'speedup':>8} {'hiệu suất':>10}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for count in counts:
+            output = os.path.join(workdir, f"workers_{count}.json")
+            env = dict(os.environ, OCR_WORKERS=str(count))
+            proc = subprocess.run(command + ['--output', output], env=env, capture_output=True, text=True)
+            if proc.returncode != 0:
+                tail = '\n'.join(proc.stderr.strip().splitlines()[-5:])
+                raise SystemExit(f"❌ OCR_WORKERS={count} lỗi:\n{tail}")
+            with open(output, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            meta = meta or result['meta']
+            case = result['cases'][args.sweep_case]
+            run = {
+                'workers': count,
+                'pages_per_sec': case['pages_per_sec'],
+                'latency_p50_s': case['latency_s']['p50'],
+                'failures': case['failures'],
+            }
+            base_rate = runs[0]['pages_per_sec'] if runs else case['pages_per_sec']
+            run['speedup'] = round(case['pages_per_sec'] / base_rate, 2) if base_rate else None
+            run['efficiency'] = round(run['speedup'] / max(1, count), 2) if run['speedup'] else None
+            runs.append(run)
+            print(f"{count:>8} {run['pages_per_sec']:>9} {run['latency_p50_s']:>9} {run['speedup']:>7}x "
+                  f"{run['efficiency']:>10.0%}" + (f"  ⚠️  {run['failures']} lần lỗi" if run['failures'] else ''))
+
+    meta = dict(meta, pages=pages, ocr_workers=counts, case=args.sweep_case)
+    return {'meta': meta, 'worker_sweep': runs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cases', default=','.join(ALL_CASES), help='Các case cần chạy (phân tách bằng dấu phẩy)')
+    parser.add_argument('--pages', type=int, default=3, help='Số trang mỗi PDF')
+    parser.add_argument('--repeat', type=int, default=3, help='Số lần chạy mỗi case (sau 1 lần warm-up)')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--font', help='File font TTF có glyph tiếng Việt (mặc định: tìm trong hệ thống / BENCH_FONT)')
+    parser.add_argument('--no-correction', action='store_true', help='Tắt sửa chính tả')
+    parser.add_argument('--stub-latency', default='fixed:50',
+                        help='Phân phối latency stub Text Correction API (xem stub_correction_server.py)')
+    parser.add_argument('--stub-error-rate', type=float, default=0.0, help='Tỉ lệ HTTP 500 của stub')
+    parser.add_argument('--stub-max-concurrency', type=int, default=0, help='Số request stub xử lý song song')
+    parser.add_argument('--hybrid', action='store_true', help='PDF dùng text layer fast path (mặc định: forceOCR)')
+    parser.add_argument('--output', help='Ghi kết quả JSON ra file')
+    parser.add_argument('--save-baseline', metavar='PATH', help='Lưu kết quả làm baseline')
+    parser.add_argument('--compare', metavar='PATH', help='So sánh với baseline')
+    parser.add_argument('--max-regression', type=float, default=0.15,
+                        help='--compare: exit code 1 nếu p50 chậm hơn baseline quá tỉ lệ này')
+    parser.add_argument('--generate-only', metavar='DIR', help='Chỉ ghi tài liệu test ra thư mục rồi thoát')
+    parser.add_argument('--fake-engine', type=float, metavar='MS',
+                        help='Thay PaddleOCR bằng engine tổng hợp đốt CPU MS ms mỗi trang (đo pipeline, không cần model)')
+    parser.add_argument('--sweep-workers', metavar='LIST',
+                        help="Đo scaling: chạy --sweep-case với OCR_WORKERS lần lượt = LIST (vd 0,1,2,4 | auto)")
+    parser.add_argument('--sweep-case', default='scan_pdf', choices=[name for name in ALL_CASES if 'pdf' in name],
+                        help='Case dùng cho --sweep-workers (mặc định scan_pdf)')
+    args = parser.parse_args()
+
+    if args.sweep_workers:
+        results = run_worker_sweep(args)
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+        return
+
+    font_path = find_font(args.font)
+    if font_path is None:
+        print("⚠️  Không tìm thấy font có dấu tiếng Việt (--font / BENCH_FONT) - dùng helv, text sẽ thiếu dấu")
+    documents = DocumentGenerator(seed=args.seed, font_path=font_path).build(args.pages)
+
+    if args.generate_only:
+        os.makedirs(args.generate_only, exist_ok=True)
+        for name, (payload, kind, _) in documents.items():
+            path = os.path.join(args.generate_only, f"{name}.{'pdf' if kind == 'pdf' else 'png'}")
+            with open(path, 'wb') as f:
+                f.write(payload)
+            print(f"✅ {path} ({len(payload) / 1024:.0f} KB)")
+        return
+
+    # Cấu hình TRƯỚC khi import app: stub correction, tắt cache để mọi lần chạy đều xử lý lại
+    stub = StubCorrectionServer(latency=args.stub_latency, error_rate=args.stub_error_rate,
+                                max_concurrency=args.stub_max_concurrency, seed=args.seed).start()
+    os.environ['TEXT_CORRECTION_API_URL'] = stub.url
+    os.environ['RESULT_CACHE_MAX_ENTRIES'] = '0'
+    os.environ['PAGE_CACHE_MAX_ENTRIES'] = '0'
+    os.environ['CORRECTION_MEMO_MAX_ENTRIES'] = '0'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    import_start = time.perf_counter()
+    import app as app_module
+    import_s = time.perf_counter() - import_start
+    if args.fake_engine is not None:
+        factory = functools.partial(SyntheticOCREngine, args.fake_engine / 1000)
+        app_module.ocr_worker_engine_factory = factory  # Truyền sang worker process qua initargs của pool
+        app_module.engines.register(app_module.OCR_ENGINE_NAME, factory)
+    engine_load_s = app_module.engines.load(app_module.OCR_ENGINE_NAME)  # Engine tạo lazy - load trước khi đo
+
+    cases = [name.strip() for name in args.cases.split(',') if name.strip()]
+    unknown = [name for name in cases if name not in ALL_CASES]
+    if unknown:
+        raise SystemExit(f"❌ Case không hợp lệ: {unknown} (hỗ trợ: {', '.join(ALL_CASES)})")
+
+    results = {
+        'meta': {
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'seed': args.seed,
+            'pages': args.pages,
+            'repeat': args.repeat,
+            'font': os.path.basename(font_path) if font_path else 'helv',
+            'text_correction': not args.no_correction,
+            'stub': dict(stub.config.as_dict(), max_concurrency=stub.max_concurrency),
+            'force_ocr': not args.hybrid,
+            'ocr_workers': app_module.OCR_WORKERS,
+            'fake_engine_ms': args.fake_engine,
+            'ocr_batching': app_module.OCR_BATCHING,
+            'app_import_s': round(import_s, 2),
+            'engine_load_s': round(engine_load_s, 2),
+        },
+        'cases': {},
+    }
+    for name in cases:
+        doc_name = {'api_pdf': 'scan_pdf', 'api_image': 'scan_image'}.get(name, name)
+        payload, kind, pages = documents[doc_name]
+        print(f"▶️  {name} ({kind}, {pages} trang, {len(payload) / 1024:.0f} KB)...")
+        case = run_case(app_module, name, payload, kind, pages, args.repeat,
+                        use_correction=not args.no_correction, force_ocr=not args.hybrid)
+        stub_stats = stub.stats.as_dict()
+        case['correction_requests'] = stub_stats['outcomes']
+        stub.stats.reset()
+        results['cases'][name] = case
+        print(f"   {case['pages_per_sec']} trang/s, p50 {case['latency_s']['p50']}s, p95 {case['latency_s']['p95']}s"
+              + (f", ⚠️  {case['failures']} lần lỗi" if case['failures'] else ''))
+
+    stub.stop()
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    print(output)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"💾 Đã lưu baseline: {args.save_baseline}")
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"❌ Chậm hơn baseline > {args.max_regression:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ Không có case nào chậm hơn baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""
+Benchmark thời gian import (cold start) từng module - dựa trên `python -X importtime`
+
+Mỗi module được import trong một process Python mới; lấy thời gian cumulative của module đó
+(gồm mọi module nó kéo theo) - median của --runs lần, so với budget (ms).
+Ngoài thời gian, kiểm tra module KHÔNG kéo theo dependency nặng (paddle, cv2, fitz, requests...)
+- phần này không phụ thuộc tốc độ máy nên là guard chính trong CI.
+
+Chạy:
+    python benchmark_import.py                      # Tất cả module trong MODULE_BUDGETS_MS
+    python benchmark_import.py app text_html_utils  # Một số module
+    python benchmark_import.py --scale 2            # Máy chậm (CI): nhân budget x2
+    python benchmark_import.py --output import.json
+
+Exit code 1 nếu có module vượt budget hoặc import dependency bị cấm.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Budget (ms, cumulative) - đo trên laptop/server bình thường, có bytecode cache (.pyc)
+MODULE_BUDGETS_MS = {
+    'text_html_utils': 20,
+    'file_types': 40,
+    'ocr_logging': 40,
+    'ocr_metrics': 50,
+    'ocr_profiling': 60,
+    'engine_registry': 50,
+    'circuit_breaker': 50,
+    'result_cache': 50,
+    'correction_memo': 60,
+    'correction_client': 80,
+    'job_queue': 60,
+    'recognition_batcher': 50,
+    'page_pipeline': 80,
+    'image_utils': 250,   # numpy + PIL
+    'app': 800,           # flask + numpy + PIL, KHÔNG gồm PaddleOCR / cv2 / PyMuPDF / requests
+}
+
+# Dependency nặng chỉ được import khi dùng lần đầu (engine, PDF, correction API)
+HEAVY_MODULES = ('paddleocr', 'paddle', 'cv2', 'fitz', 'pymupdf', 'requests', 'torch', 'transformers',
+                 'onnxruntime', 'optimum')
+FORBIDDEN_IMPORTS = {
+    'app': HEAVY_MODULES,
+    'image_utils': HEAVY_MODULES,
+    'correction_client': HEAVY_MODULES,
+    'engine_registry': HEAVY_MODULES,
+    'file_types': HEAVY_MODULES + ('PIL', 'numpy', 'flask'),
+    'text_html_utils': HEAVY_MODULES + ('PIL', 'numpy', 'flask'),
+}
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_PROBE = """
+import sys
+sys.path.insert(0, {repo!r})
+import {module}
+import json
+print(json.dumps(sorted(name.split('.')[0] for name in sys.modules)))
+"""
+
+
+def parse_importtime(stderr, module):
+    """
+    Parse output -X importtime -> (cumulative µs của module, [(cumulative µs, tên)] import con trực tiếp)
+    Dòng: 'import time: self [us] | cumulative | imported package' - tên thụt lề 2 space mỗi cấp
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        parts = line.replace('import time:', '', 1).split('|')
+        if len(parts) != 3:
+            continue
+        raw_name = parts[2].rstrip()
+        depth = (len(raw_name) - len(raw_name.lstrip(' ')) - 1) // 2
+        rows.append((depth, int(parts[1]), raw_name.strip()))
+
+    # importtime in module con TRƯỚC module cha -> module cha là dòng depth 0 cuối cùng có tên module
+    for index in range(len(rows) - 1, -1, -1):
+        depth, cumulative, name = rows[index]
+        if depth == 0 and name == module:
+            children = []
+            for child_depth, child_cumulative, child_name in reversed(rows[:index]):
+                if child_depth == 0:
+                    break
+                if child_depth == 1:
+                    children.append((child_cumulative, child_name))
+            return cumulative, sorted(children, reverse=True)
+    return None, []
+
+
+def measure(module, runs, env):
+    """Import module trong process mới runs lần -> dict kết quả"""
+    samples = []
+    children = []
+    loaded = []
+    with tempfile.TemporaryDirectory() as workdir:  # app.py tạo uploads/ trong cwd
+        for _ in range(runs + 1):  # Lần đầu chỉ để ghi .pyc
+            proc = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', _PROBE.format(repo=REPO_DIR, module=module)],
+                cwd=workdir, env=env, capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'import lỗi'}
+            cumulative, children = parse_importtime(proc.stderr, module)
+            samples.append(cumulative)
+            loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    samples = [sample for sample in samples[1:] if sample is not None]
+    return {
+        'ms': round(statistics.median(samples) / 1000, 1) if samples else None,
+        'top_imports': [{'module': name, 'ms': round(us / 1000, 1)} for us, name in children[:5]],
+        'forbidden': sorted(set(FORBIDDEN_IMPORTS.get(module, ())) & set(loaded)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('modules', nargs='*', help='Module cần đo (mặc định: tất cả trong MODULE_BUDGETS_MS)')
+    parser.add_argument('--runs', type=int, default=5, help='Số lần import mỗi module (lấy median)')
+    parser.add_argument('--scale', type=float, default=1.0, help='Nhân budget (máy chậm / CI)')
+    parser.add_argument('--output', help='Ghi kết quả JSON ra file')
+    args = parser.parse_args()
+
+    modules = args.modules or list(MODULE_BUDGETS_MS)
+    env = dict(os.environ, LOG_LEVEL='WARNING')
+    env.pop('PYTHONDONTWRITEBYTECODE', None)  # Đo với .pyc như khi chạy thật
+
+    results = {}
+    failed = []
+    print(f"{'module':<22} {'ms':>8} {'budget':>8}  top imports")
+    for module in modules:
+        result = measure(module, args.runs, env)
+        budget = MODULE_BUDGETS_MS.get(module)
+        result['budget_ms'] = round(budget * args.scale, 1) if budget else None
+        results[module] = result
+
+        if 'error' in result:
+            failed.append(module)
+            print(f"{module:<22} {'lỗi':>8} {'':>8}  ❌ {result['error']}")
+            continue
+        over_budget = result['budget_ms'] is not None and result['ms'] > result['budget_ms']
+        top = ', '.join(f"{item['module']} {item['ms']}" for item in result['top_imports'][:3])
+        status = '❌' if over_budget or result['forbidden'] else '✅'
+        print(f"{module:<22} {result['ms']:>8} {result['budget_ms'] or '-':>8}  {status} {top}")
+        if result['forbidden']:
+            print(f"{'':<22} ❌ import dependency nặng lúc import: {', '.join(result['forbidden'])}")
+        if over_budget or result['forbidden']:
+            failed.append(module)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'python': sys.version.split()[0], 'scale': args.scale, 'modules': results}, f,
+                      indent=2, ensure_ascii=False)
+    if failed:
+        print(f"\n❌ Vượt budget / import nặng: {', '.join(failed)}")
+        sys.exit(1)
+    print("\n✅ Tất cả module trong budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Micro-benchmark: PyMuPDF Pixmap -> numpy BGR cho PaddleOCR
+So sánh 2 cách chuyển một trang PDF đã render sang input của PaddleOCR:
+  - legacy: pix.tobytes("png") -> Image.open -> convert RGB -> copy -> np.array -> cvtColor RGB->BGR
+  - direct: image_utils.pixmap_to_bgr (đọc thẳng sample buffer, chỉ một lần copy)
+
+Đo mỗi trang: thời gian (ms), bytes cấp phát (tracemalloc peak - numpy có track, buffer nội bộ
+của PIL thì không) và peak RSS tăng thêm của process (mỗi method chạy trong process riêng).
+
+Chạy:
+    python benchmark_pixmap.py --pages 20 --scale 2.5
+"""
+
+import argparse
+import io
+import json
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import fitz  # PyMuPDF
+import numpy as np
+import cv2
+from PIL import Image
+
+from image_utils import pixmap_to_bgr
+
+
+def build_sample_pdf(pages):
+    """Tạo PDF giả lập văn bản hành chính (deterministic, không cần file ngoài)"""
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page(width=595, height=842)  # A4
+        page.insert_text((180, 60), "CONG HOA XA HOI CHU NGHIA VIET NAM", fontsize=12)
+        page.insert_text((220, 80), "Doc lap - Tu do - Hanh phuc", fontsize=11)
+        for line in range(40):
+            page.insert_text((60, 120 + line * 17), f"Dong {line + 1} trang {page_num + 1}: quyet dinh ve viec thuc hien kiem tra", fontsize=10)
+        page.draw_rect(fitz.Rect(60, 780, 535, 820), color=(0, 0, 0))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def legacy_convert(pix):
+    """Đường cũ: PNG encode/decode qua PIL rồi RGB -> BGR"""
+    img = Image.open(io.BytesIO(pix.tobytes("png")))
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    img = img.copy()
+    img_array = np.array(img, dtype=np.uint8)
+    return cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+
+
+def direct_convert(pix):
+    """Đường mới: sample buffer -> numpy BGR"""
+    return pixmap_to_bgr(pix)
+
+
+METHODS = {
+    'legacy': (legacy_convert, {}),
+    'direct': (direct_convert, {'colorspace': fitz.csRGB, 'alpha': False}),
+}
+
+
+def peak_rss_kb():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        return 0
+
+
+def run_method(name, pages, scale):
+    """Chạy một method, trả về dict kết quả (ms/trang, bytes cấp phát, RSS)"""
+    convert, pixmap_kwargs = METHODS[name]
+    data = build_sample_pdf(pages)
+    doc = fitz.open(stream=data, filetype="pdf")
+    mat = fitz.Matrix(scale, scale)
+
+    rss_before = peak_rss_kb()
+    convert_ms = []
+    alloc_peaks = []
+    checksum = 0
+    for page in doc:
+        pix = page.get_pixmap(matrix=mat, **pixmap_kwargs)
+        tracemalloc.start()
+        start = time.perf_counter()
+        img_array = convert(pix)
+        convert_ms.append((time.perf_counter() - start) * 1000)
+        alloc_peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        checksum += int(img_array[::97, ::89].sum())
+        del img_array, pix
+    doc.close()
+
+    convert_ms.sort()
+    return {
+        'method': name,
+        'pages': pages,
+        'scale': scale,
+        'ms_per_page_mean': round(sum(convert_ms) / len(convert_ms), 3),
+        'ms_per_page_p50': round(convert_ms[len(convert_ms) // 2], 3),
+        'bytes_allocated_per_page': int(sum(alloc_peaks) / len(alloc_peaks)),
+        'peak_rss_delta_kb': peak_rss_kb() - rss_before,
+        'checksum': checksum,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--scale', type=float, default=2.5)
+    parser.add_argument('--method', choices=sorted(METHODS), help='Chỉ chạy một method (dùng nội bộ)')
+    args = parser.parse_args()
+
+    if args.method:
+        print(json.dumps(run_method(args.method, args.pages, args.scale)))
+        return
+
+    # Mỗi method chạy trong process riêng để peak RSS không ảnh hưởng lẫn nhau
+    results = []
+    for name in ('legacy', 'direct'):
+        output = subprocess.check_output([
+            sys.executable, __file__, '--method', name,
+            '--pages', str(args.pages), '--scale', str(args.scale)
+        ])
+        results.append(json.loads(output.decode('utf-8').strip().splitlines()[-1]))
+
+    print(f"{'method':<8} {'ms/page':>10} {'p50 ms':>10} {'alloc/page':>14} {'peak RSS +KB':>14}")
+    for r in results:
+        print(f"{r['method']:<8} {r['ms_per_page_mean']:>10.2f} {r['ms_per_page_p50']:>10.2f} "
+              f"{r['bytes_allocated_per_page']:>14,} {r['peak_rss_delta_kb']:>14,}")
+    if results[0]['checksum'] != results[1]['checksum']:
+        print("⚠️  Checksum khác nhau giữa 2 method - output không giống hệt")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
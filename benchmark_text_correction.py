@@ -0,0 +1,168 @@
+"""
+Benchmark: ProtonX Text Correction (VietnameseTextCorrector) trên CPU
+
+1. So sánh backend inference (mặc định): torch / int8 (dynamic quantization) / onnx (ONNX Runtime)
+   Mỗi backend chạy trong process riêng, đo: thời gian load, ms/câu, câu/giây, peak RSS
+   và tỉ lệ câu có output giống hệt backend torch (agreement)
+2. --compare-batching: generate từng câu (batch_size=1) vs theo batch nhóm theo độ dài token
+   (câu/giây và số câu output khác nhau - kỳ vọng 0)
+
+Chạy:
+    python benchmark_text_correction.py --model-path ./models/protonx-legal-tc
+    python benchmark_text_correction.py --model-path ./models/protonx-legal-tc --backends torch,int8
+    python benchmark_text_correction.py --compare-batching --batch-size 16
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+from text_correction import VietnameseTextCorrector, TORCH_AVAILABLE, MODEL_BACKENDS
+
+# Mẫu cố định: câu OCR văn bản hành chính (có lỗi dấu/chính tả điển hình), độ dài khác nhau
+SAMPLE_SENTENCES = [
+    "CỘNG HÒA XÃ HỘI CHỦ NGHĨA VIỆT NAM",
+    "Độc lập - Tự do - Hạnh phúc",
+    "Căn cứ Luật Tổ chức chính quyền địa phương ngày 19 tháng 6 năm 2015;",
+    "Căn cứ Nghị định số 30/2020/NĐ-CP ngày 05 tháng 3 năm 2020 của Chính phủ về công tác văn thư;",
+    "Theo đề nghị của Chánh Văn phòng Ủy ban nhân dân tỉnh.",
+    "QUYET DINH",
+    "Điều 1. Ban hành kèm theo Quyết đinh này Quy chế làm viêc của Ủy ban nhân dân tỉnh.",
+    "Điều 2. Quyết định này có hiêu lực kể từ ngày ký.",
+    "Chánh Văn phòng, Thủ trưởng các sở, ban, ngành và Chủ tịch UBND các huyên chịu trách nhiệm thi hành.",
+    "Nơi nhận:",
+    "- Như Điều 3;",
+    "- Lưu: VT.",
+    "TM. ỦY BAN NHÂN DÂN",
+    "CHỦ TICH",
+    "Nguyễn Văn A",
+    "Phòng Tài nguyên và Môi trường có trách nhiệm kiểm tra, hướng dẫn các xã thực hiện đúng quy đinh.",
+    "Hồ sơ gồm: đơn đề nghị, bản sao giấy chứng nhân quyền sử dụng đất và các giấy tờ liên quan.",
+    "Thời hạn giải quyết không quá 15 ngày làm viêc kể từ ngày nhận đủ hồ sơ hợp lệ.",
+    "Kinh phí thực hiện được bố trí từ nguồn ngân sách nhà nước theo phân cấp hiện hành.",
+    "Trong quá trình thực hiên, nếu có vướng mắc, các cơ quan, đơn vị phản ánh kịp thời về Sở Nội vụ để tổng hợp.",
+]
+
+
+def run(corrector, sentences, batch_size, repeat):
+    """Sửa toàn bộ sentences repeat lần, trả về (outputs, câu/giây)"""
+    outputs = None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        outputs = corrector._correct_sentences(sentences, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    return outputs, len(sentences) * repeat / elapsed
+
+
+def peak_rss_kb():
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except ImportError:
+        return 0
+
+
+def load_corrector(model_path, backend):
+    corrector = VietnameseTextCorrector(model_path=model_path, backend=backend)
+    corrector._initialize_model()
+    if not corrector.initialized:
+        raise SystemExit(f"❌ Không khởi tạo được model (backend {backend})")
+    # Warm-up
+    corrector._correct_sentences(SAMPLE_SENTENCES[:2], batch_size=2)
+    return corrector
+
+
+def run_backend(model_path, backend, batch_size, repeat):
+    """Chạy một backend (trong process riêng), trả về dict kết quả kèm outputs"""
+    rss_before = peak_rss_kb()
+    start = time.perf_counter()
+    corrector = load_corrector(model_path, backend)
+    load_s = time.perf_counter() - start
+    outputs, rate = run(corrector, SAMPLE_SENTENCES, batch_size, repeat)
+    return {
+        'backend': backend,
+        'load_s': round(load_s, 2),
+        'ms_per_sentence': round(1000 / rate, 2),
+        'sentences_per_sec': round(rate, 2),
+        'peak_rss_kb': peak_rss_kb(),
+        'peak_rss_delta_kb': peak_rss_kb() - rss_before,
+        'outputs': outputs,
+    }
+
+
+def compare_backends(args):
+    backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    results = []
+    for backend in backends:
+        try:
+            output = subprocess.check_output([
+                sys.executable, __file__, '--run-backend', backend, '--model-path', args.model_path,
+                '--batch-size', str(args.batch_size), '--repeat', str(args.repeat)
+            ])
+            results.append(json.loads(output.decode('utf-8').strip().splitlines()[-1]))
+        except subprocess.CalledProcessError as e:
+            print(f"⚠️  Backend {backend} lỗi (exit code {e.returncode}), bỏ qua")
+
+    reference = next((r['outputs'] for r in results if r['backend'] == 'torch'), None)
+    print(f"{'backend':<8} {'load s':>8} {'ms/câu':>10} {'câu/s':>10} {'peak RSS KB':>14} {'agreement':>10}")
+    for r in results:
+        if reference is not None:
+            same = sum(1 for a, b in zip(reference, r['outputs']) if a == b)
+            r['agreement'] = round(same / len(reference), 4)
+        else:
+            r['agreement'] = None
+        agreement = f"{r['agreement'] * 100:.1f}%" if r['agreement'] is not None else '-'
+        print(f"{r['backend']:<8} {r['load_s']:>8.2f} {r['ms_per_sentence']:>10.2f} {r['sentences_per_sec']:>10.2f} "
+              f"{r['peak_rss_kb']:>14,} {agreement:>10}")
+    print(json.dumps([{k: v for k, v in r.items() if k != 'outputs'} for r in results], indent=2))
+
+
+def compare_batching(args):
+    corrector = load_corrector(args.model_path, args.backend)
+    sequential, sequential_rate = run(corrector, SAMPLE_SENTENCES, 1, args.repeat)
+    batched, batched_rate = run(corrector, SAMPLE_SENTENCES, args.batch_size, args.repeat)
+    mismatches = [i for i, (a, b) in enumerate(zip(sequential, batched)) if a != b]
+
+    results = {
+        'backend': args.backend,
+        'sentences': len(SAMPLE_SENTENCES),
+        'repeat': args.repeat,
+        'batch_size': args.batch_size,
+        'sequential_sentences_per_sec': round(sequential_rate, 2),
+        'batched_sentences_per_sec': round(batched_rate, 2),
+        'speedup': round(batched_rate / sequential_rate, 2),
+        'mismatches': mismatches,
+    }
+    print(f"sequential: {sequential_rate:8.2f} câu/s")
+    print(f"batched:    {batched_rate:8.2f} câu/s  (x{results['speedup']})")
+    if mismatches:
+        print(f"⚠️  {len(mismatches)} câu có output khác nhau: {mismatches}")
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model-path', default='protonx-models/protonx-legal-tc')
+    parser.add_argument('--backends', default=','.join(MODEL_BACKENDS), help='Các backend cần so sánh')
+    parser.add_argument('--backend', default='torch', choices=sorted(MODEL_BACKENDS), help='Backend cho --compare-batching')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--compare-batching', action='store_true')
+    parser.add_argument('--run-backend', choices=sorted(MODEL_BACKENDS), help='Chỉ chạy một backend (dùng nội bộ)')
+    args = parser.parse_args()
+
+    if not TORCH_AVAILABLE:
+        raise SystemExit("❌ Cần torch/transformers để chạy benchmark")
+
+    if args.run_backend:
+        print(json.dumps(run_backend(args.model_path, args.run_backend, args.batch_size, args.repeat), ensure_ascii=False))
+    elif args.compare_batching:
+        compare_batching(args)
+    else:
+        compare_backends(args)
+
+
+if __name__ == '__main__':
+    main()
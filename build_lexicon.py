@@ -0,0 +1,91 @@
+"""
+Build lexicon index (lexicon_index.py) cho lớp khôi phục dấu của VietnameseSpellCorrector
+
+Nguồn dữ liệu (dùng một hoặc kết hợp):
+  --corpus     File text tiếng Việt có dấu chuẩn (UTF-8) -> đếm unigram + bigram
+  --words      TSV "từ<TAB>tần suất"
+  --bigrams    TSV "từ1 từ2<TAB>số lần"
+
+Chạy:
+    python build_lexicon.py --corpus corpus.txt -o rules/vi_lexicon.idx
+    python build_lexicon.py --words words.tsv --bigrams bigrams.tsv --min-bigram-count 2 -o rules/vi_lexicon.idx
+"""
+
+import argparse
+import re
+import time
+import unicodedata
+from collections import Counter
+
+from lexicon_index import build_lexicon_index, LexiconIndex
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def count_corpus(path, word_freqs, bigram_counts):
+    """Đếm unigram/bigram từ corpus - bigram chỉ tính giữa 2 từ cách nhau bởi khoảng trắng"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = unicodedata.normalize('NFC', line).lower()
+            prev = None
+            prev_end = None
+            for match in _WORD_RE.finditer(line):
+                word = match.group()
+                if not word.isalpha():
+                    prev = None
+                    continue
+                word_freqs[word] += 1
+                if prev is not None and not line[prev_end:match.start()].strip(' \t'):
+                    bigram_counts[(prev, word)] += 1
+                prev = word
+                prev_end = match.end()
+
+
+def read_tsv(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').split('\t')
+            if len(parts) == 2 and parts[0].strip() and not parts[0].startswith('#'):
+                yield parts[0].strip(), int(parts[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', action='append', default=[], help='File corpus (có thể lặp lại)')
+    parser.add_argument('--words', help='TSV từ<TAB>tần suất')
+    parser.add_argument('--bigrams', help='TSV "từ1 từ2"<TAB>số lần')
+    parser.add_argument('--min-count', type=int, default=1, help='Bỏ từ có tần suất thấp hơn')
+    parser.add_argument('--min-bigram-count', type=int, default=1, help='Bỏ bigram có số lần thấp hơn')
+    parser.add_argument('--max-candidates', type=int, default=16)
+    parser.add_argument('-o', '--output', required=True)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    word_freqs = Counter()
+    bigram_counts = Counter()
+    for path in args.corpus:
+        print(f"📖 Đang đếm {path}...")
+        count_corpus(path, word_freqs, bigram_counts)
+    if args.words:
+        for word, freq in read_tsv(args.words):
+            word_freqs[word] += freq
+    if args.bigrams:
+        for pair, count in read_tsv(args.bigrams):
+            words = pair.split()
+            if len(words) == 2:
+                bigram_counts[tuple(words)] += count
+
+    word_freqs = {w: c for w, c in word_freqs.items() if c >= args.min_count}
+    bigram_counts = {b: c for b, c in bigram_counts.items() if c >= args.min_bigram_count}
+
+    stats = build_lexicon_index(word_freqs, bigram_counts, args.output, max_candidates=args.max_candidates)
+    print(f"✅ {args.output}: {stats['keys']:,} key, {stats['words']:,} từ, {stats['bigrams']:,} bigram, "
+          f"{stats['bytes'] / 1024 / 1024:.1f} MB ({time.perf_counter() - start:.1f}s)")
+
+    load_start = time.perf_counter()
+    LexiconIndex(args.output).close()
+    print(f"⚡ Load index: {(time.perf_counter() - load_start) * 1000:.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
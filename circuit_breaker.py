@@ -0,0 +1,121 @@
+"""
+Circuit Breaker - Bảo vệ service khi API phụ thuộc (Text Correction) bị down
+- closed: gọi API bình thường, đếm số lỗi liên tiếp
+- open: lỗi liên tiếp >= failure_threshold -> bỏ qua API ngay, không chờ timeout/retry
+- half_open: hết recovery_timeout -> cho một request thử; thành công -> closed, lỗi -> open lại
+Kèm backoff_delay(): exponential backoff có jitter cho retry
+"""
+
+import time
+import random
+import threading
+
+from ocr_logging import get_logger
+
+log = get_logger('circuit_breaker')
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+
+def backoff_delay(attempt, base=0.5, max_delay=8.0):
+    """
+    Thời gian chờ trước retry thứ attempt (0-based) - "full jitter":
+    ngẫu nhiên trong [0, min(max_delay, base * 2^attempt)] để các client không retry cùng lúc
+    """
+    return random.uniform(0, min(max_delay, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker thread-safe dùng chung cho mọi request
+
+    Args:
+        failure_threshold: Số lỗi liên tiếp để chuyển sang open
+        recovery_timeout: Số giây ở trạng thái open trước khi cho request thử (half_open)
+        name: Tên (hiển thị trong stats/log)
+    """
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30.0, name='breaker'):
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.recovery_timeout = float(recovery_timeout)
+        self.name = name
+        self._lock = threading.Lock()
+        self._state = STATE_CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+        self.total_failures = 0
+        self.total_successes = 0
+        self.short_circuited = 0
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        """Trạng thái hiện tại (gọi khi đang giữ lock) - open hết hạn -> half_open"""
+        if self._state == STATE_OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = STATE_HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self):
+        """
+        True nếu được phép gọi API
+        half_open chỉ cho một request thử tại một thời điểm, các request khác bị bỏ qua
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.total_successes += 1
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+            if self._state != STATE_CLOSED:
+                log.info("✅ Circuit breaker '%s': API hoạt động lại -> closed", self.name)
+            self._state = STATE_CLOSED
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.total_failures += 1
+            self._consecutive_failures += 1
+            state = self._current_state()
+            if state == STATE_HALF_OPEN or (state == STATE_CLOSED and self._consecutive_failures >= self.failure_threshold):
+                self._state = STATE_OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+                self.times_opened += 1
+                log.warning("⚠️  Circuit breaker '%s' open sau %d lỗi liên tiếp - bỏ qua API trong %.0fs",
+                            self.name, self._consecutive_failures, self.recovery_timeout)
+
+    def stats(self):
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+            if state == STATE_OPEN:
+                retry_in = round(max(0.0, self.recovery_timeout - (time.monotonic() - self._opened_at)), 1)
+            return {
+                'name': self.name,
+                'state': state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'recovery_timeout': self.recovery_timeout,
+                'retry_in': retry_in,
+                'times_opened': self.times_opened,
+                'short_circuited': self.short_circuited,
+                'total_failures': self.total_failures,
+                'total_successes': self.total_successes,
+            }
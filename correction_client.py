@@ -0,0 +1,306 @@
+"""
+Correction Client - Client gọi Text Correction API
+- Dùng chung một requests.Session (connection pool keep-alive) thay vì mở kết nối mới mỗi trang
+  (tạo ở request đầu tiên - import requests không tính vào thời gian import app)
+- Circuit breaker dùng chung: API down -> bỏ qua correction ngay thay vì retry/timeout từng trang
+- Memo theo dòng (optional): dòng lặp lại (quốc hiệu, tiêu ngữ, footer...) không gửi lại API
+  các dòng còn lại gửi theo đúng thứ tự trang (giữ ngữ cảnh), kết quả được căn lại theo từng dòng
+- submit(): gửi sửa chính tả trên background thread, giới hạn số request đang bay (max_in_flight)
+  -> OCR các trang sau chạy song song với correction của các trang trước
+"""
+
+import time
+import difflib
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from circuit_breaker import CircuitBreaker, backoff_delay
+from correction_memo import normalize_line
+from ocr_logging import get_logger, log_stage
+
+log = get_logger('correction')
+
+
+class CorrectionSkipped(Exception):
+    """Không sửa được chính tả (API down / breaker open / hết retry) - giữ nguyên text gốc"""
+
+
+# Căn dòng trả về với dòng gửi đi khi API gộp/tách dòng: sửa chính tả gần như không đổi độ dài dòng
+ALIGN_MIN_RATIO = 0.6
+ALIGN_MAX_LENGTH_RATIO = 1.35
+
+
+def _line_similarity(sent, received):
+    """Độ giống giữa dòng gửi và dòng nhận (0 nếu độ dài lệch quá nhiều - vd hai dòng bị gộp làm một)"""
+    longer, shorter = max(len(sent), len(received)), min(len(sent), len(received))
+    if not shorter or longer / shorter > ALIGN_MAX_LENGTH_RATIO:
+        return 0.0
+    ratio = difflib.SequenceMatcher(None, sent.lower(), received.lower(), autojunk=False).ratio()
+    return ratio if ratio >= ALIGN_MIN_RATIO else 0.0
+
+
+def align_lines(sent, received):
+    """
+    Căn các dòng API trả về với các dòng đã gửi khi số dòng khác nhau (API gộp / tách / bỏ dòng)
+    Alignment theo thứ tự (DP, giống diff) tối đa tổng độ giống - mỗi dòng gửi khớp tối đa một dòng nhận
+
+    Returns:
+        List cùng độ dài sent: dòng nhận tương ứng, None nếu không khớp chắc chắn (giữ dòng gốc)
+    """
+    rows, cols = len(sent), len(received)
+    # score[i][j] = tổng độ giống tốt nhất cho sent[i:] và received[j:]
+    score = [[0.0] * (cols + 1) for _ in range(rows + 1)]
+    for i in range(rows - 1, -1, -1):
+        for j in range(cols - 1, -1, -1):
+            best = max(score[i + 1][j], score[i][j + 1])
+            similarity = _line_similarity(sent[i], received[j])
+            if similarity:
+                best = max(best, similarity + score[i + 1][j + 1])
+            score[i][j] = best
+
+    aligned = [None] * rows
+    i = j = 0
+    while i < rows and j < cols:
+        similarity = _line_similarity(sent[i], received[j])
+        if similarity and score[i][j] == similarity + score[i + 1][j + 1]:
+            aligned[i] = received[j]
+            i += 1
+            j += 1
+        elif score[i][j] == score[i + 1][j]:
+            i += 1
+        else:
+            j += 1
+    return aligned
+
+
+class CorrectionClient:
+    """
+    Client Text Correction API dùng connection pool
+
+    Args:
+        api_url: Endpoint API (POST {'text': ...} -> {'success', 'corrected_text'})
+        timeout: Timeout mỗi request (giây)
+        max_in_flight: Số request correction chạy đồng thời tối đa qua submit()
+        breaker: CircuitBreaker dùng chung (None = tạo mới với cấu hình mặc định)
+        backoff_base, backoff_max: Tham số exponential backoff (giây) giữa các lần retry
+        memo: CorrectionMemo cache kết quả theo dòng (None = tắt, luôn gửi toàn bộ text)
+    """
+
+    def __init__(self, api_url, timeout=120, max_in_flight=4, breaker=None, backoff_base=0.5, backoff_max=8.0,
+                 memo=None):
+        self.api_url = api_url
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker(name='text_correction')
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.memo = memo
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._in_flight_lock = threading.Lock()
+        self.in_flight = 0  # Số task submit() đang chạy / chờ executor
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """requests.Session dùng chung - tạo lazy ở lần gọi API đầu tiên"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    # Pool đủ lớn cho các request submit() + request đồng bộ từ các thread Flask
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(10, self.max_in_flight))
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def _get_executor(self):
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='correction')
+            return self._executor
+
+    def correct(self, text, max_retries=2):
+        """
+        Sửa chính tả text (blocking)
+        Có memo: dòng đã gặp trả lời local, các dòng mới gửi lên API theo thứ tự trang (xem correct_lines)
+
+        Raises:
+            CorrectionSkipped: Circuit breaker đang open hoặc hết retry - caller giữ text gốc
+        """
+        if not text or not text.strip():
+            return text
+        if self.memo is None:
+            return self._correct_remote(text, max_retries)
+
+        return '\n'.join(self.correct_lines(text.split('\n'), max_retries=max_retries))
+
+    def correct_lines(self, lines, selected=None, max_retries=2):
+        """
+        Sửa các dòng của MỘT trang - trả về list cùng độ dài (dòng trống giữ nguyên, giữ indent đầu dòng)
+        - Dòng có trong memo trả lời local; dòng trùng nhau chỉ gửi một lần
+        - Các dòng còn lại gửi trong MỘT request, đúng thứ tự trang: dòng liền nhau giữ liền nhau,
+          chỗ bị bỏ (memo hit / dòng không chọn / dòng trống) thành một dòng trống -> corrector không nối
+          câu qua chỗ đứt
+        - API trả về khác số dòng (gộp/tách dòng) -> căn lại từng dòng (align_lines); dòng không căn được
+          giữ nguyên và không lưu memo
+
+        Args:
+            lines: Các dòng của trang
+            selected: Tập index dòng cần sửa (None = mọi dòng) - dòng khác giữ nguyên nhưng vẫn là ngữ cảnh
+                      quyết định dòng nào liền nhau
+
+        Raises:
+            CorrectionSkipped: Circuit breaker đang open hoặc hết retry
+        """
+        keys = [normalize_line(line) for line in lines]
+        corrected = {}
+        novel_index = []
+        for index, key in enumerate(keys):
+            if not key or (selected is not None and index not in selected) or key in corrected:
+                continue
+            value = self.memo.get(key) if self.memo is not None else None
+            corrected[key] = value
+            if value is None:
+                novel_index.append(index)
+
+        if novel_index:
+            sent = []
+            for position, index in enumerate(novel_index):
+                if position and index != novel_index[position - 1] + 1:
+                    sent.append('')
+                sent.append(lines[index].strip())
+            received = [line.strip() for line in self._correct_remote('\n'.join(sent), max_retries).split('\n')]
+            if len(received) != len(sent):
+                aligned = align_lines(sent, received)
+                log.warning("⚠️  Text Correction trả về %d dòng cho %d dòng gửi lên - căn lại được %d/%d dòng",
+                            len(received), len(sent), sum(1 for line in aligned if line), len(novel_index))
+            else:
+                aligned = received
+            aligned = [line for line, sent_line in zip(aligned, sent) if sent_line]  # Bỏ dòng trống ngăn cách
+
+            remote = [(keys[index], line) for index, line in zip(novel_index, aligned) if line]
+            if self.memo is not None:
+                self.memo.put_many(remote)
+            corrected.update(remote)
+
+        # Ghép lại theo thứ tự dòng gốc, giữ indent đầu dòng
+        output = []
+        for index, (line, key) in enumerate(zip(lines, keys)):
+            value = corrected.get(key) if (selected is None or index in selected) else None
+            if not key or value is None:
+                output.append(line)
+                continue
+            indent = line[:len(line) - len(line.lstrip())]
+            output.append(indent + value)
+        return output
+
+    def _correct_remote(self, text, max_retries=2):
+        """
+        Gọi API cho toàn bộ text - GỌI MỘT LẦN (không chia nhỏ)
+        Retry với exponential backoff có jitter
+
+        Raises:
+            CorrectionSkipped: Circuit breaker đang open hoặc hết retry - caller giữ text gốc
+        """
+        if not text or not text.strip():
+            return text
+
+        import requests
+        last_error = None
+        for attempt in range(max_retries + 1):
+            if attempt > 0:
+                delay = backoff_delay(attempt - 1, self.backoff_base, self.backoff_max)
+                log.warning("⚠️  Text Correction lỗi (lần %d): %s, retry sau %.2fs...", attempt, last_error, delay)
+                time.sleep(delay)
+
+            # Breaker open -> bỏ qua ngay, không chờ timeout
+            if not self.breaker.allow_request():
+                raise CorrectionSkipped(f"circuit breaker {self.breaker.state} ({last_error or 'API đang lỗi'})")
+
+            try:
+                with log_stage(log, 'correction_request', attempt=attempt + 1, chars=len(text)):
+                    response = self.session.post(self.api_url, json={'text': text}, timeout=self.timeout)
+            except requests.exceptions.ConnectionError:
+                self.breaker.record_failure()
+                last_error = f"không thể kết nối đến {self.api_url}"
+                continue
+            except requests.exceptions.Timeout:
+                self.breaker.record_failure()
+                last_error = f"timeout sau {self.timeout:.0f}s"
+                continue
+            except Exception as e:
+                self.breaker.record_failure()
+                last_error = str(e)
+                continue
+
+            if response.status_code >= 500 or response.status_code == 429:
+                # Server quá tải/lỗi -> tính vào breaker và retry
+                self.breaker.record_failure()
+                last_error = f"status code {response.status_code}"
+                continue
+            if response.status_code != 200:
+                # Lỗi phía request (4xx) - server vẫn sống, retry cũng không giúp được
+                self.breaker.record_success()
+                raise CorrectionSkipped(f"status code {response.status_code}")
+
+            try:
+                result = response.json()
+            except ValueError:
+                self.breaker.record_failure()
+                last_error = "response không phải JSON"
+                continue
+
+            if result.get('success'):
+                self.breaker.record_success()
+                if attempt > 0:
+                    log.info("✅ Text Correction thành công sau %d lần thử", attempt + 1)
+                return result.get('corrected_text', text)
+
+            # API trả về lỗi (model lỗi) -> tính là lỗi của API
+            self.breaker.record_failure()
+            last_error = result.get('error', 'Unknown error')
+
+        raise CorrectionSkipped(f"{last_error} sau {max_retries + 1} lần thử")
+
+    def submit(self, text, **kwargs):
+        """
+        Gửi correction chạy nền - trả về Future (result = text đã sửa, exception = CorrectionSkipped)
+        Block khi đã có max_in_flight request đang chạy (backpressure cho vòng OCR)
+        """
+        return self.submit_task(self.correct, text, **kwargs)
+
+    def submit_task(self, fn, *args, **kwargs):
+        """
+        Chạy fn(*args, **kwargs) (hàm có gọi correction) trên executor, cùng giới hạn max_in_flight
+        Chạy trong bản copy contextvars của caller -> log trên thread correction giữ request_id
+        """
+        self._slots.acquire()
+        with self._in_flight_lock:
+            self.in_flight += 1
+        try:
+            future = self._get_executor().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+        except Exception:
+            self._task_done()
+            raise
+        future.add_done_callback(lambda _: self._task_done())
+        return future
+
+    def _task_done(self):
+        with self._in_flight_lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def close(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        if self._session is not None:
+            self._session.close()
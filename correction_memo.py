@@ -0,0 +1,136 @@
+"""
+Correction Memo - Cache kết quả sửa chính tả theo từng dòng
+- Văn bản hành chính lặp lại nhiều dòng giống nhau (quốc hiệu, tiêu ngữ, chữ ký, footer...)
+  -> dòng đã sửa một lần được trả lời local, chỉ gửi dòng mới lên API
+- Key = dòng đã chuẩn hoá (Unicode NFC, gộp khoảng trắng)
+- Tier 1: LRU trong memory; Tier 2 (optional): SQLite, sống qua restart
+"""
+
+import re
+import sqlite3
+import threading
+import unicodedata
+
+from ocr_logging import get_logger
+from result_cache import LRUCache
+
+log = get_logger('correction_memo')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_line(line):
+    """Chuẩn hoá dòng làm key: NFC (tiếng Việt có nhiều cách encode dấu) + gộp khoảng trắng"""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', line)).strip()
+
+
+class CorrectionMemo:
+    """
+    Memo dòng gốc -> dòng đã sửa
+
+    Args:
+        max_entries: Số dòng tối đa trong memory LRU
+        db_path: File SQLite lưu persistent (None = chỉ dùng memory)
+        namespace: Phân biệt kết quả của các corrector khác nhau (vd API URL) trong cùng DB
+    """
+
+    def __init__(self, max_entries=10000, db_path=None, namespace='default'):
+        self.memory = LRUCache(max_entries)
+        self.db_path = db_path
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._inherited_dbs = []
+        if db_path:
+            self._db = self._connect()
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS corrections ('
+            'namespace TEXT NOT NULL, line TEXT NOT NULL, corrected TEXT NOT NULL, '
+            'PRIMARY KEY (namespace, line))'
+        )
+        db.commit()
+        return db
+
+    def reopen(self):
+        """
+        Mở connection SQLite mới - gọi trong process con sau fork (gunicorn worker)
+        Connection kế thừa từ process cha không được dùng (cũng không close - close có thể checkpoint/xoá WAL
+        mà process khác đang dùng) nên chỉ giữ tham chiếu
+        """
+        if not self.db_path:
+            return
+        with self._lock:
+            self._inherited_dbs.append(self._db)
+            self._db = self._connect()
+
+    def _read_db(self, key):
+        if self._db is None:
+            return None
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    'SELECT corrected FROM corrections WHERE namespace = ? AND line = ?',
+                    (self.namespace, key)
+                ).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            log.warning("⚠️  Không đọc được correction memo: %s", e, exc_info=True)
+            return None
+
+    def get(self, key):
+        """Lấy dòng đã sửa theo key đã chuẩn hoá (None nếu chưa có)"""
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return value
+
+        value = self._read_db(key)
+        if value is not None:
+            self.memory.put(key, value)
+            with self._lock:
+                self.db_hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put_many(self, items):
+        """Lưu nhiều cặp (key, dòng đã sửa) - một transaction SQLite"""
+        items = list(items)
+        for key, value in items:
+            self.memory.put(key, value)
+        if self._db is None or not items:
+            return
+        try:
+            with self._lock:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO corrections (namespace, line, corrected) VALUES (?, ?, ?)',
+                    [(self.namespace, key, value) for key, value in items]
+                )
+                self._db.commit()
+        except sqlite3.Error as e:
+            log.warning("⚠️  Không ghi được correction memo: %s", e, exc_info=True)
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.db_hits
+            lookups = hits + self.misses
+            return {
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'db_hits': self.db_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'max_memory_entries': self.memory.max_entries,
+                'persistent': self._db is not None,
+            }
@@ -0,0 +1,71 @@
+"""
+Engine Registry - Tạo OCR engine lazy theo tên
+- Đăng ký factory lúc import (rẻ), instance chỉ được tạo ở lần get() đầu tiên
+  -> import app không load PaddleOCR (~30s, vài trăm MB); tool / test không dùng engine không phải trả giá đó
+- Server load engine chủ động trước khi nhận request: load() (gunicorn master trước fork, warm-up thread)
+- Thread-safe: nhiều thread get() cùng lúc chỉ tạo MỘT instance
+"""
+
+import threading
+import time
+
+from ocr_logging import get_logger
+
+log = get_logger('engines')
+
+
+class EngineRegistry:
+    def __init__(self):
+        self._factories = {}
+        self._engines = {}
+        self._load_seconds = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory):
+        """Đăng ký factory() -> engine cho tên name (không tạo engine)"""
+        with self._lock:
+            self._factories[name] = factory
+
+    def get(self, name):
+        """Engine theo tên - tạo bằng factory ở lần gọi đầu"""
+        engine = self._engines.get(name)
+        if engine is not None:
+            return engine
+        with self._lock:
+            engine = self._engines.get(name)
+            if engine is None:
+                factory = self._factories.get(name)
+                if factory is None:
+                    raise KeyError(f"Engine chưa đăng ký: '{name}' (có: {', '.join(self._factories) or 'không có'})")
+                log.info("Đang khởi tạo engine %s...", name)
+                start = time.perf_counter()
+                engine = factory()
+                self._load_seconds[name] = time.perf_counter() - start
+                self._engines[name] = engine
+                log.info("✅ Engine %s đã sẵn sàng", name,
+                         extra={'duration_ms': round(self._load_seconds[name] * 1000, 2)})
+        return engine
+
+    def load(self, name):
+        """Tạo engine ngay (nếu chưa có) - trả về số giây khởi tạo (0 nếu đã load trước đó)"""
+        loaded = self.is_loaded(name)
+        self.get(name)
+        return 0.0 if loaded else self._load_seconds[name]
+
+    def set(self, name, engine):
+        """Thay engine đã tạo sẵn (vd worker process tạo engine riêng với config khác)"""
+        with self._lock:
+            self._engines[name] = engine
+
+    def is_loaded(self, name):
+        return name in self._engines
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    'loaded': name in self._engines,
+                    'load_seconds': round(self._load_seconds[name], 3) if name in self._load_seconds else None,
+                }
+                for name in self._factories
+            }
@@ -0,0 +1,101 @@
+"""
+File type helpers - Nhận dạng PDF / ảnh từ upload (extension + magic bytes / PIL)
+Chỉ dùng stdlib khi import (PIL import lazy) -> tool / test dùng được mà không load app và engine OCR
+"""
+
+import io
+
+from ocr_logging import get_logger
+
+log = get_logger('files')
+
+# Hỗ trợ nhiều format PDF và image
+ALLOWED_EXTENSIONS = {
+    # PDF formats
+    'pdf',
+    # Image formats
+    'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'tiff', 'tif',
+    'jfif', 'pjpeg', 'pjp', 'svg', 'ico', 'heic', 'heif'
+}
+
+
+def allowed_file(filename):
+    """Check if file extension is allowed"""
+    if not filename or '.' not in filename:
+        return False
+    ext = filename.rsplit('.', 1)[1].lower()
+    return ext in ALLOWED_EXTENSIONS
+
+
+def is_pdf_file(filename, file_buffer):
+    """Check if file is PDF by content, not just extension"""
+    try:
+        # Check extension first (including cases where filename might be None or empty)
+        if filename:
+            filename_lower = filename.lower()
+            if filename_lower.endswith('.pdf') or 'pdf' in filename_lower:
+                # Verify by content too
+                file_buffer.seek(0)
+                header = file_buffer.read(4)
+                file_buffer.seek(0)
+                if header.startswith(b'%PDF'):
+                    return True
+        
+        # Check magic bytes (PDF starts with %PDF) - primary check
+        file_buffer.seek(0)
+        # Read more bytes to be sure (PDF header can have whitespace)
+        header = file_buffer.read(1024)
+        file_buffer.seek(0)
+        
+        # Check for PDF magic bytes (can have whitespace before %PDF)
+        if b'%PDF' in header[:1024]:
+            return True
+            
+        # Also check for PDF in first bytes (sometimes Chrome adds data)
+        if header.startswith(b'%PDF') or header.strip().startswith(b'%PDF'):
+            return True
+            
+        return False
+    except Exception as e:
+        log.warning("⚠️  Error checking PDF: %s", e)
+        # Fallback: if filename suggests PDF, trust it
+        if filename and filename.lower().endswith('.pdf'):
+            return True
+        return False
+
+
+def is_image_file(filename, file_buffer):
+    """Check if file is image by trying to open with PIL"""
+    try:
+        # First try to open with PIL (works for most formats)
+        file_buffer.seek(0)
+        buffer_copy = file_buffer.read()
+        file_buffer.seek(0)
+        
+        # Try to open with PIL
+        try:
+            from PIL import Image  # import lazy - module này chỉ dùng stdlib khi import
+            img = Image.open(io.BytesIO(buffer_copy))
+            img.verify()  # Verify it's a valid image
+            return True
+        except:
+            pass
+        
+        # Check extension as fallback
+        if filename:
+            ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+            image_exts = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'webp', 'tiff', 'tif', 'jfif', 'pjpeg', 'pjp', 'ico', 'heic', 'heif'}
+            if ext in image_exts:
+                # Try again with format hint
+                try:
+                    file_buffer.seek(0)
+                    from PIL import Image
+                    img = Image.open(io.BytesIO(buffer_copy))
+                    img.verify()
+                    return True
+                except:
+                    pass
+        return False
+    except Exception as e:
+        log.warning("⚠️  Error checking image: %s", e)
+        return False
@@ -0,0 +1,75 @@
+"""
+Gunicorn config - chạy OCR service production (thay app.run development server)
+
+    gunicorn -c gunicorn.conf.py app:app
+
+- preload_app: master import app.py MỘT lần, load PaddleOCR (~30s, when_ready) rồi fork worker
+  -> model weights dùng chung giữa các worker qua copy-on-write, worker mới start gần như tức thì
+- Mỗi worker warm-up engine sau khi fork (app.after_fork); GET /ready trả 503 cho đến khi warm-up xong
+- Worker gthread: mỗi worker GUNICORN_THREADS thread; OCR trong một worker vẫn serialize qua engine lock
+  -> tăng throughput OCR bằng GUNICORN_WORKERS (mỗi worker một engine), thread để phục vụ
+     /health, /ready, /jobs, /metrics và upload trong lúc OCR
+- Job /jobs chạy trong worker nhận POST, trạng thái / kết quả lưu ở SQLite JOB_DB_PATH dùng chung
+  -> GET /jobs/<id> vào worker nào cũng đọc được (JOB_DB_PATH rỗng thì cần route sticky theo job)
+
+Graceful reload:
+    kill -HUP <master pid>    đọc lại config, thay worker lần lượt (request đang chạy được xử lý xong
+                              trong GUNICORN_GRACEFUL_TIMEOUT). Với preload_app code KHÔNG được load lại
+    kill -USR2 <master pid>   deploy code mới: start master mới (load model mới) song song master cũ,
+    kill -QUIT <old master>   kiểm tra /ready của master mới rồi dừng master cũ
+
+Cấu hình (env):
+    GUNICORN_BIND              mặc định 0.0.0.0:$PORT (PORT mặc định 4000)
+    GUNICORN_WORKERS           số worker process (mặc định 2)
+    GUNICORN_THREADS           số thread mỗi worker (mặc định 4)
+    GUNICORN_TIMEOUT           giây - worker không phản hồi quá lâu bị kill (mặc định 300, PDF dài)
+    GUNICORN_GRACEFUL_TIMEOUT  giây chờ request đang chạy khi reload/stop (mặc định 120)
+    GUNICORN_MAX_REQUESTS      restart worker sau N request (0 = tắt) - chặn memory phình dần
+"""
+
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '4000')}")
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+preload_app = True
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '300'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '120'))
+keepalive = 5
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+# Heartbeat file của worker trên tmpfs - disk chậm (container) không làm worker bị coi là treo
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+# Log request của gunicorn ra stdout cùng log JSON của app
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    import app
+    app.after_fork()
+
+
+def worker_exit(server, worker):
+    import app
+    app.before_worker_exit()
+
+
+def when_ready(server):
+    # Chạy ở master sau khi import app, TRƯỚC khi fork worker: import app không tạo engine (lazy)
+    # -> load PaddleOCR ở đây để mọi worker kế thừa weights qua copy-on-write
+    import app
+    app.log_startup_config()
+    app.load_ocr_engine()
+    if workers > 1 and not app.JOB_DB_PATH:
+        server.log.warning("⚠️  %d worker và JOB_DB_PATH rỗng: job /jobs nằm riêng trong từng worker - "
+                           "GET /jobs/<id> có thể trả 404 nếu không route sticky", workers)
+    server.log.info("🚀 OCR Service (gunicorn) sẵn sàng: %s, %d worker x %d thread", bind, workers, threads)
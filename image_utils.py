@@ -0,0 +1,119 @@
+"""
+Utility functions chuyển đổi ảnh cho PaddleOCR
+- PyMuPDF Pixmap -> numpy BGR uint8 (không encode/decode PNG, không qua PIL)
+- PIL Image / numpy array -> numpy BGR uint8 (format PaddleOCR dùng)
+
+cv2 import lazy trong từng hàm (import cv2 mất vài chục ms + vài chục MB)
+"""
+
+import numpy as np
+from PIL import Image
+
+
+def pixmap_to_bgr(pix):
+    """
+    Chuyển PyMuPDF Pixmap sang numpy array BGR uint8 (H, W, 3)
+    Đọc trực tiếp sample buffer của pixmap (zero-copy view) -> chỉ copy MỘT lần khi đổi RGB->BGR
+
+    Args:
+        pix: fitz.Pixmap RGB (n=3), RGBA (n=4, alpha) hoặc grayscale (n=1)
+
+    Returns:
+        numpy array BGR uint8, C-contiguous, độc lập với pixmap (pixmap có thể giải phóng ngay)
+    """
+    import cv2
+    height, width, n = pix.height, pix.width, pix.n
+    if height <= 0 or width <= 0:
+        raise Exception(f"Pixmap rỗng: {width}x{height}")
+
+    # samples_mv: memoryview trên buffer của pixmap (không copy)
+    samples = pix.samples_mv if hasattr(pix, 'samples_mv') else pix.samples
+    buffer = np.frombuffer(samples, dtype=np.uint8)
+
+    # Mỗi dòng có thể có padding (stride > width * n)
+    stride = getattr(pix, 'stride', width * n)
+    view = buffer.reshape(height, stride)[:, :width * n].reshape(height, width, n)
+
+    if n == 3:
+        return cv2.cvtColor(view, cv2.COLOR_RGB2BGR)
+    if n == 4 and pix.alpha:
+        # Alpha -> nền trắng (giống xử lý RGBA ở PIL path)
+        return _blend_on_white(view)
+    if n == 1:
+        return cv2.cvtColor(view, cv2.COLOR_GRAY2BGR)
+    raise Exception(f"Pixmap có số kênh không hỗ trợ: n={n}")
+
+
+def _blend_on_white(rgba):
+    """Ghép ảnh RGBA lên nền trắng, trả về BGR uint8"""
+    import cv2
+    rgb = rgba[:, :, :3].astype(np.uint16)
+    alpha = rgba[:, :, 3:4].astype(np.uint16)
+    blended = (rgb * alpha + 255 * (255 - alpha) + 127) // 255
+    return cv2.cvtColor(blended.astype(np.uint8), cv2.COLOR_RGB2BGR)
+
+
+def pil_to_bgr(image):
+    """
+    Chuyển PIL Image (mọi mode) sang numpy array BGR uint8 (H, W, 3)
+    RGBA -> nền trắng, L/P/LA/PA/... -> RGB
+    """
+    import cv2
+    # Đảm bảo image là RGB mode - QUAN TRỌNG
+    if image.mode != 'RGB':
+        if image.mode == 'RGBA':
+            # Tạo background trắng cho RGBA
+            rgb_image = Image.new('RGB', image.size, (255, 255, 255))
+            alpha = image.split()[3] if len(image.split()) >= 4 else None
+            if alpha:
+                rgb_image.paste(image, mask=alpha)
+            else:
+                rgb_image.paste(image)
+            image = rgb_image
+        elif image.mode in ('L', 'P', 'LA', 'PA'):
+            # Grayscale hoặc palette -> convert to RGB
+            image = image.convert('RGB')
+        else:
+            # Các mode khác -> convert to RGB
+            image = image.convert('RGB')
+
+    # PIL Image (RGB) -> numpy array (RGB format)
+    img_array = np.asarray(image, dtype=np.uint8)
+
+    # Validate img_array shape
+    if len(img_array.shape) != 3 or img_array.shape[2] != 3:
+        raise Exception(f"Invalid image array shape after conversion: {img_array.shape}, expected (H, W, 3)")
+
+    # PaddleOCR expects BGR format (OpenCV standard)
+    return cv2.cvtColor(img_array, cv2.COLOR_RGB2BGR)
+
+
+def to_bgr_array(image):
+    """
+    Chuẩn hóa input OCR thành numpy array BGR uint8 (H, W, 3)
+    - numpy array (H, W, 3) uint8: coi là BGR, dùng luôn không copy
+    - numpy array grayscale (H, W): convert sang BGR
+    - PIL Image: convert qua pil_to_bgr
+    """
+    import cv2
+    if isinstance(image, np.ndarray):
+        if image.dtype != np.uint8:
+            image = image.astype(np.uint8)
+        if image.ndim == 2:
+            return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        if image.ndim == 3 and image.shape[2] == 3:
+            return image
+        if image.ndim == 3 and image.shape[2] == 4:
+            return cv2.cvtColor(image, cv2.COLOR_BGRA2BGR)
+        raise Exception(f"Invalid image array shape: {image.shape}, expected (H, W, 3)")
+
+    if isinstance(image, Image.Image):
+        return pil_to_bgr(image)
+
+    raise Exception("Image must be PIL Image object or numpy array")
+
+
+def bgr_to_pil(img_array):
+    """Chuyển numpy BGR uint8 sang PIL Image RGB"""
+    import cv2
+    return Image.fromarray(cv2.cvtColor(img_array, cv2.COLOR_BGR2RGB))
@@ -0,0 +1,343 @@
+"""
+Job Queue - Xử lý OCR bất đồng bộ cho tài liệu dài
+- Job chạy trên background executor có giới hạn số worker
+- Giới hạn độ sâu hàng đợi: quá tải -> JobQueueFull (API trả 429)
+- Theo dõi tiến độ từng trang và giữ kết quả trong một khoảng thời gian (TTL),
+  tối đa max_finished_jobs job đã xong (job xong lâu nhất bị xoá trước)
+- Optional: lưu trạng thái / tiến độ / kết quả job vào SQLite dùng chung giữa các process
+  -> nhiều gunicorn worker: GET /jobs/<id> vào worker nào cũng đọc được job do worker khác chạy
+"""
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from ocr_logging import get_logger
+
+log = get_logger('jobs')
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class JobQueueFull(Exception):
+    """Hàng đợi job đã đầy - client nên thử lại sau"""
+
+
+class Job:
+    """Trạng thái một job OCR"""
+
+    def __init__(self, metadata=None):
+        self.id = uuid.uuid4().hex
+        self.status = JOB_QUEUED
+        self.metadata = metadata or {}
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.processed_pages = 0
+        self.total_pages = None
+        self.result = None
+        self.error = None
+        self.pid = os.getpid()  # Process chạy job (đọc từ DB: job của worker khác)
+
+    @classmethod
+    def from_row(cls, row):
+        """Tạo Job từ một dòng bảng jobs (xem JobManager._connect)"""
+        job = cls.__new__(cls)
+        (job.id, job.status, metadata, job.created_at, job.started_at, job.finished_at,
+         job.processed_pages, job.total_pages, result, job.error, job.pid) = row
+        job.metadata = json.loads(metadata) if metadata else {}
+        job.result = json.loads(result) if result else None
+        return job
+
+    def update_progress(self, processed_pages, total_pages):
+        """Progress callback - được gọi sau mỗi trang"""
+        self.processed_pages = processed_pages
+        self.total_pages = total_pages
+
+    @property
+    def finished(self):
+        return self.status in (JOB_DONE, JOB_FAILED)
+
+    def to_dict(self):
+        """Trạng thái job cho GET /jobs/<id> (không gồm result)"""
+        now = time.time()
+        elapsed_from = self.started_at or now
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'progress': {
+                'processed_pages': self.processed_pages,
+                'total_pages': self.total_pages,
+                'percent': round(self.processed_pages / self.total_pages * 100, 1) if self.total_pages else 0.0
+            },
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'queue_time': f"{elapsed_from - self.created_at:.2f}s",
+            'run_time': f"{(self.finished_at or now) - self.started_at:.2f}s" if self.started_at else None,
+        }
+        data.update(self.metadata)
+        if self.error:
+            data['error'] = self.error
+        return data
+
+
+class JobManager:
+    """
+    Quản lý job OCR chạy nền
+
+    Args:
+        max_workers: Số job chạy đồng thời
+        max_queue_depth: Số job tối đa đang chờ (ngoài các job đang chạy)
+        result_ttl: Thời gian (giây) giữ job đã xong trước khi xoá
+        max_finished_jobs: Số job đã xong (kèm result) giữ tối đa - vượt thì xoá job xong lâu nhất
+                           khi có job mới, kể cả chưa hết TTL (0 = không giới hạn)
+        db_path: File SQLite dùng chung giữa các process (None = job chỉ nằm trong memory của process)
+
+    Job chạy trên executor của process nhận request. Có db_path thì trạng thái, tiến độ và kết quả được
+    ghi vào DB -> get() đọc được job của process khác; job chưa xong của process đã chết bị đánh dấu lỗi.
+    max_workers / max_queue_depth tính theo từng process; TTL và max_finished_jobs áp dụng cả trong DB.
+    """
+
+    def __init__(self, max_workers=2, max_queue_depth=16, result_ttl=3600, max_finished_jobs=256, db_path=None):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue_depth = max(0, int(max_queue_depth))
+        self.result_ttl = result_ttl
+        self.max_finished_jobs = max(0, int(max_finished_jobs))
+        self.db_path = db_path
+        self._executor = None
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        self._inherited_dbs = []
+        self.rejected = 0
+        self.evicted = 0
+
+    def _connect(self):
+        db = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id TEXT PRIMARY KEY, status TEXT NOT NULL, metadata TEXT, created_at REAL NOT NULL, '
+            'started_at REAL, finished_at REAL, processed_pages INTEGER NOT NULL DEFAULT 0, total_pages INTEGER, '
+            'result TEXT, error TEXT, pid INTEGER NOT NULL)'
+        )
+        db.execute('CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)')
+        db.commit()
+        return db
+
+    def _get_db(self):
+        """
+        Connection SQLite của process hiện tại (gọi khi đang giữ lock)
+        Mở lazy theo pid: process con sau fork (gunicorn worker) tự mở connection mới; connection kế thừa
+        không được dùng (cũng không close - xem CorrectionMemo.reopen) nên chỉ giữ tham chiếu
+        """
+        if not self.db_path:
+            return None
+        if self._db_pid != os.getpid():
+            if self._db is not None:
+                self._inherited_dbs.append(self._db)
+            self._db = self._connect()
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _execute(self, sql, params=()):
+        """Ghi một câu lệnh vào DB (gọi khi đang giữ lock) - lỗi SQLite chỉ log, không làm hỏng job"""
+        try:
+            db = self._get_db()
+            if db is None:
+                return None
+            cursor = db.execute(sql, params)
+            db.commit()
+            return cursor
+        except sqlite3.Error as e:
+            log.warning("⚠️  Không ghi được job vào DB: %s", e, exc_info=True)
+            return None
+
+    def _write_job(self, job):
+        """Ghi toàn bộ trạng thái job - INSERT OR REPLACE (gọi khi đang giữ lock)"""
+        result = json.dumps(job.result, ensure_ascii=False, default=str) if job.result is not None else None
+        self._execute(
+            'INSERT OR REPLACE INTO jobs (id, status, metadata, created_at, started_at, finished_at, '
+            'processed_pages, total_pages, result, error, pid) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (job.id, job.status, json.dumps(job.metadata, ensure_ascii=False, default=str), job.created_at,
+             job.started_at, job.finished_at, job.processed_pages, job.total_pages, result, job.error, job.pid)
+        )
+
+    def _save_job(self, job):
+        if not self.db_path:
+            return
+        with self._lock:
+            self._write_job(job)
+
+    def _save_progress(self, job):
+        if not self.db_path:
+            return
+        with self._lock:
+            self._execute('UPDATE jobs SET processed_pages = ?, total_pages = ? WHERE id = ?',
+                          (job.processed_pages, job.total_pages, job.id))
+
+    def _purge_db(self):
+        """TTL và max_finished_jobs cho job trong DB (gọi khi đang giữ lock)"""
+        self._execute('DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?',
+                      (time.time() - self.result_ttl,))
+        if self.max_finished_jobs:
+            self._execute(
+                'DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE finished_at IS NOT NULL '
+                'ORDER BY finished_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_finished_jobs,)
+            )
+
+    def _load_job(self, job_id):
+        """Đọc job (của process khác) từ DB - None nếu không có / đã hết hạn (gọi khi đang giữ lock)"""
+        try:
+            db = self._get_db()
+            if db is None:
+                return None
+            row = db.execute(
+                'SELECT id, status, metadata, created_at, started_at, finished_at, processed_pages, total_pages, '
+                'result, error, pid FROM jobs WHERE id = ? AND (finished_at IS NULL OR finished_at >= ?)',
+                (job_id, time.time() - self.result_ttl)
+            ).fetchone()
+            if row is None:
+                return None
+            job = Job.from_row(row)
+        except (sqlite3.Error, ValueError) as e:
+            log.warning("⚠️  Không đọc được job từ DB: %s", e, exc_info=True)
+            return None
+        if not job.finished and job.pid != os.getpid() and not _process_alive(job.pid):
+            # Worker chạy job đã dừng (crash / bị kill / restart) -> job không bao giờ xong
+            job.status = JOB_FAILED
+            job.error = f"Worker process {job.pid} đã dừng trước khi job hoàn thành"
+            job.finished_at = time.time()
+            self._execute('UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND finished_at IS NULL',
+                          (job.status, job.error, job.finished_at, job.id))
+        return job
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ocr-job')
+        return self._executor
+
+    def _active_count(self):
+        return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def _queued_count(self):
+        return sum(1 for job in self._jobs.values() if job.status == JOB_QUEUED)
+
+    def _purge_expired(self):
+        """Xoá job đã xong quá result_ttl (gọi khi đang giữ lock)"""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished and job.finished_at and now - job.finished_at > self.result_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _evict_finished(self):
+        """Giữ tối đa max_finished_jobs job đã xong, xoá job xong lâu nhất trước (gọi khi đang giữ lock)"""
+        if not self.max_finished_jobs:
+            return
+        finished = [job for job in self._jobs.values() if job.finished]
+        excess = len(finished) - self.max_finished_jobs
+        if excess <= 0:
+            return
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[:excess]:
+            del self._jobs[job.id]
+        self.evicted += excess
+
+    def submit(self, fn, *args, metadata=None, **kwargs):
+        """
+        Đưa job vào hàng đợi
+
+        Args:
+            fn: Hàm xử lý - nhận thêm keyword progress_callback(processed, total), trả về result dict
+            metadata: Thông tin thêm hiển thị trong trạng thái job
+
+        Returns:
+            Job
+
+        Raises:
+            JobQueueFull: Khi số job đang chạy + chờ đã đạt giới hạn
+        """
+        with self._lock:
+            self._purge_expired()
+            if self._active_count() >= self.max_workers + self.max_queue_depth:
+                self.rejected += 1
+                raise JobQueueFull(
+                    f"Hàng đợi đầy ({self.max_workers} job đang chạy, {self.max_queue_depth} job chờ)"
+                )
+            job = Job(metadata=metadata)
+            self._jobs[job.id] = job
+            self._evict_finished()
+            if self.db_path:
+                self._purge_db()
+                self._write_job(job)
+            # Copy contextvars (request_id của request tạo job) sang thread chạy job
+            self._get_executor().submit(contextvars.copy_context().run, self._run, job, fn, args, kwargs)
+        return job
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = JOB_RUNNING
+        job.started_at = time.time()
+        self._save_job(job)
+
+        def progress_callback(processed_pages, total_pages):
+            job.update_progress(processed_pages, total_pages)
+            self._save_progress(job)
+
+        try:
+            job.result = fn(*args, progress_callback=progress_callback, **kwargs)
+            job.status = JOB_DONE
+        except Exception as e:
+            log.error("❌ Job lỗi: %s", e, extra={'job_id': job.id})
+            job.error = str(e)
+            job.status = JOB_FAILED
+        finally:
+            job.finished_at = time.time()
+            self._save_job(job)
+
+    def get(self, job_id):
+        """Lấy job theo id: job của process này, hoặc từ DB nếu có db_path (None nếu không tồn tại / hết hạn)"""
+        with self._lock:
+            self._purge_expired()
+            job = self._jobs.get(job_id)
+            if job is None and self.db_path:
+                job = self._load_job(job_id)
+            return job
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': sum(1 for job in self._jobs.values() if job.status == JOB_RUNNING),
+                'queued': self._queued_count(),
+                'max_workers': self.max_workers,
+                'max_queue_depth': self.max_queue_depth,
+                'rejected': self.rejected,
+                'retained_jobs': len(self._jobs),
+                'max_finished_jobs': self.max_finished_jobs,
+                'evicted': self.evicted,
+                'persistent': self.db_path is not None,
+            }
+
+
+def _process_alive(pid):
+    """Process pid còn chạy không (cùng máy) - Windows không kiểm tra được (os.kill dừng process) -> coi là còn"""
+    if os.name == 'nt' or not pid:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,308 @@
+"""
+Lexicon Index - Khôi phục dấu tiếng Việt bằng từ điển lớn + ngữ cảnh bigram
+- Index nhị phân đọc qua mmap: load gần như tức thì, chỉ trang nào được tra mới vào RAM
+  (dùng được với lexicon 100k từ và vài triệu bigram)
+- Key = từ không dấu (hash 64-bit) -> các dạng có dấu kèm tần suất
+- DiacriticRestorer: với mỗi chuỗi từ liên tiếp, chọn dạng có dấu tốt nhất bằng Viterbi
+  trên điểm bigram (nội suy với unigram)
+
+Build index: python build_lexicon.py --corpus corpus.txt -o rules/vi_lexicon.idx
+"""
+
+import re
+import mmap
+import struct
+import hashlib
+import unicodedata
+from collections import defaultdict
+
+import numpy as np
+
+MAGIC = b'VILEX\0\0\1'
+# magic, n_keys, n_cands, n_words, n_bigrams, blob_len, total_count, reserved
+_HEADER = struct.Struct('<8sIIIIIQ28s')
+assert _HEADER.size == 64
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def strip_diacritics(word):
+    """Bỏ dấu tiếng Việt + lowercase: 'Quyết' -> 'quyet', 'Đội' -> 'doi'"""
+    word = word.lower().replace('đ', 'd')
+    decomposed = unicodedata.normalize('NFD', word)
+    return ''.join(char for char in decomposed if unicodedata.category(char) != 'Mn')
+
+
+def key_hash(key):
+    """Hash 64-bit ổn định của key không dấu"""
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _normalize_word(word):
+    return unicodedata.normalize('NFC', word).lower()
+
+
+def build_lexicon_index(word_freqs, bigram_counts, path, max_candidates=16):
+    """
+    Ghi index nhị phân
+
+    Args:
+        word_freqs: Dict từ có dấu -> tần suất
+        bigram_counts: Dict (từ 1, từ 2) -> số lần xuất hiện liền nhau (từ ngoài word_freqs bị bỏ qua)
+        path: File output
+        max_candidates: Số dạng có dấu tối đa cho mỗi key (giữ các dạng tần suất cao nhất)
+
+    Returns:
+        Dict thống kê (keys, words, bigrams, bytes)
+    """
+    freqs = defaultdict(int)
+    for word, freq in word_freqs.items():
+        word = _normalize_word(word)
+        if word and _WORD_RE.fullmatch(word):
+            freqs[word] += int(freq)
+
+    groups = defaultdict(list)
+    for word in freqs:
+        groups[strip_diacritics(word)].append(word)
+
+    # Chỉ giữ max_candidates dạng phổ biến nhất mỗi key
+    entries = []
+    for key, forms in groups.items():
+        forms.sort(key=lambda w: (-freqs[w], w))
+        entries.append((key_hash(key), key, forms[:max_candidates]))
+    entries.sort()
+    for (h1, k1, _), (h2, k2, _) in zip(entries, entries[1:]):
+        if h1 == h2:
+            raise ValueError(f"Hash collision giữa '{k1}' và '{k2}'")
+
+    words = sorted(w for _, _, forms in entries for w in forms)
+    word_ids = {word: i for i, word in enumerate(words)}
+
+    key_hashes = np.array([h for h, _, _ in entries], dtype=np.uint64)
+    key_start = np.zeros(len(entries) + 1, dtype=np.uint32)
+    cand_word = []
+    for i, (_, _, forms) in enumerate(entries):
+        cand_word.extend(word_ids[w] for w in forms)
+        key_start[i + 1] = len(cand_word)
+    cand_word = np.array(cand_word, dtype=np.uint32)
+    word_freq = np.array([min(freqs[w], 0xFFFFFFFF) for w in words], dtype=np.uint32)
+
+    encoded = [w.encode('utf-8') for w in words]
+    word_offsets = np.zeros(len(words) + 1, dtype=np.uint32)
+    if encoded:
+        word_offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = b''.join(encoded)
+
+    bigrams = defaultdict(int)
+    for (w1, w2), count in bigram_counts.items():
+        id1 = word_ids.get(_normalize_word(w1))
+        id2 = word_ids.get(_normalize_word(w2))
+        if id1 is not None and id2 is not None and count > 0:
+            bigrams[(id1 << 32) | id2] += int(count)
+    bigram_keys = np.array(sorted(bigrams), dtype=np.uint64)
+    bigram_values = np.array([min(bigrams[k], 0xFFFFFFFF) for k in bigram_keys.tolist()], dtype=np.uint32)
+
+    header = _HEADER.pack(MAGIC, len(entries), len(cand_word), len(words), len(bigram_keys),
+                          len(blob), int(word_freq.sum(dtype=np.uint64)), b'')
+    with open(path, 'wb') as f:
+        f.write(header)
+        # uint64 trước (căn lề 8 byte), rồi uint32, cuối cùng là chuỗi UTF-8
+        for array in (key_hashes, bigram_keys, key_start, cand_word, word_freq, word_offsets, bigram_values):
+            f.write(array.tobytes())
+        f.write(blob)
+        size = f.tell()
+
+    return {'keys': len(entries), 'words': len(words), 'bigrams': len(bigram_keys), 'bytes': size}
+
+
+class LexiconIndex:
+    """
+    Đọc index nhị phân qua mmap (các mảng numpy trỏ thẳng vào file, không copy)
+
+    Args:
+        path: File index tạo bởi build_lexicon_index / build_lexicon.py
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, n_keys, n_cands, n_words, n_bigrams, blob_len, total, _) = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} không phải lexicon index (magic {magic!r})")
+
+        offset = _HEADER.size
+
+        def view(dtype, count):
+            nonlocal offset
+            array = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+            offset += array.nbytes
+            return array
+
+        self.key_hashes = view(np.uint64, n_keys)
+        self.bigram_keys = view(np.uint64, n_bigrams)
+        self.key_start = view(np.uint32, n_keys + 1)
+        self.cand_word = view(np.uint32, n_cands)
+        self.word_freq = view(np.uint32, n_words)
+        self.word_offsets = view(np.uint32, n_words + 1)
+        self.bigram_values = view(np.uint32, n_bigrams)
+        self._blob_offset = offset
+        self.n_words = n_words
+        self.total_count = total
+
+    def __len__(self):
+        return len(self.key_hashes)
+
+    def word(self, word_id):
+        start = self._blob_offset + int(self.word_offsets[word_id])
+        end = self._blob_offset + int(self.word_offsets[word_id + 1])
+        return self._mmap[start:end].decode('utf-8')
+
+    def candidates(self, key):
+        """Các dạng có dấu của key không dấu: list (từ, word_id, tần suất), tần suất giảm dần"""
+        h = np.uint64(key_hash(key))
+        pos = int(np.searchsorted(self.key_hashes, h))
+        if pos >= len(self.key_hashes) or self.key_hashes[pos] != h:
+            return []
+        start, end = int(self.key_start[pos]), int(self.key_start[pos + 1])
+        return [(self.word(int(word_id)), int(word_id), int(self.word_freq[word_id]))
+                for word_id in self.cand_word[start:end]]
+
+    def bigram_counts(self, prev_ids, next_ids):
+        """Ma trận số lần xuất hiện bigram (len(prev_ids) x len(next_ids)) - tra một lần bằng searchsorted"""
+        prev_ids = np.asarray(prev_ids, dtype=np.uint64)
+        next_ids = np.asarray(next_ids, dtype=np.uint64)
+        keys = ((prev_ids[:, None] << np.uint64(32)) | next_ids[None, :]).ravel()
+        counts = np.zeros(len(keys), dtype=np.float64)
+        if len(self.bigram_keys):
+            pos = np.searchsorted(self.bigram_keys, keys)
+            valid = pos < len(self.bigram_keys)
+            found = np.zeros(len(keys), dtype=bool)
+            found[valid] = self.bigram_keys[pos[valid]] == keys[valid]
+            counts[found] = self.bigram_values[pos[found]]
+        return counts.reshape(len(prev_ids), len(next_ids))
+
+    def close(self):
+        # Bỏ các view numpy trước, mmap không đóng được khi còn buffer trỏ vào
+        self.key_hashes = self.bigram_keys = self.key_start = self.cand_word = None
+        self.word_freq = self.word_offsets = self.bigram_values = None
+        self._mmap.close()
+
+
+class DiacriticRestorer:
+    """
+    Khôi phục dấu cho từ không dấu dựa trên lexicon + ngữ cảnh (Viterbi trên bigram)
+
+    - Chỉ từ không dấu (toàn chữ ASCII) mới được thay; từ đã có dấu giữ nguyên nhưng vẫn làm ngữ cảnh
+    - Chuỗi ngữ cảnh bị ngắt tại dấu câu / xuống dòng (chỉ nối qua khoảng trắng)
+    - Giữ kiểu chữ hoa/thường của từ gốc
+
+    Args:
+        index: LexiconIndex
+        max_candidates: Số ứng viên tối đa xét cho mỗi từ
+        bigram_weight: Trọng số nội suy bigram (phần còn lại là unigram)
+    """
+
+    def __init__(self, index, max_candidates=8, bigram_weight=0.8):
+        self.index = index
+        self.max_candidates = max_candidates
+        self.bigram_weight = bigram_weight
+        self._vocab = max(1, index.n_words)
+        self._total = max(1, index.total_count)
+
+    def _unigram_logprob(self, freqs):
+        return np.log((np.asarray(freqs, dtype=np.float64) + 1.0) / (self._total + self._vocab))
+
+    def _states(self, token):
+        """Các trạng thái của một từ: (forms, word_ids) - word_id None = từ ngoài lexicon"""
+        key = strip_diacritics(token)
+        candidates = self.index.candidates(key)
+        lowered = _normalize_word(token)
+        if not token.isascii() or not token.isalpha():
+            # Từ đã có dấu / có số: giữ nguyên, chỉ tìm id để làm ngữ cảnh
+            for form, word_id, freq in candidates:
+                if form == lowered:
+                    return [token], [word_id], [freq]
+            return [token], [None], [0]
+        if not candidates:
+            return [token], [None], [0]
+        candidates = candidates[:self.max_candidates]
+        return ([_match_case(token, form) for form, _, _ in candidates],
+                [word_id for _, word_id, _ in candidates],
+                [freq for _, _, freq in candidates])
+
+    def _best_path(self, chain):
+        """Viterbi cho một chuỗi từ liên tiếp - trả về list dạng được chọn"""
+        prev_scores = None
+        prev_ids = None
+        backpointers = []
+        all_forms = []
+        for token in chain:
+            forms, ids, freqs = self._states(token)
+            all_forms.append(forms)
+            unigram = self._unigram_logprob(freqs)
+            if prev_scores is None:
+                scores = unigram
+                backpointers.append(None)
+            else:
+                transition = np.tile(unigram, (len(prev_ids), 1))
+                known_prev = [i for i, word_id in enumerate(prev_ids) if word_id is not None]
+                known_next = [j for j, word_id in enumerate(ids) if word_id is not None]
+                if known_prev and known_next:
+                    counts = self.index.bigram_counts([prev_ids[i] for i in known_prev], [ids[j] for j in known_next])
+                    prev_freq = np.array([self.index.word_freq[prev_ids[i]] for i in known_prev], dtype=np.float64)
+                    p_bigram = counts / np.maximum(prev_freq, 1.0)[:, None]
+                    p_unigram = np.exp(unigram[known_next])[None, :]
+                    mixed = np.log(self.bigram_weight * p_bigram + (1 - self.bigram_weight) * p_unigram)
+                    transition[np.ix_(known_prev, known_next)] = mixed
+                total = prev_scores[:, None] + transition
+                backpointers.append(np.argmax(total, axis=0))
+                scores = np.max(total, axis=0)
+            prev_scores = scores
+            prev_ids = ids
+
+        best = int(np.argmax(prev_scores))
+        path = [best]
+        for pointers in reversed(backpointers[1:]):
+            best = int(pointers[best])
+            path.append(best)
+        path.reverse()
+        return [forms[i] for forms, i in zip(all_forms, path)]
+
+    def restore(self, text):
+        """Khôi phục dấu cho text - phần không phải từ giữ nguyên"""
+        if not text:
+            return text
+
+        words = list(_WORD_RE.finditer(text))
+        if not words:
+            return text
+
+        # Tách thành các chuỗi từ chỉ cách nhau bởi khoảng trắng
+        chains = [[words[0]]]
+        for prev, word in zip(words, words[1:]):
+            separator = text[prev.end():word.start()]
+            if separator.strip(' \t'):
+                chains.append([word])
+            else:
+                chains[-1].append(word)
+
+        output = []
+        pos = 0
+        for chain in chains:
+            forms = self._best_path([match.group() for match in chain])
+            for match, form in zip(chain, forms):
+                output.append(text[pos:match.start()])
+                output.append(form)
+                pos = match.end()
+        output.append(text[pos:])
+        return ''.join(output)
+
+
+def _match_case(original, form):
+    """Áp kiểu chữ của từ gốc lên dạng có dấu"""
+    if original.isupper() and len(original) > 1:
+        return form.upper()
+    if original[:1].isupper():
+        return form[:1].upper() + form[1:]
+    return form
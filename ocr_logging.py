@@ -0,0 +1,146 @@
+"""
+OCR Logging - Log có cấu trúc theo level cho OCR service
+- Mỗi log là một dòng JSON (JSON lines): ts, level, logger, msg + request_id / page / stage / duration_ms
+  và các field thêm qua extra={...} -> gom, lọc, thống kê được bằng công cụ log
+- request_id / page / stage lấy từ contextvars (log_context, log_stage) nên không cần truyền qua từng hàm
+- Level chặn log TRƯỚC khi format: log.debug("... %s", x) ở level INFO không tạo record, không format
+  (đoạn debug phải tính toán thêm thì bọc trong `if log.isEnabledFor(logging.DEBUG):`)
+
+Cấu hình (env):
+    LOG_LEVEL   DEBUG / INFO (mặc định) / WARNING / ERROR
+    LOG_FORMAT  json (mặc định) / text (dễ đọc khi dev)
+"""
+
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+ROOT_LOGGER_NAME = 'ocr'
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+page_var = contextvars.ContextVar('page', default=None)
+stage_var = contextvars.ContextVar('stage', default=None)
+
+_CONTEXT_VARS = (('request_id', request_id_var), ('page', page_var), ('stage', stage_var))
+# Attribute có sẵn của LogRecord - phần còn lại trong record.__dict__ là field truyền qua extra
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class ContextFilter(logging.Filter):
+    """Gắn request_id / page / stage từ contextvars vào record (extra truyền trực tiếp được ưu tiên)"""
+
+    def filter(self, record):
+        for name, var in _CONTEXT_VARS:
+            if getattr(record, name, None) is None:
+                setattr(record, name, var.get())
+        return True
+
+
+def _record_fields(record):
+    return {key: value for key, value in record.__dict__.items()
+            if key not in _RECORD_ATTRS and not key.startswith('_') and value is not None}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Một record = một dòng JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update(_record_fields(record))
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Dạng dễ đọc cho dev: time level message [key=value ...]"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(message)s', datefmt='%H:%M:%S')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _record_fields(record)
+        if fields:
+            line += '  [' + ' '.join(f"{key}={value}" for key, value in fields.items()) + ']'
+        return line
+
+
+def configure_logging(level=None, fmt=None, stream=None):
+    """
+    Cấu hình logger gốc 'ocr' (gọi lại được - thay handler cũ)
+
+    Args:
+        level: Tên level / số (mặc định env LOG_LEVEL hoặc INFO)
+        fmt: 'json' / 'text' (mặc định env LOG_FORMAT hoặc json)
+        stream: Nơi ghi log (mặc định stdout)
+    """
+    level = level or os.getenv('LOG_LEVEL', 'INFO')
+    fmt = (fmt or os.getenv('LOG_FORMAT', 'json')).lower()
+    if isinstance(level, str):
+        level = logging.getLevelName(level.upper())
+        if not isinstance(level, int):
+            level = logging.INFO
+
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(TextFormatter() if fmt == 'text' else JsonLinesFormatter())
+    handler.addFilter(ContextFilter())
+
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    for old_handler in list(root.handlers):
+        root.removeHandler(old_handler)
+    root.addHandler(handler)
+    root.setLevel(level)
+    root.propagate = False
+    return root
+
+
+def get_logger(name):
+    """Logger con của 'ocr' (vd get_logger('app') -> 'ocr.app')"""
+    return logging.getLogger(f"{ROOT_LOGGER_NAME}.{name}")
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def log_context(**fields):
+    """Đặt request_id / page / stage cho mọi log trong khối with (cùng thread / context)"""
+    tokens = []
+    for name, var in _CONTEXT_VARS:
+        if name in fields:
+            tokens.append((var, var.set(fields[name])))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+@contextmanager
+def log_stage(logger, stage, level=logging.DEBUG, **fields):
+    """
+    Đánh dấu một stage: log trong khối with có stage=<stage>, kết thúc ghi một log kèm duration_ms
+    (chỉ format khi logger bật level đó)
+    """
+    token = stage_var.set(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_var.reset(token)
+        if logger.isEnabledFor(level):
+            fields['duration_ms'] = round((time.perf_counter() - start) * 1000, 2)
+            logger.log(level, "stage %s xong", stage, extra=dict(fields, stage=stage))
@@ -0,0 +1,305 @@
+"""
+OCR Metrics - Đo thời gian từng stage và export dạng Prometheus text (GET /metrics)
+- Histogram / Counter / Gauge tự viết (không cần prometheus_client), thread-safe
+- timed_stage(): đo một stage (upload_read, type_sniffing, rasterize, ocr, line_grouping,
+  correction, html_build...) -> histogram ocr_stage_duration_seconds{stage=...}
+  + cộng dồn vào StageTimings của request hiện tại (contextvars) để log tổng kết từng request
+- BusyTracker: tỉ lệ thời gian engine OCR đang chạy trong cửa sổ gần nhất (engine-busy ratio)
+
+Lưu ý: metrics nằm trong memory của từng process - chạy nhiều worker process thì Prometheus
+scrape từng process (hoặc cộng theo instance)
+"""
+
+import math
+import bisect
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+from ocr_logging import log_stage
+
+# Bucket (giây) cho stage OCR: từ vài ms (line grouping) đến vài phút (PDF dài)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class _Metric:
+    metric_type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: cần label {self.labelnames}, nhận {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    metric_type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+
+    def inc(self, amount=1.0, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """Gauge - set/inc/dec, hoặc lấy giá trị lúc scrape qua callback (set_function)"""
+    metric_type = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = None
+
+    def set(self, value, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def inc(self, amount=1.0, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount=1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn):
+        """fn() -> số (gauge không label) hoặc dict {tuple label values: số}"""
+        self._function = fn
+
+    def _samples(self):
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                return []  # Không để lỗi một gauge làm hỏng cả /metrics
+            items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(float(value))}"
+                for key, value in items if value is not None]
+
+
+class Histogram(_Metric):
+    """Histogram cumulative bucket giống Prometheus (_bucket{le}, _sum, _count)"""
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets)) + (math.inf,)
+        self._series = {}  # label values -> [counts từng bucket (không cumulative), sum]
+
+    def observe(self, value, **labels):
+        key = self._label_values(labels)
+        index = bisect.bisect_left(self.buckets, value)  # Bucket đầu tiên có upper bound >= value
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def totals(self):
+        """{label values: (count, sum)} - dùng để so sánh trước/sau (vd benchmark)"""
+        with self._lock:
+            return {key: (sum(counts), total) for key, (counts, total) in self._series.items()}
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Prometheus text exposition format 0.0.4"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class BusyTracker:
+    """
+    Tỉ lệ thời gian engine bận trong window_seconds gần nhất (0-1), chia theo capacity
+    (capacity = số engine chạy song song, vd số worker process)
+    """
+
+    def __init__(self, window_seconds=60.0, capacity=1):
+        self.window = float(window_seconds)
+        self.capacity = max(1, int(capacity))
+        self.total_seconds = 0.0
+        self._intervals = deque()  # (start, end) đã xong, theo thứ tự kết thúc
+        self._active = {}          # token -> start
+        self._lock = threading.Lock()
+        self._next_token = 0
+
+    def _trim(self, now):
+        while self._intervals and self._intervals[0][1] < now - self.window:
+            self._intervals.popleft()
+
+    @contextmanager
+    def busy(self):
+        """Đánh dấu engine đang chạy trong khối with"""
+        start = time.monotonic()
+        with self._lock:
+            token = self._next_token
+            self._next_token += 1
+            self._active[token] = start
+        try:
+            yield
+        finally:
+            end = time.monotonic()
+            with self._lock:
+                del self._active[token]
+                self._intervals.append((start, end))
+                self.total_seconds += end - start
+                self._trim(end)
+
+    def add(self, seconds):
+        """Ghi một khoảng bận vừa kết thúc (đo ở nơi khác, vd trong worker process)"""
+        end = time.monotonic()
+        with self._lock:
+            self._intervals.append((end - seconds, end))
+            self.total_seconds += seconds
+            self._trim(end)
+
+    def ratio(self):
+        now = time.monotonic()
+        window_start = now - self.window
+        with self._lock:
+            self._trim(now)
+            busy = sum(end - max(start, window_start) for start, end in self._intervals if end > window_start)
+            busy += sum(now - max(start, window_start) for start in self._active.values())
+        return round(min(1.0, busy / (self.window * self.capacity)), 4)
+
+
+class StageTimings:
+    """Tổng thời gian từng stage của một request (cộng từ nhiều thread)"""
+
+    def __init__(self):
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage, seconds):
+        with self._lock:
+            self._totals[stage] = self._totals.get(stage, 0.0) + seconds
+
+    def as_seconds(self):
+        with self._lock:
+            return dict(self._totals)
+
+    def as_ms(self):
+        with self._lock:
+            return {stage: round(seconds * 1000, 2) for stage, seconds in self._totals.items()}
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'ocr_stage_duration_seconds',
+    'Thời gian từng stage xử lý (mỗi lần chạy stage: theo trang hoặc theo request)',
+    ('stage',)
+)
+
+_stage_timings_var = contextvars.ContextVar('stage_timings', default=None)
+
+
+def record_stage(stage, seconds):
+    """Ghi thời gian một stage vào histogram + StageTimings của request hiện tại (nếu có)"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _stage_timings_var.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def collect_stage_timings():
+    """Gom thời gian các stage chạy trong khối with (kể cả thread copy context) vào một StageTimings"""
+    timings = StageTimings()
+    token = _stage_timings_var.set(timings)
+    try:
+        yield timings
+    finally:
+        _stage_timings_var.reset(token)
+
+
+@contextmanager
+def timed_stage(stage, logger=None, **fields):
+    """Đo một stage -> histogram; có logger thì log DEBUG kèm duration_ms (xem ocr_logging.log_stage)"""
+    start = time.perf_counter()
+    try:
+        if logger is None:
+            yield
+        else:
+            with log_stage(logger, stage, **fields):
+                yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
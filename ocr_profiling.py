@@ -0,0 +1,137 @@
+"""
+OCR Profiling - Profile MỘT request (opt-in) để tìm stage nào chậm với một tài liệu cụ thể
+- 'sample': lấy mẫu stack của TẤT CẢ thread mỗi interval (sys._current_frames) -> collapsed stacks
+  ("thread;module:func;module:func N" mỗi dòng) - đưa thẳng vào flamegraph.pl / speedscope
+  Thấy được cả thread render trang (prefetch) và thread sửa chính tả chạy nền
+- 'cprofile': cProfile (deterministic) cho thread xử lý request -> pstats (marshal, base64)
+  + bảng top function theo cumulative time; phần chạy trên thread khác chỉ thấy là thời gian chờ
+
+Không profile được trang OCR trong worker process (OCR_WORKERS > 1)
+"""
+
+import io
+import sys
+import time
+import base64
+import marshal
+import pstats
+import cProfile
+import threading
+from collections import Counter
+
+PROFILE_MODES = ('sample', 'cprofile')
+
+
+class SamplingProfiler:
+    """
+    Lấy mẫu stack mọi thread (trừ thread sampler) trên background thread
+
+    Args:
+        interval: Khoảng cách giữa 2 lần lấy mẫu (giây)
+        max_depth: Số frame tối đa mỗi stack (tính từ frame ngoài cùng)
+    """
+
+    def __init__(self, interval=0.005, max_depth=128):
+        self.interval = max(0.001, float(interval))
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _frame_label(frame):
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', '?')
+        return f"{module}:{code.co_name}"
+
+    def _sample_once(self, thread_names):
+        own_id = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(self._frame_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+            stack = [thread_names.get(thread_id, f"thread-{thread_id}")] + labels[:self.max_depth]
+            self._stacks[';'.join(stack)] += 1
+        self.samples += 1
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            self._sample_once(thread_names)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name='ocr-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self):
+        """Collapsed stacks (Brendan Gregg format), nhiều mẫu nhất trước"""
+        return '\n'.join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+
+
+# Sampler xem mọi thread -> chỉ cho một profile sampling chạy tại một thời điểm
+_sampling_lock = threading.Lock()
+
+
+def profile_call(fn, *args, mode='sample', interval=0.005, top=40, **kwargs):
+    """
+    Chạy fn(*args, **kwargs) dưới profiler
+
+    Returns:
+        Tuple (kết quả fn, artifact dict) - artifact None nếu đang có profile sampling khác chạy
+        Artifact:
+          sample:   {'mode', 'format': 'collapsed', 'samples', 'interval_ms', 'duration_s', 'data'}
+          cprofile: {'mode', 'format': 'pstats-marshal-base64', 'duration_s', 'top', 'data'}
+                    (base64 decode -> file .prof -> pstats / snakeviz / flameprof)
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Profile mode không hợp lệ: '{mode}' (hỗ trợ: {', '.join(PROFILE_MODES)})")
+
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            result = profiler.runcall(fn, *args, **kwargs)
+        finally:
+            duration = time.perf_counter() - start
+        report = io.StringIO()
+        stats = pstats.Stats(profiler, stream=report)  # Stats lấy (và xoá) profiler.stats
+        stats.sort_stats('cumulative').print_stats(top)
+        return result, {
+            'mode': mode,
+            'format': 'pstats-marshal-base64',
+            'duration_s': round(duration, 3),
+            'top': report.getvalue(),
+            'data': base64.b64encode(marshal.dumps(stats.stats)).decode('ascii'),
+        }
+
+    if not _sampling_lock.acquire(blocking=False):
+        return fn(*args, **kwargs), None
+    try:
+        sampler = SamplingProfiler(interval=interval)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            sampler.stop()
+            duration = time.perf_counter() - start
+        return result, {
+            'mode': mode,
+            'format': 'collapsed',
+            'samples': sampler.samples,
+            'interval_ms': sampler.interval * 1000,
+            'duration_s': round(duration, 3),
+            'data': sampler.collapsed(),
+        }
+    finally:
+        _sampling_lock.release()
@@ -0,0 +1,261 @@
+"""
+Page Pipeline - Xử lý nhiều trang song song
+- OCRWorkerPool: N worker process, mỗi worker giữ một PaddleOCR instance riêng
+- Trang được đưa vào pool ngay khi có, kết quả trả về ĐÚNG THỨ TỰ trang
+- Lỗi được cô lập theo từng trang (một trang lỗi không làm hỏng các trang khác)
+- prefetch: render trang trên background thread, chỉ giữ một cửa sổ giới hạn trang trong memory
+- CompletedPage: trang đã có kết quả (ví dụ từ cache) đi qua pipeline mà không OCR lại
+"""
+
+import os
+import sys
+import queue
+import threading
+import contextvars
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ocr_logging import get_logger
+
+log = get_logger('pipeline')
+
+
+def resolve_worker_count(value):
+    """
+    Parse cấu hình số worker
+    - '0' / '1' / rỗng: tắt pool (xử lý tuần tự như cũ)
+    - 'auto': số core CPU
+    - số nguyên N: N worker
+    """
+    value = (str(value) if value is not None else '').strip().lower()
+    if not value:
+        return 0
+    if value == 'auto':
+        return os.cpu_count() or 1
+    try:
+        return max(0, int(value))
+    except ValueError:
+        log.warning("⚠️  Giá trị số worker không hợp lệ: '%s', tắt worker pool", value)
+        return 0
+
+
+def default_start_method():
+    """
+    forkserver trên Linux/Mac, spawn trên Windows
+    Không dùng fork: pool được tạo lazy khi process đã có nhiều thread (prefetch, correction, batcher,
+    thread OpenMP của Paddle) - fork lúc đó copy cả lock đang bị thread khác giữ -> worker có thể deadlock.
+    Forkserver là process đơn thread start sạch, worker được fork từ đó
+    """
+    if sys.platform.startswith('win') or 'forkserver' not in multiprocessing.get_all_start_methods():
+        return 'spawn'
+    return 'forkserver'
+
+
+class CompletedPage:
+    """
+    Trang đã có kết quả sẵn - không cần gửi vào worker
+
+    Args:
+        result: Kết quả trang (cùng format với ocr_image)
+        source: Nguồn kết quả - 'cache' (page cache) hoặc 'text_layer' (text layer của PDF)
+    """
+
+    __slots__ = ('result', 'source')
+
+    def __init__(self, result, source='cache'):
+        self.result = result
+        self.source = source
+
+
+_PREFETCH_DONE = object()
+
+
+def prefetch(iterable, max_ahead=2):
+    """
+    Chạy iterable trên background thread và yield từng item theo thứ tự
+    - Trang N+1 được render trong lúc trang N đang OCR
+    - Tối đa max_ahead item đã render nằm chờ trong queue (memory không tăng theo số trang)
+    - Exception của producer được raise lại ở phía consumer
+    - Consumer dừng sớm (close/exception) -> producer dừng và iterable được close trên thread của nó
+
+    Args:
+        iterable: Nguồn item (thường là generator render trang PDF)
+        max_ahead: Số item tối đa render trước (<= 0: không dùng thread, yield trực tiếp)
+    """
+    if max_ahead <= 0:
+        yield from iterable
+        return
+
+    items = queue.Queue(maxsize=max_ahead)
+    stop = threading.Event()
+
+    def put(entry):
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    break
+            put((_PREFETCH_DONE, None))
+        except BaseException as e:
+            put((_PREFETCH_DONE, e))
+        finally:
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    # Thread render chạy trong bản copy contextvars của caller (log giữ request_id)
+    thread = threading.Thread(target=contextvars.copy_context().run, args=(producer,), name='page-prefetch', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _PREFETCH_DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        thread.join()
+
+
+class OCRWorkerPool:
+    """
+    Process pool cho OCR từng trang
+
+    Args:
+        worker_fn: Hàm OCR một trang (phải pickle được - hàm top-level của module)
+        initializer: Hàm chạy một lần trong mỗi worker (tạo PaddleOCR instance riêng)
+        initargs: Tham số cho initializer (phải pickle được)
+        max_workers: Số worker process
+        max_pending: Số trang tối đa đang chờ/đang xử lý trong pool cùng lúc
+                     (giới hạn memory khi PDF có nhiều trang)
+        start_method: 'fork' / 'spawn' / 'forkserver'
+    """
+
+    def __init__(self, worker_fn, initializer=None, max_workers=2, max_pending=None, start_method=None, initargs=()):
+        self.worker_fn = worker_fn
+        self.initializer = initializer
+        self.initargs = tuple(initargs)
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(self.max_workers, int(max_pending or self.max_workers * 2))
+        self.start_method = start_method or default_start_method()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        """Lazy tạo executor - tạo lại nếu pool cũ bị hỏng (worker crash)"""
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                module = getattr(self.worker_fn, '__module__', None)
+                if self.start_method == 'forkserver' and module and module != '__main__':
+                    # Forkserver import sẵn module của worker_fn một lần, mỗi worker fork từ đó
+                    context.set_forkserver_preload([module])
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=context,
+                    initializer=self.initializer,
+                    initargs=self.initargs
+                )
+            return self._executor
+
+    def _reset_executor(self, broken_executor):
+        """Bỏ executor đã hỏng để lần submit sau tạo pool mới"""
+        with self._lock:
+            if self._executor is broken_executor:
+                self._executor = None
+                try:
+                    broken_executor.shutdown(wait=False, cancel_futures=True)
+                except Exception:
+                    pass
+
+    def _submit(self, page):
+        if isinstance(page, CompletedPage):
+            future = Future()
+            future.set_result(page.result)
+            return None, future
+        executor = self._get_executor()
+        try:
+            return executor, executor.submit(self.worker_fn, page)
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            executor = self._get_executor()
+            return executor, executor.submit(self.worker_fn, page)
+
+    def _collect(self, idx, page, executor, future):
+        """Chờ kết quả một trang - trả về (idx, result, error)"""
+        try:
+            return idx, future.result(), None
+        except BrokenProcessPool:
+            # Một worker crash làm hỏng cả pool -> tạo pool mới và thử lại trang này MỘT lần
+            # Trang gây crash sẽ làm hỏng pool lần nữa và chỉ trang đó bị báo lỗi
+            self._reset_executor(executor)
+            try:
+                executor, future = self._submit(page)
+                return idx, future.result(), None
+            except BrokenProcessPool as e:
+                self._reset_executor(executor)
+                return idx, None, e
+            except Exception as e:
+                return idx, None, e
+        except Exception as e:
+            return idx, None, e
+
+    def map_pages(self, pages):
+        """
+        OCR các trang trên pool - yield (idx, result, error) theo đúng thứ tự trang
+
+        Args:
+            pages: Iterable các trang (có thể là generator - trang được submit ngay khi có)
+                   Item là CompletedPage sẽ được trả về luôn theo đúng vị trí, không OCR
+        """
+        window = deque()
+        for idx, page in enumerate(pages):
+            executor, future = self._submit(page)
+            window.append((idx, page, executor, future))
+            while len(window) >= self.max_pending:
+                yield self._collect(*window.popleft())
+        while window:
+            yield self._collect(*window.popleft())
+
+    def warm_up(self, warmup_fn, max_rounds=3):
+        """
+        Start đủ max_workers process và chạy warmup_fn một lần trong từng process
+
+        Args:
+            warmup_fn: Hàm top-level chạy trong worker -> (pid, kết quả), kết quả None nếu process đó
+                       đã warm-up (một process có thể nhận nhiều task khi các process khác còn đang khởi tạo)
+            max_rounds: Số lượt submit tối đa cho đến khi mọi process đã warm-up
+
+        Returns:
+            {pid: kết quả} của các process đã warm-up
+        """
+        results = {}
+        for _ in range(max_rounds):
+            executor = self._get_executor()
+            futures = [executor.submit(warmup_fn) for _ in range(self.max_workers)]
+            for future in futures:
+                pid, result = future.result()
+                if result is not None:
+                    results[pid] = result
+            if len(results) >= self.max_workers:
+                break
+        return results
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,108 @@
+"""
+Recognition Batcher - Dynamic batching cho bước nhận dạng (cls + rec) của PaddleOCR
+- Mỗi caller (trang / request) tự chạy detection và cắt crop từng dòng text
+- Crop từ nhiều caller được gom trong một cửa sổ thời gian nhỏ (vd 10ms) thành batch lớn
+- Một thread scheduler chạy recognition cho cả batch rồi trả kết quả về đúng caller
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future
+
+
+class _BatchRequest:
+    __slots__ = ('crops', 'future')
+
+    def __init__(self, crops):
+        self.crops = crops
+        self.future = Future()
+
+
+class RecognitionBatcher:
+    """
+    Gom crop từ nhiều caller và chạy recognition theo batch
+
+    Args:
+        recognize_fn: Hàm nhận list crop (numpy BGR) -> list kết quả cùng thứ tự
+        max_batch_size: Số crop tối đa trong một batch (throughput)
+        max_wait_ms: Thời gian tối đa chờ gom thêm crop sau request đầu tiên (latency)
+    """
+
+    def __init__(self, recognize_fn, max_batch_size=64, max_wait_ms=10):
+        self.recognize_fn = recognize_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms) / 1000.0)
+        self._requests = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self.batches = 0
+        self.batched_crops = 0
+        self.batched_requests = 0
+        self._thread = threading.Thread(target=self._loop, name='rec-batcher', daemon=True)
+        self._thread.start()
+
+    def recognize(self, crops, timeout=None):
+        """
+        Nhận dạng list crop (blocking) - trả về list kết quả cùng thứ tự với crops
+        Exception của recognize_fn được raise lại cho caller
+        """
+        if not crops:
+            return []
+        request = _BatchRequest(list(crops))
+        self._requests.put(request)
+        return request.future.result(timeout=timeout)
+
+    def _collect_batch(self):
+        """Chờ request đầu tiên rồi gom thêm đến khi đủ batch hoặc hết cửa sổ thời gian"""
+        batch = [self._requests.get()]
+        size = len(batch[0].crops)
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._requests.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(request)
+            size += len(request.crops)
+        return batch, size
+
+    def _loop(self):
+        while True:
+            batch, size = self._collect_batch()
+            all_crops = [crop for request in batch for crop in request.crops]
+            try:
+                results = self.recognize_fn(all_crops)
+                if len(results) != len(all_crops):
+                    raise Exception(f"Recognition trả về {len(results)} kết quả cho {len(all_crops)} crop")
+            except Exception as e:
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            # Scatter kết quả về từng caller theo offset
+            offset = 0
+            for request in batch:
+                count = len(request.crops)
+                request.future.set_result(results[offset:offset + count])
+                offset += count
+
+            with self._stats_lock:
+                self.batches += 1
+                self.batched_crops += size
+                self.batched_requests += len(batch)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'batches': self.batches,
+                'crops': self.batched_crops,
+                'requests': self.batched_requests,
+                'avg_batch_size': round(self.batched_crops / self.batches, 2) if self.batches else 0.0,
+                'avg_requests_per_batch': round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'queued_requests': self._requests.qsize(),
+            }
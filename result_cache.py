@@ -0,0 +1,244 @@
+"""
+Result Cache - Cache kết quả OCR theo nội dung (content-addressed)
+- Key = SHA-256 của bytes file + các option ảnh hưởng đến output
+- Tier 1: LRU trong memory (giới hạn số entry)
+- Tier 2 (optional): file JSON trên disk, sống qua restart
+  giới hạn theo tổng dung lượng / số file, vượt giới hạn thì xoá file ít được dùng nhất (LRU theo mtime)
+- Đếm hit/miss để expose trên /health
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+from ocr_logging import get_logger
+
+log = get_logger('cache')
+
+# Tăng khi format kết quả thay đổi để không dùng lại cache cũ
+CACHE_FORMAT_VERSION = 1
+
+
+def make_cache_key(content, **options):
+    """
+    Tạo cache key từ nội dung (bytes) và options
+
+    Args:
+        content: bytes của file / trang
+        **options: Các option ảnh hưởng đến output (phải JSON-serializable)
+
+    Returns:
+        Hex digest SHA-256
+    """
+    digest = hashlib.sha256()
+    digest.update(f"v{CACHE_FORMAT_VERSION}\0".encode('utf-8'))
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(content)
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """LRU cache thread-safe trong memory, giới hạn theo số entry"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max(0, int(max_entries))
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ResultCache:
+    """
+    Cache 2 tầng (memory LRU + disk JSON) cho kết quả OCR
+
+    Args:
+        max_entries: Số entry tối đa trong memory
+        disk_dir: Thư mục lưu cache trên disk (None = chỉ dùng memory)
+        name: Tên cache (hiển thị trong stats)
+        max_disk_bytes: Tổng dung lượng tối đa của disk tier (0 = không giới hạn)
+        max_disk_entries: Số file tối đa của disk tier (0 = không giới hạn)
+
+    Disk tier là LRU: đọc trúng thì touch mtime, ghi mới mà vượt giới hạn thì xoá file mtime cũ nhất.
+    Index (key -> size) giữ trong memory, dựng lại từ mtime khi start. Nhiều process dùng chung thư mục
+    (gunicorn worker) thì mỗi process tự evict theo index của nó - tổng có thể vượt giới hạn tạm thời.
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None, name='results', max_disk_bytes=0, max_disk_entries=0):
+        self.name = name
+        self.memory = LRUCache(max_entries)
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max(0, int(max_disk_bytes or 0))
+        self.max_disk_entries = max(0, int(max_disk_entries or 0))
+        self._lock = threading.Lock()
+        self._disk_index = OrderedDict()  # key -> size (bytes), cũ nhất trước
+        self._disk_bytes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.disk_evictions = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._load_disk_index()
+            self._evict_disk()  # Giới hạn có thể đã giảm từ lần chạy trước
+
+    def _disk_path(self, key):
+        # Chia thư mục con theo 2 ký tự đầu để tránh quá nhiều file trong một thư mục
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _load_disk_index(self):
+        """Dựng index disk tier từ file có sẵn, sắp theo mtime (file dùng lâu nhất trước)"""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for filename in files:
+                if not filename.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, filename))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, filename[:-len('.json')], stat.st_size))
+        entries.sort()
+        with self._lock:
+            self._disk_index = OrderedDict((key, size) for _, key, size in entries)
+            self._disk_bytes = sum(size for _, _, size in entries)
+
+    def _disk_over_limit(self):
+        return bool(self._disk_index) and (
+            (self.max_disk_entries and len(self._disk_index) > self.max_disk_entries)
+            or (self.max_disk_bytes and self._disk_bytes > self.max_disk_bytes)
+        )
+
+    def _evict_disk(self):
+        """Xoá file LRU cho đến khi disk tier nằm trong giới hạn"""
+        while True:
+            with self._lock:
+                if not self._disk_over_limit():
+                    return
+                key, size = self._disk_index.popitem(last=False)
+                self._disk_bytes -= size
+                self.disk_evictions += 1
+            try:
+                os.remove(self._disk_path(key))
+            except FileNotFoundError:
+                pass  # Process khác đã xoá
+            except OSError as e:
+                log.warning("⚠️  Không xoá được cache %s: %s", self._disk_path(key), e)
+
+    def _forget_disk(self, key):
+        with self._lock:
+            size = self._disk_index.pop(key, None)
+            if size is not None:
+                self._disk_bytes -= size
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                value = json.load(f)
+        except FileNotFoundError:
+            self._forget_disk(key)  # Bị evict bởi process khác
+            return None
+        except Exception as e:
+            log.warning("⚠️  Không đọc được cache %s: %s", path, e)
+            return None
+        try:
+            os.utime(path)  # mtime = lần dùng gần nhất (LRU qua restart)
+        except OSError:
+            pass
+        with self._lock:
+            if key in self._disk_index:
+                self._disk_index.move_to_end(key)
+        return value
+
+    def _write_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Ghi file tạm rồi rename -> không bao giờ đọc phải file ghi dở
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(value, f, ensure_ascii=False)
+            size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            log.warning("⚠️  Không ghi được cache %s: %s", path, e)
+            return
+        with self._lock:
+            self._disk_bytes += size - self._disk_index.pop(key, 0)
+            self._disk_index[key] = size
+        self._evict_disk()
+
+    def get(self, key):
+        """Lấy kết quả theo key - memory trước, disk sau (hit trên disk được đưa lên memory)"""
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.memory_hits += 1
+            return value
+
+        value = self._read_disk(key)
+        if value is not None:
+            self.memory.put(key, value)
+            with self._lock:
+                self.disk_hits += 1
+            return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Lưu kết quả (value phải JSON-serializable nếu dùng disk tier)"""
+        self.memory.put(key, value)
+        self._write_disk(key, value)
+
+    def stats(self):
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'name': self.name,
+                'hits': hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': round(hits / lookups, 4) if lookups else 0.0,
+                'memory_entries': len(self.memory),
+                'max_memory_entries': self.memory.max_entries,
+                'disk_enabled': bool(self.disk_dir),
+                'disk_entries': len(self._disk_index),
+                'disk_bytes': self._disk_bytes,
+                'max_disk_entries': self.max_disk_entries,
+                'max_disk_bytes': self.max_disk_bytes,
+                'disk_evictions': self.disk_evictions,
+            }
@@ -0,0 +1,124 @@
+"""
+Rule Engine - Sửa chính tả rule-based cho tiếng Việt, compile một lần khi import
+- Rule theo từ / cụm từ (vd "khong" -> "không", "quyet dinh" -> "quyết định") load từ file TSV
+- Áp dụng tất cả rule trong MỘT lần quét: tách từ rồi tra bảng theo cụm dài nhất (longest match)
+  -> thời gian không tăng theo số rule (có thể lên hàng chục nghìn rule)
+- Rule dấu câu / khoảng trắng: regex compile sẵn, áp dụng tuần tự theo thứ tự cố định
+"""
+
+import os
+import re
+
+from ocr_logging import get_logger
+
+log = get_logger('rule_engine')
+
+RULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rules')
+
+_WORD_RE = re.compile(r'\w+')
+
+# Rule dấu câu và spacing - thứ tự quan trọng (giữ đúng thứ tự cũ)
+PUNCTUATION_RULES = [
+    (re.compile(r'\.\s*\.'), '.'),             # Double dots
+    (re.compile(r',\s*,'), ','),               # Double commas
+    (re.compile(r'\s+\.'), '.'),               # Space before period
+    (re.compile(r'\.\s+'), '. '),              # Space after period
+    (re.compile(r'\s+'), ' '),                 # Multiple spaces
+    (re.compile(r'\s+([.,;:!?])'), r'\1'),     # Space before punctuation
+]
+
+
+def apply_punctuation_rules(text):
+    """Sửa dấu câu / khoảng trắng bằng các regex đã compile sẵn"""
+    for pattern, replacement in PUNCTUATION_RULES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def load_word_rules(*paths):
+    """
+    Load rule từ các file TSV: mỗi dòng "từ gốc<TAB>từ đã sửa", dòng trống / bắt đầu bằng # bị bỏ qua
+    Từ gốc không phân biệt hoa thường, cụm từ cách nhau một dấu cách
+    Key trùng: giá trị sau cùng được dùng (có cảnh báo)
+
+    Returns:
+        Dict từ gốc (lowercase) -> từ đã sửa
+    """
+    rules = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.rstrip('\n')
+                if not line.strip() or line.lstrip().startswith('#'):
+                    continue
+                parts = line.split('\t')
+                if len(parts) != 2 or not parts[0].strip():
+                    log.warning("⚠️  Rule không hợp lệ %s:%d: %r", os.path.basename(path), line_no, line)
+                    continue
+                key = ' '.join(parts[0].lower().split())
+                if key in rules and rules[key] != parts[1]:
+                    log.warning("⚠️  Rule trùng %s:%d: '%s' (%r -> %r)", os.path.basename(path), line_no, key,
+                                rules[key], parts[1])
+                rules[key] = parts[1]
+    return rules
+
+
+class WordRuleEngine:
+    """
+    Thay thế từ / cụm từ theo bảng rule trong một lần quét
+
+    Tại mỗi từ, thử cụm dài nhất có trong bảng (các từ của cụm cách nhau đúng một dấu cách);
+    phần text không khớp rule giữ nguyên. Khớp không phân biệt hoa thường, thay bằng giá trị trong bảng.
+    """
+
+    def __init__(self, rules):
+        self.rules = {' '.join(key.lower().split()): value for key, value in rules.items()}
+        # Tất cả tiền tố (theo từ) của các cụm -> dừng mở rộng sớm khi không còn cụm nào khớp
+        self._prefixes = set()
+        for key in self.rules:
+            words = key.split(' ')
+            for size in range(1, len(words)):
+                self._prefixes.add(' '.join(words[:size]))
+
+    @classmethod
+    def from_files(cls, *names):
+        """Tạo engine từ các file trong thư mục rules/ (hoặc đường dẫn tuyệt đối)"""
+        paths = [name if os.path.isabs(name) else os.path.join(RULES_DIR, name) for name in names]
+        return cls(load_word_rules(*paths))
+
+    def __len__(self):
+        return len(self.rules)
+
+    def apply(self, text):
+        if not text or not self.rules:
+            return text
+
+        words = list(_WORD_RE.finditer(text))
+        output = []
+        pos = 0
+        i = 0
+        n = len(words)
+        while i < n:
+            key = words[i].group().lower()
+            match_size = 1 if key in self.rules else 0
+            match_key = key
+            # Mở rộng thành cụm từ khi còn là tiền tố của một rule
+            size = 1
+            while key in self._prefixes and i + size < n and \
+                    text[words[i + size - 1].end():words[i + size].start()] == ' ':
+                key = key + ' ' + words[i + size].group().lower()
+                size += 1
+                if key in self.rules:
+                    match_size = size
+                    match_key = key
+
+            if match_size:
+                output.append(text[pos:words[i].start()])
+                output.append(self.rules[match_key])
+                pos = words[i + match_size - 1].end()
+                i += match_size
+            else:
+                i += 1
+
+        output.append(text[pos:])
+        return ''.join(output)
@@ -4,7 +4,7 @@ Script để chạy OCR Service
 """
 import os
 from dotenv import load_dotenv
-from app import app
+from app import app, log_startup_config, start_engine_warmup
 
 # Load environment variables
 load_dotenv()
@@ -20,6 +20,9 @@ if __name__ == '__main__':
     print(f"🌐 Port: {port}")
     print(f"🔗 URL: http://localhost:{port}")
     print("=" * 60)
+    print("ℹ️  Development server - production: gunicorn -c gunicorn.conf.py app:app")
     
+    log_startup_config()
+    start_engine_warmup()
     app.run(host='0.0.0.0', port=port, debug=debug)
 
@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Stub Text Correction API - thay service sửa chính tả (TEXT_CORRECTION_API_URL) khi load test
+
+Cùng contract: POST /correct {'text': ...} -> {'success': true, 'corrected_text': ...} (trả lại text nguyên vẹn)
+Giả lập điều kiện thực tế của service sửa chính tả để đo concurrency, chi phí retry, circuit breaker:
+  - latency theo phân phối (--latency), cộng thêm theo độ dài text (--per-char-ms)
+  - giới hạn số request xử lý song song (--max-concurrency, như một GPU model server) - còn lại xếp hàng
+  - tỉ lệ lỗi: HTTP 500 (--error-rate), 429 (--overload-rate), success=false (--reject-rate),
+    response không phải JSON (--bad-json-rate), treo lâu hơn timeout của client (--timeout-rate)
+
+Phân phối latency (ms):
+  fixed:50            luôn 50ms
+  uniform:20,200      đều trong [20, 200]
+  normal:100,30       chuẩn mean 100, std 30 (cắt tại 0)
+  lognormal:80,0.6    log-normal median 80, sigma 0.6 (đuôi dài - giống model server thật)
+  exp:100             mũ, mean 100
+
+Endpoints:
+  POST /correct   sửa chính tả (stub)
+  GET  /health    {'status': 'ok'}
+  GET  /stats     số request, lỗi đã inject, latency p50/p95/p99, đang xử lý / đang xếp hàng
+  POST /config    đổi cấu hình khi đang chạy (vd {"error_rate": 1.0} để test breaker mở), trả về config mới
+  POST /reset     xoá stats
+
+Chạy:
+    python stub_correction_server.py --port 5001 --latency lognormal:80,0.6 --max-concurrency 2 --error-rate 0.05
+    TEXT_CORRECTION_API_URL=http://localhost:5001/correct python app.py
+
+Hoặc nhúng trong script (benchmark_e2e.py):
+    server = StubCorrectionServer(latency='fixed:50').start()
+    os.environ['TEXT_CORRECTION_API_URL'] = server.url
+"""
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+LATENCY_KINDS = ('fixed', 'uniform', 'normal', 'lognormal', 'exp')
+
+
+def parse_latency(spec):
+    """'kind:a,b' -> (kind, [số]) - raise ValueError nếu sai"""
+    kind, _, params = str(spec).partition(':')
+    kind = kind.strip().lower()
+    try:
+        values = [float(value) for value in params.split(',') if value.strip()]
+    except ValueError:
+        raise ValueError(f"Latency không hợp lệ: '{spec}'")
+    expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exp': 1}
+    if kind not in expected or len(values) != expected[kind]:
+        raise ValueError(f"Latency không hợp lệ: '{spec}' (hỗ trợ: fixed:ms, uniform:min,max, normal:mean,std, "
+                         f"lognormal:median,sigma, exp:mean)")
+    return kind, values
+
+
+def sample_latency_ms(kind, values, rng):
+    if kind == 'fixed':
+        return values[0]
+    if kind == 'uniform':
+        return rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return rng.lognormvariate(math.log(max(values[0], 1e-3)), values[1])
+    return rng.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+
+
+def _percentile(ordered, q):
+    if not ordered:
+        return None
+    pos = (len(ordered) - 1) * q / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (pos - lower)
+
+
+class StubConfig:
+    """Cấu hình stub - đổi được khi đang chạy (POST /config)"""
+
+    FIELDS = ('latency', 'per_char_ms', 'error_rate', 'overload_rate', 'reject_rate', 'bad_json_rate',
+              'timeout_rate', 'timeout_seconds')
+
+    def __init__(self, latency='fixed:50', per_char_ms=0.0, error_rate=0.0, overload_rate=0.0, reject_rate=0.0,
+                 bad_json_rate=0.0, timeout_rate=0.0, timeout_seconds=130.0):
+        self.latency = latency
+        self.latency_dist = parse_latency(latency)
+        self.per_char_ms = float(per_char_ms)
+        self.error_rate = float(error_rate)
+        self.overload_rate = float(overload_rate)
+        self.reject_rate = float(reject_rate)
+        self.bad_json_rate = float(bad_json_rate)
+        self.timeout_rate = float(timeout_rate)
+        self.timeout_seconds = float(timeout_seconds)
+
+    def update(self, values):
+        unknown = set(values) - set(self.FIELDS)
+        if unknown:
+            raise ValueError(f"Field không hợp lệ: {sorted(unknown)} (hỗ trợ: {', '.join(self.FIELDS)})")
+        if 'latency' in values:
+            self.latency_dist = parse_latency(values['latency'])
+            self.latency = values['latency']
+        for name in self.FIELDS[1:]:
+            if name in values:
+                setattr(self, name, float(values[name]))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+
+class StubStats:
+    def __init__(self, max_samples=100000):
+        self._lock = threading.Lock()
+        self.max_samples = max_samples
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.outcomes = {}
+            self.chars = 0
+            self.in_flight = 0
+            self.queued = 0
+            self.max_in_flight = 0
+            self._latencies = []
+
+    def record(self, outcome, seconds, chars):
+        with self._lock:
+            self.requests += 1
+            self.chars += chars
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            if len(self._latencies) < self.max_samples:
+                self._latencies.append(seconds)
+
+    def as_dict(self):
+        with self._lock:
+            ordered = sorted(self._latencies)
+            return {
+                'requests': self.requests,
+                'outcomes': dict(self.outcomes),
+                'chars': self.chars,
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'max_in_flight': self.max_in_flight,
+                'latency_ms': {
+                    'p50': round(_percentile(ordered, 50) * 1000, 2) if ordered else None,
+                    'p95': round(_percentile(ordered, 95) * 1000, 2) if ordered else None,
+                    'p99': round(_percentile(ordered, 99) * 1000, 2) if ordered else None,
+                    'max': round(ordered[-1] * 1000, 2) if ordered else None,
+                },
+            }
+
+
+class StubCorrectionServer:
+    """
+    HTTP server stub (ThreadingHTTPServer, chạy nền)
+
+    Args:
+        host / port: Địa chỉ bind (port 0 = chọn port trống)
+        max_concurrency: Số request xử lý song song (0 = không giới hạn); request còn lại chờ slot
+        seed: Seed cho random (latency / lỗi inject) - None = ngẫu nhiên
+        Các tham số còn lại: xem StubConfig
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, max_concurrency=0, seed=None, **config):
+        self.config = StubConfig(**config)
+        self.stats = StubStats()
+        self.max_concurrency = int(max_concurrency)
+        self._slots = threading.Semaphore(self.max_concurrency) if self.max_concurrency > 0 else None
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+        stub = self
+
+        class Handler(_StubHandler):
+            server_stub = stub
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/correct"
+
+    def draw(self):
+        """Một lần bốc thăm: (outcome, latency giây) theo config hiện tại"""
+        config = self.config
+        with self._rng_lock:
+            latency_ms = sample_latency_ms(*config.latency_dist, self._rng)
+            roll = self._rng.random()
+        outcome = 'ok'
+        for name, rate in (('timeout', config.timeout_rate), ('error', config.error_rate),
+                           ('overload', config.overload_rate), ('reject', config.reject_rate),
+                           ('bad_json', config.bad_json_rate)):
+            if roll < rate:
+                outcome = name
+                break
+            roll -= rate
+        return outcome, latency_ms / 1000
+
+    def acquire_slot(self):
+        if self._slots is None:
+            return
+        with self.stats._lock:
+            self.stats.queued += 1
+        try:
+            self._slots.acquire()
+        finally:
+            with self.stats._lock:
+                self.stats.queued -= 1
+
+    def release_slot(self):
+        if self._slots is not None:
+            self._slots.release()
+
+    def wait(self, seconds):
+        """Sleep có thể ngắt khi stop() (request 'timeout' không giữ thread mãi)"""
+        self._stopping.wait(seconds)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='stub-correction', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:  # shutdown() chỉ dùng được khi serve_forever chạy ở thread khác
+            self.httpd.shutdown()
+            self._thread.join(timeout=5)
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    server_stub = None
+    protocol_version = 'HTTP/1.1'  # Keep-alive như server thật (client dùng session pool)
+
+    def _send(self, status, payload, content_type='application/json'):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0) or 0)
+        raw = self.rfile.read(length) if length else b''
+        return json.loads(raw or b'{}')
+
+    def do_GET(self):
+        stub = self.server_stub
+        if self.path == '/health':
+            self._send(200, {'status': 'ok', 'service': 'stub-correction'})
+        elif self.path == '/stats':
+            self._send(200, dict(stub.stats.as_dict(), config=stub.config.as_dict(),
+                                 max_concurrency=stub.max_concurrency))
+        else:
+            self._send(404, {'success': False, 'error': 'Not found'})
+
+    def do_POST(self):
+        stub = self.server_stub
+        try:
+            payload = self._read_json()
+        except ValueError:
+            self._send(400, {'success': False, 'error': 'Body không phải JSON'})
+            return
+
+        if self.path == '/config':
+            try:
+                stub.config.update(payload)
+            except (ValueError, TypeError) as e:
+                self._send(400, {'success': False, 'error': str(e)})
+                return
+            self._send(200, {'success': True, 'config': stub.config.as_dict()})
+            return
+        if self.path == '/reset':
+            stub.stats.reset()
+            self._send(200, {'success': True})
+            return
+        if self.path != '/correct':
+            self._send(404, {'success': False, 'error': 'Not found'})
+            return
+
+        text = payload.get('text') if isinstance(payload, dict) else None
+        if not isinstance(text, str):
+            self._send(400, {'success': False, 'error': "Thiếu field 'text'"})
+            return
+
+        start = time.perf_counter()
+        stub.acquire_slot()
+        with stub.stats._lock:
+            stub.stats.in_flight += 1
+            stub.stats.max_in_flight = max(stub.stats.max_in_flight, stub.stats.in_flight)
+        try:
+            outcome, latency = stub.draw()
+            if outcome == 'timeout':
+                stub.wait(stub.config.timeout_seconds)  # Treo lâu hơn timeout của client
+            else:
+                stub.wait(latency + len(text) * stub.config.per_char_ms / 1000)
+        finally:
+            with stub.stats._lock:
+                stub.stats.in_flight -= 1
+            stub.release_slot()
+
+        try:
+            if outcome == 'error':
+                self._send(500, {'success': False, 'error': 'Injected server error'})
+            elif outcome == 'overload':
+                self._send(429, {'success': False, 'error': 'Injected overload'})
+            elif outcome == 'reject':
+                self._send(200, {'success': False, 'error': 'Injected model error'})
+            elif outcome == 'bad_json':
+                self._send(200, b'<html>502 Bad Gateway</html>', content_type='text/html')
+            else:
+                self._send(200, {'success': True, 'corrected_text': text})
+        except (BrokenPipeError, ConnectionResetError):
+            outcome = 'client_disconnected'  # Client đã timeout và đóng kết nối
+        stub.stats.record(outcome, time.perf_counter() - start, len(text))
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--latency', default='fixed:50', help='Phân phối latency (ms), vd lognormal:80,0.6')
+    parser.add_argument('--per-char-ms', type=float, default=0.0, help='Latency cộng thêm mỗi ký tự (ms)')
+    parser.add_argument('--max-concurrency', type=int, default=0, help='Số request xử lý song song (0 = không giới hạn)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Tỉ lệ HTTP 500')
+    parser.add_argument('--overload-rate', type=float, default=0.0, help='Tỉ lệ HTTP 429')
+    parser.add_argument('--reject-rate', type=float, default=0.0, help="Tỉ lệ 200 với success=false")
+    parser.add_argument('--bad-json-rate', type=float, default=0.0, help='Tỉ lệ response không phải JSON')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='Tỉ lệ request bị treo --timeout-seconds')
+    parser.add_argument('--timeout-seconds', type=float, default=130.0,
+                        help='Thời gian treo (mặc định > TEXT_CORRECTION_TIMEOUT=120)')
+    parser.add_argument('--seed', type=int, help='Seed random (tái lập latency / lỗi)')
+    args = parser.parse_args()
+
+    server = StubCorrectionServer(
+        host=args.host, port=args.port, max_concurrency=args.max_concurrency, seed=args.seed,
+        latency=args.latency, per_char_ms=args.per_char_ms, error_rate=args.error_rate,
+        overload_rate=args.overload_rate, reject_rate=args.reject_rate, bad_json_rate=args.bad_json_rate,
+        timeout_rate=args.timeout_rate, timeout_seconds=args.timeout_seconds,
+    )
+    print("=" * 60)
+    print("🧪 Stub Text Correction API")
+    print(f"🔗 {server.url}")
+    print(f"⏱️  Latency: {args.latency} (+{args.per_char_ms}ms/ký tự), song song tối đa: {args.max_concurrency or '∞'}")
+    print(f"💥 Lỗi: 500={args.error_rate} 429={args.overload_rate} reject={args.reject_rate} "
+          f"bad_json={args.bad_json_rate} timeout={args.timeout_rate} ({args.timeout_seconds}s)")
+    print("=" * 60)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Test CircuitBreaker (closed -> open -> half_open -> closed, một request thử khi half_open)
+và backoff_delay (full jitter, giới hạn max_delay) - clock và random được thay bằng giá trị cố định
+Chạy: python -m pytest -q test_circuit_breaker.py
+"""
+
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, backoff_delay, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, 'monotonic', fake)
+    return fake
+
+
+def _open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        assert breaker.allow_request()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()  # Thành công reset bộ đếm lỗi liên tiếp
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert not breaker.allow_request()
+    stats = breaker.stats()
+    assert stats['times_opened'] == 1
+    assert stats['short_circuited'] == 1
+    assert stats['retry_in'] == 30.0
+
+
+def test_half_open_after_recovery_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+    _open_breaker(breaker)
+
+    clock.now += 29.9
+    assert breaker.state == STATE_OPEN
+    assert breaker.stats()['retry_in'] == 0.1
+    clock.now += 0.1
+    assert breaker.state == STATE_HALF_OPEN
+
+
+def test_half_open_allows_single_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+    _open_breaker(breaker)
+    clock.now += 30
+
+    assert breaker.allow_request()       # Request thử
+    assert not breaker.allow_request()   # Các request khác bị bỏ qua trong lúc thử
+    assert not breaker.allow_request()
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.stats()['short_circuited'] == 2
+
+
+def test_probe_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+    _open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_success()
+
+    assert breaker.state == STATE_CLOSED
+    assert breaker.allow_request() and breaker.allow_request()
+    assert breaker.stats()['consecutive_failures'] == 0
+
+
+def test_probe_failure_reopens_for_full_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=5, recovery_timeout=30)
+    _open_breaker(breaker)
+    clock.now += 30
+    assert breaker.allow_request()
+    breaker.record_failure()  # Một lỗi khi half_open đủ để open lại (không cần đủ threshold)
+
+    assert breaker.state == STATE_OPEN
+    assert breaker.stats()['times_opened'] == 2
+    clock.now += 29
+    assert not breaker.allow_request()
+    clock.now += 1
+    assert breaker.allow_request()
+
+
+@pytest.mark.parametrize('attempt, expected_cap', [(0, 0.5), (1, 1.0), (2, 2.0), (3, 4.0), (4, 8.0), (10, 8.0)])
+def test_backoff_full_jitter_bounds(monkeypatch, attempt, expected_cap):
+    calls = []
+
+    def fake_uniform(low, high):
+        calls.append((low, high))
+        return high
+
+    monkeypatch.setattr(circuit_breaker.random, 'uniform', fake_uniform)
+    assert backoff_delay(attempt, base=0.5, max_delay=8.0) == expected_cap
+    assert calls == [(0, expected_cap)]
+
+
+def test_backoff_is_random_within_bounds():
+    delays = [backoff_delay(3, base=0.5, max_delay=8.0) for _ in range(200)]
+    assert all(0 <= delay <= 4.0 for delay in delays)
+    assert len(set(delays)) > 1
@@ -0,0 +1,189 @@
+"""
+Test sửa chính tả theo dòng: align_lines / CorrectionClient.correct_lines (API gộp / tách / bỏ dòng, memo hit
+một phần) và CorrectionMemo (chuẩn hoá NFC, persistent SQLite qua reopen)
+API được thay bằng hàm giả lập - không gọi mạng
+Chạy: python -m pytest -q test_correction_client.py
+"""
+
+import unicodedata
+
+from correction_client import CorrectionClient, align_lines
+from correction_memo import CorrectionMemo, normalize_line
+
+FIXES = {'toi': 'tôi', 'khong': 'không', 'cong': 'công', 'hoa': 'hòa', 'nguoi': 'người', 'dan': 'dân'}
+
+
+def fix_words(text):
+    return ' '.join(FIXES.get(word, word) for word in text.split(' '))
+
+
+class FakeAPI:
+    """Text Correction API giả: sửa từ theo FIXES, sau đó transform (gộp / tách / bỏ dòng) nếu có"""
+
+    def __init__(self, transform=None):
+        self.transform = transform
+        self.requests = []
+
+    def __call__(self, text, max_retries=2):
+        self.requests.append(text)
+        lines = [fix_words(line) for line in text.split('\n')]
+        if self.transform:
+            lines = self.transform(lines)
+        return '\n'.join(lines)
+
+
+def make_client(api, memo=None):
+    client = CorrectionClient('http://correction.invalid/correct', memo=memo)
+    client._correct_remote = api
+    return client
+
+
+# --- align_lines ---
+
+def test_align_same_lines():
+    sent = ['toi di hoc', 've nha']
+    assert align_lines(sent, ['tôi đi học', 'về nhà']) == ['tôi đi học', 'về nhà']
+
+
+def test_align_merged_lines_keeps_both_originals():
+    # Hai dòng bị gộp thành một dòng dài gấp đôi -> không dòng nào nhận dòng gộp
+    sent = ['nguoi dan dia phuong', 'co quyen khieu nai', 'theo quy dinh']
+    received = ['người dân địa phương có quyền khiếu nại', 'theo quy định']
+    assert align_lines(sent, received) == [None, None, 'theo quy định']
+
+
+def test_align_split_line():
+    sent = ['cong hoa xa hoi chu nghia viet nam', 'doc lap tu do hanh phuc']
+    received = ['cộng hòa xã hội', 'chủ nghĩa việt nam', 'độc lập tự do hạnh phúc']
+    assert align_lines(sent, received) == [None, 'độc lập tự do hạnh phúc']
+
+
+def test_align_dropped_blank_line():
+    sent = ['dong mot', '', 'dong hai']
+    assert align_lines(sent, ['dòng một', 'dòng hai']) == ['dòng một', None, 'dòng hai']
+
+
+def test_align_empty():
+    assert align_lines([], ['x']) == []
+    assert align_lines(['x'], []) == [None]
+
+
+# --- correct_lines ---
+
+def test_correct_lines_one_request_in_page_order():
+    api = FakeAPI()
+    client = make_client(api)
+    page = ['cong hoa', '  toi khong biet', '', 'nguoi dan']
+    assert client.correct_lines(page) == ['công hòa', '  tôi không biet', '', 'người dân']
+    # Một request, đúng thứ tự; dòng trống của trang thành chỗ ngắt
+    assert api.requests == ['cong hoa\ntoi khong biet\n\nnguoi dan']
+
+
+def test_correct_lines_service_merges_two_lines():
+    def merge_first_two(lines):
+        return [lines[0] + ' ' + lines[1]] + lines[2:]
+
+    api = FakeAPI(merge_first_two)
+    memo = CorrectionMemo(max_entries=100)
+    client = make_client(api, memo)
+    page = ['toi khong', 'nguoi dan', 'cong hoa xa hoi']
+    assert client.correct_lines(page) == ['toi khong', 'nguoi dan', 'công hòa xa hoi']
+    assert len(api.requests) == 1  # Không gửi lại cả trang
+    # Dòng không căn được không vào memo, dòng căn được thì có
+    assert memo.get(normalize_line('toi khong')) is None
+    assert memo.get(normalize_line('cong hoa xa hoi')) == 'công hòa xa hoi'
+
+
+def test_correct_lines_service_splits_a_line():
+    def split_first(lines):
+        words = lines[0].split(' ')
+        return [' '.join(words[:2]), ' '.join(words[2:])] + lines[1:]
+
+    api = FakeAPI(split_first)
+    client = make_client(api)
+    page = ['toi khong biet nguoi dan nay', 'cong hoa']
+    assert client.correct_lines(page) == ['toi khong biet nguoi dan nay', 'công hòa']
+    assert len(api.requests) == 1
+
+
+def test_correct_lines_service_drops_blank_separator():
+    api = FakeAPI(lambda lines: [line for line in lines if line])
+    memo = CorrectionMemo(max_entries=100)
+    memo.put_many([(normalize_line('giua trang'), 'giữa trang')])
+    client = make_client(api, memo)
+    page = ['toi khong', 'giua trang', 'nguoi dan']
+    assert client.correct_lines(page) == ['tôi không', 'giữa trang', 'người dân']
+    assert api.requests == ['toi khong\n\nnguoi dan']
+
+
+def test_correct_lines_partial_memo_hits():
+    memo = CorrectionMemo(max_entries=100)
+    api = FakeAPI()
+    client = make_client(api, memo)
+    client.correct_lines(['cong hoa', 'nguoi dan'])
+
+    page = ['cong hoa', 'toi khong', 'nguoi dan', 'dan toi']
+    assert client.correct_lines(page) == ['công hòa', 'tôi không', 'người dân', 'dân tôi']
+    # Chỉ gửi dòng chưa có trong memo; dòng memo hit ở giữa thành chỗ ngắt
+    assert api.requests[-1] == 'toi khong\n\ndan toi'
+    stats = memo.stats()
+    assert stats['hits'] == 2
+
+
+def test_correct_lines_gaps_from_memo_become_breaks():
+    memo = CorrectionMemo(max_entries=100)
+    memo.put_many([(normalize_line('cong hoa'), 'công hòa')])
+    api = FakeAPI()
+    client = make_client(api, memo)
+    client.correct_lines(['toi khong', 'cong hoa', 'nguoi dan'])
+    assert api.requests == ['toi khong\n\nnguoi dan']
+
+
+def test_correct_lines_selected_keeps_unselected_and_dedups():
+    api = FakeAPI()
+    client = make_client(api)
+    page = ['toi khong', 'cong hoa', 'toi khong', 'nguoi dan']
+    assert client.correct_lines(page, selected={0, 2, 3}) == ['tôi không', 'cong hoa', 'tôi không', 'người dân']
+    assert api.requests == ['toi khong\n\nnguoi dan']
+
+
+def test_correct_without_memo_sends_whole_text():
+    api = FakeAPI()
+    client = make_client(api)
+    assert client.correct('toi khong\n\ncong hoa') == 'tôi không\n\ncông hòa'
+    assert api.requests == ['toi khong\n\ncong hoa']
+
+
+# --- CorrectionMemo ---
+
+def test_normalize_line_nfc_and_whitespace():
+    decomposed = unicodedata.normalize('NFD', 'Cộng  hòa\txã hội ')
+    assert decomposed != 'Cộng hòa xã hội'
+    assert normalize_line(decomposed) == 'Cộng hòa xã hội'
+
+
+def test_memo_hits_across_unicode_forms():
+    memo = CorrectionMemo(max_entries=100)
+    api = FakeAPI()
+    client = make_client(api, memo)
+    client.correct_lines([unicodedata.normalize('NFC', 'hoà toi')])
+    client.correct_lines([unicodedata.normalize('NFD', 'hoà  toi')])
+    assert len(api.requests) == 1
+
+
+def test_memo_persists_after_reopen(tmp_path):
+    db_path = str(tmp_path / 'memo.db')
+    memo = CorrectionMemo(max_entries=100, db_path=db_path, namespace='api-a')
+    memo.put_many([('toi khong', 'tôi không')])
+
+    memo.reopen()  # Như gunicorn worker sau fork
+    memo.memory.clear()
+    assert memo.get('toi khong') == 'tôi không'
+    assert memo.stats()['db_hits'] == 1
+    memo.put_many([('nguoi dan', 'người dân')])
+
+    restarted = CorrectionMemo(max_entries=100, db_path=db_path, namespace='api-a')
+    assert restarted.get('toi khong') == 'tôi không'
+    assert restarted.get('nguoi dan') == 'người dân'
+    other = CorrectionMemo(max_entries=100, db_path=db_path, namespace='api-b')
+    assert other.get('toi khong') is None  # Namespace khác (corrector khác) không dùng chung
@@ -0,0 +1,158 @@
+"""
+Test group_items_into_lines (numpy lexsort / reduceat) cho kết quả giống hệt vòng lặp cũ (sorted + gom dòng
+tuần tự + format_line_with_spacing từng dòng) trên layout ngẫu nhiên, y trùng nhau, 1 item, list rỗng, dòng chồng lấn
+Chạy: python -m pytest -q test_group_items_into_lines.py
+"""
+
+import random
+
+import pytest
+
+from app import group_items_into_lines, detect_text_alignment
+
+
+def baseline_format_line_with_spacing(line_items, image_width=None):
+    """format_line_with_spacing trước khi vectorize (tính spacing từng cặp item bằng list)"""
+    if not line_items:
+        return {"text": "", "alignment": "left"}
+    line_items.sort(key=lambda x: x['x'])
+    alignment = 'left'
+    if image_width and image_width > 0:
+        alignment = detect_text_alignment(line_items, image_width)
+    if len(line_items) > 1:
+        spacings = []
+        for i in range(len(line_items) - 1):
+            current_end = max([pt[0] for pt in line_items[i]['box']])
+            spacings.append(line_items[i + 1]['x'] - current_end)
+        result_parts = []
+        for i, item in enumerate(line_items):
+            text = item.get('text', '')
+            if not text:
+                continue
+            if i > 0:
+                spaces_needed = max(1, int(spacings[i - 1] / 7))
+                result_parts.append(' ' * min(spaces_needed, 20))
+            result_parts.append(text.strip() if text.strip() else text)
+        text_result = ''.join(result_parts) if result_parts else ''
+    else:
+        texts = [item.get('text', '') for item in line_items]
+        text_result = ' '.join([text.strip() if text.strip() else text for text in texts if text])
+    return {"text": text_result, "alignment": alignment}
+
+
+def baseline_group_items_into_lines(items, img_width):
+    """group_items_into_lines trước khi vectorize"""
+    texts = []
+    confidences = []
+    lines_with_alignment = []
+    lines_sorted = sorted(items, key=lambda x: (round(x['y'] / 10) * 10, x['x']))
+
+    def flush(line_items):
+        formatted_result = baseline_format_line_with_spacing(line_items, img_width)
+        formatted_line = formatted_result.get('text', '')
+        alignment = formatted_result.get('alignment', 'left')
+        if not formatted_line or not formatted_line.strip():
+            fallback_text = ' '.join([item['text'] for item in line_items if item.get('text')])
+            if fallback_text:
+                formatted_line = fallback_text
+        if formatted_line:
+            line_confidence = sum([i['confidence'] for i in line_items]) / len(line_items)
+            texts.append(formatted_line)
+            confidences.append(line_confidence)
+            lines_with_alignment.append({'text': formatted_line, 'alignment': alignment,
+                                         'confidence': line_confidence})
+
+    current_line_items = []
+    current_line_y = None
+    for item in lines_sorted:
+        if current_line_y is None or abs(item['y'] - current_line_y) < 20:
+            current_line_items.append(item)
+            if current_line_y is None:
+                current_line_y = item['y']
+        else:
+            if current_line_items:
+                flush(current_line_items)
+            current_line_items = [item]
+            current_line_y = item['y']
+    if current_line_items:
+        flush(current_line_items)
+    return texts, confidences, lines_with_alignment
+
+
+def make_item(x, y, width, text, confidence=0.9, height=12):
+    box = [[x, y], [x + width, y], [x + width, y + height], [x, y + height]]
+    return {'x': x, 'y': y, 'text': text, 'confidence': confidence, 'box': box}
+
+
+def random_page(rng, count, img_width=1000):
+    items = []
+    for _ in range(count):
+        x = rng.choice([rng.uniform(0, img_width - 50), float(rng.randrange(0, img_width - 50, 25))])
+        y = rng.choice([rng.uniform(0, 1400), float(rng.randrange(0, 1400, 5))])  # y trùng / sát mốc làm tròn
+        text = rng.choice(['Điều', '1.', 'CỘNG HÒA', 'Độc lập', '  ', '', 'x', 'Nghị định số 12/2024'])
+        items.append(make_item(x, y, rng.uniform(5, 300), text, round(rng.uniform(0.3, 1.0), 3)))
+    return items
+
+
+def assert_same(items, img_width):
+    expected = baseline_group_items_into_lines([dict(item) for item in items], img_width)
+    assert group_items_into_lines(items, img_width) == expected
+
+
+def test_empty_page():
+    assert group_items_into_lines([], 1000) == ([], [], [])
+    assert_same([], 1000)
+
+
+def test_single_item():
+    items = [make_item(420, 50, 160, 'QUYẾT ĐỊNH')]
+    texts, confidences, lines = group_items_into_lines(items, 1000)
+    assert texts == ['QUYẾT ĐỊNH'] and confidences == [0.9]
+    assert_same(items, 1000)
+    assert_same(items, 0)
+
+
+def test_ties_in_y_keep_input_order():
+    # Cùng y, cùng x -> giữ thứ tự input (sort ổn định ở cả hai bản)
+    items = [make_item(100, 40, 30, 'a'), make_item(100, 40, 30, 'b'), make_item(10, 40, 30, 'c'),
+             make_item(100, 45, 30, 'd'), make_item(300, 35, 30, 'e')]
+    assert_same(items, 1000)
+    assert group_items_into_lines(items, 1000)[0][0].split() == ['c', 'a', 'b', 'd', 'e']
+
+
+def test_rounding_ties_half_to_even():
+    # y/10 = x.5 -> round() làm tròn về số chẵn (15 -> 20, 25 -> 20); np.round phải giống hệt
+    items = [make_item(200, 25, 20, 'b'), make_item(100, 15, 20, 'a'), make_item(50, 35, 20, 'c'),
+             make_item(10, 45, 20, 'd')]
+    assert_same(items, 1000)
+
+
+def test_overlapping_lines_anchor_on_first_item():
+    # Dòng thứ hai bắt đầu < 20px dưới dòng đầu: item so với y của item ĐẦU dòng, không phải item trước
+    items = [make_item(10, 100, 40, 'l1a'), make_item(200, 112, 40, 'l1b'), make_item(400, 121, 40, 'l2a'),
+             make_item(60, 118, 40, 'l1c'), make_item(600, 135, 40, 'l2b'), make_item(30, 141, 40, 'l3a')]
+    assert_same(items, 1000)
+    texts = group_items_into_lines(items, 1000)[0]
+    assert len(texts) == 3
+
+
+def test_blank_texts_and_irregular_boxes():
+    items = [make_item(10, 10, 40, ''), make_item(80, 12, 40, '   '), make_item(10, 60, 40, '')]
+    items.append({'x': 300, 'y': 62, 'text': 'tam giác', 'confidence': 0.5, 'box': [[300, 62], [380, 62], [340, 80]]})
+    assert_same(items, 1000)
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_matches_baseline_on_random_pages(seed):
+    rng = random.Random(seed)
+    items = random_page(rng, rng.choice([1, 2, 5, 30, 200]))
+    assert_same(items, 1000)
+    assert_same(items, 0)
+
+
+def test_does_not_mutate_items():
+    rng = random.Random(99)
+    items = random_page(rng, 50)
+    snapshot = [dict(item) for item in items]
+    group_items_into_lines(items, 1000)
+    assert items == snapshot
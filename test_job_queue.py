@@ -0,0 +1,276 @@
+"""
+Test JobManager: chạy job nền, tiến độ, hàng đợi đầy (API trả 429), TTL giữ kết quả,
+giới hạn số job đã xong được giữ kết quả trong memory, trạng thái job dùng chung qua SQLite
+(db_path - nhiều gunicorn worker đọc job của nhau)
+Chạy: python -m pytest -q test_job_queue.py
+"""
+
+import multiprocessing
+import sqlite3
+import time
+import threading
+
+import pytest
+
+from job_queue import JobManager, JobQueueFull, JOB_DONE, JOB_FAILED, JOB_RUNNING
+
+
+def _wait_finished(jobs, timeout=5):
+    for job in jobs:
+        for _ in range(int(timeout / 0.01)):
+            if job.finished:
+                break
+            time.sleep(0.01)
+        assert job.finished
+
+
+def _echo(value, progress_callback=None):
+    return {'value': value}
+
+
+def test_job_runs_and_reports_progress():
+    def pages(total, progress_callback=None):
+        for page in range(1, total + 1):
+            progress_callback(page, total)
+        return {'pages': total}
+
+    manager = JobManager(max_workers=1, max_queue_depth=1)
+    job = manager.submit(pages, 3, metadata={'filename': 'a.pdf'})
+    _wait_finished([job])
+
+    assert job.status == JOB_DONE
+    assert job.result == {'pages': 3}
+    data = manager.get(job.id).to_dict()
+    assert data['progress'] == {'processed_pages': 3, 'total_pages': 3, 'percent': 100.0}
+    assert data['filename'] == 'a.pdf'
+
+
+def test_failed_job_keeps_error():
+    def boom(progress_callback=None):
+        raise ValueError('PDF hỏng')
+
+    manager = JobManager(max_workers=1)
+    job = manager.submit(boom)
+    _wait_finished([job])
+    assert job.status == JOB_FAILED
+    assert job.error == 'PDF hỏng'
+    assert job.to_dict()['error'] == 'PDF hỏng'
+
+
+def test_queue_full_rejects_until_a_slot_frees():
+    # JobQueueFull -> POST /jobs trả 429
+    release = threading.Event()
+
+    def blocking(progress_callback=None):
+        release.wait(5)
+        return {}
+
+    manager = JobManager(max_workers=1, max_queue_depth=1)
+    accepted = [manager.submit(blocking), manager.submit(blocking)]
+    with pytest.raises(JobQueueFull):
+        manager.submit(blocking)
+    assert manager.stats()['rejected'] == 1
+    assert manager.stats()['queued'] == 1
+
+    release.set()
+    _wait_finished(accepted)
+    _wait_finished([manager.submit(_echo, 'sau khi trống chỗ')])
+
+
+def test_finished_job_expires_after_ttl():
+    manager = JobManager(max_workers=1, result_ttl=0.05)
+    job = manager.submit(_echo, 1)
+    _wait_finished([job])
+    assert manager.get(job.id) is job
+    time.sleep(0.1)
+    assert manager.get(job.id) is None
+    assert manager.get('khong-ton-tai') is None
+
+
+def test_finished_jobs_capped_oldest_evicted():
+    manager = JobManager(max_workers=1, max_queue_depth=4, result_ttl=3600, max_finished_jobs=3)
+    jobs = []
+    for index in range(6):
+        job = manager.submit(_echo, index)
+        _wait_finished([job])
+        jobs.append(job)
+
+    # Job mới nhất không bị tính khi evict lúc submit (chưa xong) -> sau lần submit cuối còn 3 job xong + job đó
+    assert [manager.get(job.id) for job in jobs[:2]] == [None, None]
+    assert all(manager.get(job.id) is job for job in jobs[2:])
+    assert manager.get(jobs[-1].id).status == JOB_DONE
+    assert manager.get(jobs[-1].id).result == {'value': 5}
+    stats = manager.stats()
+    assert stats['retained_jobs'] == 4
+    assert stats['evicted'] == 2
+
+
+def test_running_jobs_never_evicted():
+    release = threading.Event()
+
+    def blocking(progress_callback=None):
+        release.wait(5)
+        return {}
+
+    manager = JobManager(max_workers=2, max_queue_depth=2, max_finished_jobs=1)
+    running = [manager.submit(blocking) for _ in range(2)]
+    queued = [manager.submit(blocking) for _ in range(2)]
+    with pytest.raises(JobQueueFull):
+        manager.submit(blocking)
+    assert all(manager.get(job.id) is job for job in running + queued)
+
+    release.set()
+    _wait_finished(running + queued)
+    manager.submit(_echo, 'mới')
+    assert manager.stats()['evicted'] == 3
+
+
+def test_unlimited_when_zero():
+    manager = JobManager(max_workers=1, max_queue_depth=4, max_finished_jobs=0)
+    jobs = []
+    for index in range(5):
+        job = manager.submit(_echo, index)
+        _wait_finished([job])
+        jobs.append(job)
+    assert all(manager.get(job.id) is job for job in jobs)
+    assert manager.stats()['evicted'] == 0
+
+
+# --- Trạng thái job dùng chung qua SQLite (db_path) ---
+
+def _run_job_in_child(db_path, value):
+    """Chạy trong process khác (như một gunicorn worker khác): submit job, chờ xong, trả job id"""
+    manager = JobManager(max_workers=1, db_path=db_path)
+    job = manager.submit(_echo, value, metadata={'filename': 'child.pdf'})
+    _wait_finished([job])
+    return job.id
+
+
+def _dead_pid():
+    process = multiprocessing.get_context('spawn').Process(target=time.sleep, args=(0,))
+    process.start()
+    process.join()
+    return process.pid
+
+
+def test_other_manager_reads_status_progress_and_result(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    page_done = threading.Event()
+    release = threading.Event()
+
+    def pages(total, progress_callback=None):
+        progress_callback(1, total)
+        page_done.set()
+        release.wait(5)
+        progress_callback(total, total)
+        return {'success': True, 'text': 'Cộng hòa xã hội chủ nghĩa Việt Nam', 'pages': total}
+
+    worker_a = JobManager(max_workers=1, db_path=db_path)
+    worker_b = JobManager(max_workers=1, db_path=db_path)
+    job = worker_a.submit(pages, 4, metadata={'filename': 'a.pdf', 'type': 'pdf'})
+    assert page_done.wait(5)
+
+    running = worker_b.get(job.id)
+    assert running is not job
+    assert running.status == JOB_RUNNING
+    data = running.to_dict()
+    assert data['progress'] == {'processed_pages': 1, 'total_pages': 4, 'percent': 25.0}
+    assert data['filename'] == 'a.pdf' and data['type'] == 'pdf'
+
+    release.set()
+    _wait_finished([job])
+    done = worker_b.get(job.id)
+    assert done.status == JOB_DONE
+    assert done.result == job.result
+    assert done.to_dict()['progress']['percent'] == 100.0
+    assert worker_b.get('khong-ton-tai') is None
+    assert worker_b.stats()['persistent'] is True
+    assert worker_b.stats()['retained_jobs'] == 0  # Job của worker khác không chiếm memory của worker này
+
+
+def test_failed_job_error_shared(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+
+    def boom(progress_callback=None):
+        raise RuntimeError('PDF hỏng')
+
+    job = JobManager(db_path=db_path).submit(boom)
+    _wait_finished([job])
+    other = JobManager(db_path=db_path).get(job.id)
+    assert other.status == JOB_FAILED
+    assert other.error == 'PDF hỏng'
+
+
+def test_job_from_another_process(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    with multiprocessing.get_context('spawn').Pool(1) as pool:
+        job_id = pool.apply(_run_job_in_child, (db_path, 'từ worker khác'))
+
+    job = JobManager(db_path=db_path).get(job_id)
+    assert job.status == JOB_DONE
+    assert job.result == {'value': 'từ worker khác'}
+    assert job.to_dict()['filename'] == 'child.pdf'
+
+
+def test_unfinished_job_of_dead_process_reported_failed(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    release = threading.Event()
+    worker_a = JobManager(max_workers=1, db_path=db_path)
+    job = worker_a.submit(lambda progress_callback=None: release.wait(5))
+
+    dead_pid = _dead_pid()
+    with sqlite3.connect(db_path) as db:
+        db.execute('UPDATE jobs SET pid = ? WHERE id = ?', (dead_pid, job.id))
+
+    other = JobManager(db_path=db_path).get(job.id)
+    assert other.status == JOB_FAILED
+    assert str(dead_pid) in other.error
+    assert other.finished_at is not None
+    # Trạng thái lỗi được ghi lại trong DB
+    assert JobManager(db_path=db_path).get(job.id).error == other.error
+    release.set()
+
+
+def test_shared_jobs_expire_after_ttl(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    job = JobManager(db_path=db_path).submit(_echo, 1)
+    _wait_finished([job])
+
+    reader = JobManager(result_ttl=0.05, db_path=db_path)
+    assert reader.get(job.id) is not None
+    time.sleep(0.1)
+    assert reader.get(job.id) is None
+
+    # Job mới dọn job hết hạn khỏi DB
+    reader.submit(_echo, 2)
+    with sqlite3.connect(db_path) as db:
+        assert db.execute('SELECT COUNT(*) FROM jobs WHERE id = ?', (job.id,)).fetchone()[0] == 0
+
+
+def test_shared_finished_jobs_capped(tmp_path):
+    db_path = str(tmp_path / 'jobs.db')
+    worker_a = JobManager(max_finished_jobs=2, db_path=db_path)
+    worker_b = JobManager(max_finished_jobs=2, db_path=db_path)
+    jobs = []
+    for index in range(4):
+        manager = worker_a if index % 2 == 0 else worker_b
+        job = manager.submit(_echo, index)
+        _wait_finished([job])
+        jobs.append(job)
+        time.sleep(0.01)  # finished_at tăng dần
+
+    # Lần submit cuối (job 3) xoá job xong lâu nhất trong DB, giữ tối đa 2 job đã xong
+    reader = JobManager(db_path=db_path)
+    with sqlite3.connect(db_path) as db:
+        finished = db.execute('SELECT COUNT(*) FROM jobs WHERE finished_at IS NOT NULL').fetchone()[0]
+    assert finished == 3  # 2 job giữ lại + job 3 xong sau lần dọn
+    assert reader.get(jobs[0].id) is None
+    assert reader.get(jobs[3].id).result == {'value': 3}
+
+
+def test_memory_only_without_db_path():
+    worker_a = JobManager()
+    job = worker_a.submit(_echo, 1)
+    _wait_finished([job])
+    assert JobManager().get(job.id) is None
+    assert worker_a.stats()['persistent'] is False
@@ -0,0 +1,145 @@
+"""
+Test ResultCache: cache key theo nội dung + options, LRU trong memory, disk tier sống qua restart,
+giới hạn disk tier (số file / dung lượng, evict LRU)
+Chạy: python -m pytest -q test_result_cache.py
+"""
+
+import os
+
+from result_cache import LRUCache, ResultCache, make_cache_key
+
+
+def _key(index):
+    return make_cache_key(f"file-{index}".encode('utf-8'))
+
+
+def _disk_files(cache):
+    return sorted(filename[:-len('.json')]
+                  for _, _, files in os.walk(cache.disk_dir) for filename in files if filename.endswith('.json'))
+
+
+def test_cache_key_depends_on_content_and_options():
+    key = make_cache_key(b'%PDF-1.7 abc', kind='pdf', use_text_correction=True)
+    assert key == make_cache_key(b'%PDF-1.7 abc', use_text_correction=True, kind='pdf')  # Thứ tự option không ảnh hưởng
+    assert key != make_cache_key(b'%PDF-1.7 abd', kind='pdf', use_text_correction=True)
+    assert key != make_cache_key(b'%PDF-1.7 abc', kind='pdf', use_text_correction=False)
+    assert len(key) == 64
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(max_entries=2)
+    lru.put('a', 1)
+    lru.put('b', 2)
+    assert lru.get('a') == 1  # 'a' thành mới dùng nhất
+    lru.put('c', 3)
+    assert lru.get('b') is None
+    assert lru.get('a') == 1 and lru.get('c') == 3
+    assert len(lru) == 2
+
+
+def test_lru_disabled_when_zero():
+    lru = LRUCache(max_entries=0)
+    lru.put('a', 1)
+    assert lru.get('a') is None
+    assert len(lru) == 0
+
+
+def test_memory_hit_and_miss_stats():
+    cache = ResultCache(max_entries=4)
+    key = _key(1)
+    assert cache.get(key) is None
+    cache.put(key, {'text': 'Cộng hòa'})
+    assert cache.get(key) == {'text': 'Cộng hòa'}
+    stats = cache.stats()
+    assert (stats['memory_hits'], stats['disk_hits'], stats['misses']) == (1, 0, 1)
+    assert stats['hit_rate'] == 0.5
+    assert stats['disk_enabled'] is False
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    key = _key(1)
+    ResultCache(max_entries=4, disk_dir=str(tmp_path)).put(key, {'text': 'Độc lập - Tự do'})
+
+    restarted = ResultCache(max_entries=4, disk_dir=str(tmp_path))
+    assert restarted.get(key) == {'text': 'Độc lập - Tự do'}
+    assert restarted.get(key) == {'text': 'Độc lập - Tự do'}  # Lần 2 lấy từ memory
+    stats = restarted.stats()
+    assert (stats['memory_hits'], stats['disk_hits']) == (1, 1)
+
+
+def test_corrupt_disk_entry_is_a_miss(tmp_path):
+    cache = ResultCache(max_entries=0, disk_dir=str(tmp_path))
+    key = _key(1)
+    cache.put(key, {'text': 'ok'})
+    with open(cache._disk_path(key), 'w', encoding='utf-8') as f:
+        f.write('{ghi dở')
+    assert cache.get(key) is None
+    assert _disk_files(cache) == [key]
+
+
+def test_disk_max_entries_evicts_oldest(tmp_path):
+    cache = ResultCache(max_entries=0, disk_dir=str(tmp_path), max_disk_entries=3)
+    keys = [_key(index) for index in range(5)]
+    for index, key in enumerate(keys):
+        cache.put(key, {'text': f"trang {index}"})
+
+    assert _disk_files(cache) == sorted(keys[2:])
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[4]) == {'text': 'trang 4'}
+    stats = cache.stats()
+    assert stats['disk_entries'] == 3
+    assert stats['disk_evictions'] == 2
+
+
+def test_disk_read_refreshes_lru(tmp_path):
+    cache = ResultCache(max_entries=0, disk_dir=str(tmp_path), max_disk_entries=2)
+    first, second, third = _key(1), _key(2), _key(3)
+    cache.put(first, {'text': 'a'})
+    cache.put(second, {'text': 'b'})
+    assert cache.get(first) == {'text': 'a'}  # first thành mới dùng nhất
+
+    cache.put(third, {'text': 'c'})
+    assert _disk_files(cache) == sorted([first, third])
+
+
+def test_disk_max_bytes(tmp_path):
+    value = {'text': 'x' * 1000}
+    cache = ResultCache(max_entries=0, disk_dir=str(tmp_path), max_disk_bytes=3500)
+    for index in range(10):
+        cache.put(_key(index), value)
+
+    stats = cache.stats()
+    assert stats['disk_bytes'] <= 3500
+    assert stats['disk_entries'] == 3
+    assert sum(os.path.getsize(os.path.join(root, name))
+               for root, _, files in os.walk(str(tmp_path)) for name in files) == stats['disk_bytes']
+
+
+def test_overwrite_does_not_double_count(tmp_path):
+    cache = ResultCache(max_entries=0, disk_dir=str(tmp_path), max_disk_entries=2)
+    key = _key(1)
+    for _ in range(5):
+        cache.put(key, {'text': 'cùng key'})
+    assert cache.stats()['disk_entries'] == 1
+    assert cache.stats()['disk_evictions'] == 0
+
+
+def test_restart_rebuilds_index_and_applies_new_limit(tmp_path):
+    cache = ResultCache(max_entries=0, disk_dir=str(tmp_path))
+    keys = [_key(index) for index in range(4)]
+    for index, key in enumerate(keys):
+        cache.put(key, {'text': str(index)})
+        os.utime(cache._disk_path(key), (1000 + index, 1000 + index))  # mtime tăng dần theo thứ tự ghi
+
+    restarted = ResultCache(max_entries=0, disk_dir=str(tmp_path), max_disk_entries=2)
+    assert _disk_files(restarted) == sorted(keys[2:])
+    assert restarted.get(keys[3]) == {'text': '3'}
+    assert restarted.stats()['disk_entries'] == 2
+
+
+def test_unlimited_by_default(tmp_path):
+    cache = ResultCache(max_entries=0, disk_dir=str(tmp_path))
+    for index in range(20):
+        cache.put(_key(index), {'text': str(index)})
+    assert cache.stats()['disk_entries'] == 20
+    assert cache.stats()['disk_evictions'] == 0
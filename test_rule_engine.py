@@ -0,0 +1,224 @@
+"""
+Test WordRuleEngine + rules/*.tsv so với cách sửa cũ (dict regex \\bword\\b áp dụng tuần tự với re.IGNORECASE
+trong vietnamese_text_correction.py / vietnamese_spell_correction_comprehensive.py): cụm từ, hoa thường,
+rule "chien" -> "hiện", file rule đi kèm load không có cảnh báo
+Chạy: python -m pytest -q test_rule_engine.py
+"""
+
+import logging
+import random
+import re
+
+import pytest
+
+from rule_engine import WordRuleEngine, apply_punctuation_rules, load_word_rules, RULES_DIR
+
+# Bảng rule cũ của vietnamese_text_correction.py (trước khi chuyển sang rules/vi_common.tsv)
+# Dict literal cũ có r'\bdoi\b' hai lần -> giữ vị trí lần đầu, giá trị lần sau ('đội')
+OLD_COMMON_RULES = {
+    r'\bkhong\b': 'không',
+    r'\bco\b': 'có',
+    r'\btoi\b': 'tôi',
+    r'\bdoi\b': 'đội',
+    r'\bdao\b': 'đào',
+    r'\bdoan\b': 'đoàn',
+    r'\bvay\b': 'vậy',
+    r'\bday\b': 'đây',
+    r'\bnay\b': 'này',
+    r'\bvoi\b': 'với',
+    r'\bden\b': 'đến',
+    r'\bduoc\b': 'được',
+    r'\bduoi\b': 'dưới',
+    r'\btren\b': 'trên',
+    r'\bgiua\b': 'giữa',
+    r'\bngoai\b': 'ngoài',
+    r'\btruoc\b': 'trước',
+    r'\bsau\b': 'sau',
+    r'\bnam\b': 'năm',
+    r'\bthang\b': 'tháng',
+    r'\bngay\b': 'ngày',
+}
+
+# Bảng rule cũ của vietnamese_spell_correction_comprehensive.py (rules/vi_common.tsv + rules/vi_legal.tsv)
+# r'\bpho\b' (hai lần) và r'\bquyet\b' (hai lần) cũng theo ngữ nghĩa dict literal như trên
+OLD_COMPREHENSIVE_RULES = dict(OLD_COMMON_RULES, **{
+    r'\bgio\b': 'giờ',
+    r'\bphut\b': 'phút',
+    r'\bquyet dinh\b': 'quyết định',
+    r'\bquyet\b': 'quyết',
+    r'\bdinh\b': 'định',
+    r'\bchu\b': 'chủ',
+    r'\btich\b': 'tịch',
+    r'\bvien\b': 'viện',
+    r'\bvien truong\b': 'viện trưởng',
+    r'\btruong\b': 'trưởng',
+    r'\bpho\b': 'phố',
+    r'\bgiam doc\b': 'giám đốc',
+    r'\bgiam\b': 'giám',
+    r'\bdoc\b': 'đốc',
+    r'\bcong\b': 'công',
+    r'\bty\b': 'ty',
+    r'\bso\b': 'sở',
+    r'\bubnd\b': 'UBND',
+    r'\bcong an\b': 'công an',
+    r'\btu phap\b': 'tư pháp',
+    r'\btu\b': 'tư',
+    r'\bphap\b': 'pháp',
+    r'\bhanh chinh\b': 'hành chính',
+    r'\bhanh\b': 'hành',
+    r'\bchinh\b': 'chính',
+    r'\bnoi\b': 'nội',
+    r'\bvu\b': 'vụ',
+    r'\bcuc\b': 'cục',
+    r'\bphong\b': 'phòng',
+    r'\bchi\b': 'chỉ',
+    r'\bthi\b': 'thị',
+    r'\bthi xa\b': 'thị xã',
+    r'\bxa\b': 'xã',
+    r'\bhuyen\b': 'huyện',
+    r'\btinh\b': 'tỉnh',
+    r'\bthanh pho\b': 'thành phố',
+    r'\bthanh\b': 'thành',
+    r'\bthuc hien\b': 'thực hiện',
+    r'\bthuc\b': 'thực',
+    r'\bchien\b': 'hiện',
+    r'\bkiem tra\b': 'kiểm tra',
+    r'\bkiem\b': 'kiểm',
+    r'\btra\b': 'tra',
+    r'\bxac nhan\b': 'xác nhận',
+    r'\bxac\b': 'xác',
+    r'\bnhan\b': 'nhận',
+    r'\bcap\b': 'cấp',
+    r'\bgiai quyet\b': 'giải quyết',
+    r'\bgiai\b': 'giải',
+})
+
+OLD_PUNCTUATION_RULES = {
+    r'\.\s*\.': '.',
+    r',\s*,': ',',
+    r'\s+\.': '.',
+    r'\.\s+': '. ',
+    r'\s+': ' ',
+    r'\s+([.,;:!?])': r'\1',
+}
+
+SAMPLES = [
+    'toi khong co   tien .',
+    'KHONG duoc di truoc , , sau nam 2020',
+    'Quyet dinh cua Chu tich UBND tinh',
+    'quyet  dinh so 12/QD-ubnd',
+    'Giam doc So Tu phap thuc hien kiem tra ho so..',
+    'vien truong Vien kiem sat huyen',
+    'Thi Xa va thanh pho, thi xa ven bien',
+    'giai quyet dinh ky cho cong an xa',
+    'chien luoc hanh chinh\nnoi vu cuc phong',
+    'quyet\ndinh va thuc hien xac nhan cap tren',
+    'Việt Nam, ngày 01 thang 02 nam 2024',
+]
+
+
+def old_rule_based(text, word_rules):
+    for pattern, replacement in list(word_rules.items()) + list(OLD_PUNCTUATION_RULES.items()):
+        text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
+    return text
+
+
+def new_rule_based(engine, text):
+    return apply_punctuation_rules(engine.apply(text))
+
+
+@pytest.fixture(scope='module')
+def common_engine():
+    return WordRuleEngine.from_files('vi_common.tsv')
+
+
+@pytest.fixture(scope='module')
+def legal_engine():
+    return WordRuleEngine.from_files('vi_common.tsv', 'vi_legal.tsv')
+
+
+class RecordingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+@pytest.fixture
+def rule_warnings():
+    """Cảnh báo của rule_engine - handler gắn thẳng vào logger (logger 'ocr' tắt propagate sau configure_logging)"""
+    logger = logging.getLogger('ocr.rule_engine')
+    handler = RecordingHandler()
+    logger.addHandler(handler)
+    yield handler.messages
+    logger.removeHandler(handler)
+
+
+def test_shipped_files_cover_old_tables(common_engine, legal_engine):
+    assert len(common_engine) == len(OLD_COMMON_RULES)
+    assert len(legal_engine) == len(OLD_COMPREHENSIVE_RULES)
+
+
+def test_shipped_files_load_without_warnings(rule_warnings):
+    load_word_rules(f"{RULES_DIR}/vi_common.tsv", f"{RULES_DIR}/vi_legal.tsv")
+    assert rule_warnings == []
+
+
+@pytest.mark.parametrize('text', SAMPLES)
+def test_matches_old_common_rules(common_engine, text):
+    assert new_rule_based(common_engine, text) == old_rule_based(text, OLD_COMMON_RULES)
+
+
+@pytest.mark.parametrize('text', SAMPLES)
+def test_matches_old_comprehensive_rules(legal_engine, text):
+    assert new_rule_based(legal_engine, text) == old_rule_based(text, OLD_COMPREHENSIVE_RULES)
+
+
+def test_matches_old_rules_on_random_text(legal_engine):
+    rng = random.Random(15)
+    words = sorted({word for pattern in OLD_COMPREHENSIVE_RULES for word in pattern[2:-2].split(' ')})
+    words += ['an', 'hien', 'viec', 'luoc', 'Việt', 'Nam', '2024', 'co_so', 'x1']
+    separators = [' ', ' ', ' ', '  ', ', ', '. ', '\n', '-']
+    for _ in range(300):
+        parts = []
+        for _ in range(rng.randint(1, 12)):
+            word = rng.choice(words)
+            parts.append(rng.choice([word, word.upper(), word.capitalize()]))
+            parts.append(rng.choice(separators))
+        text = ''.join(parts)
+        assert new_rule_based(legal_engine, text) == old_rule_based(text, OLD_COMPREHENSIVE_RULES), text
+
+
+def test_multi_word_rules_longest_match(legal_engine):
+    assert legal_engine.apply('thuc hien') == 'thực hiện'       # 'hien' không có rule riêng
+    assert legal_engine.apply('thuc  hien') == 'thực  hien'     # Cụm từ cần đúng một dấu cách
+    assert legal_engine.apply('thuc\nhien') == 'thực\nhien'
+    assert legal_engine.apply('cong an tinh') == 'công an tỉnh'
+    assert legal_engine.apply('giai quyet dinh') == 'giải quyết định'
+
+
+def test_case_insensitive_match_uses_table_value(legal_engine):
+    assert legal_engine.apply('Khong KHONG khong') == 'không không không'
+    assert legal_engine.apply('Quyet Dinh') == 'quyết định'
+    assert legal_engine.apply('ubnd Ubnd') == 'UBND UBND'
+
+
+def test_chien_rule_kept(legal_engine, common_engine):
+    assert legal_engine.apply('chien luoc, Chien') == 'hiện luoc, hiện'
+    assert common_engine.apply('chien') == 'chien'
+
+
+def test_only_whole_words_replaced(legal_engine):
+    assert legal_engine.apply('cong_ty khongco coi tinh1') == 'cong_ty khongco coi tinh1'
+    assert legal_engine.apply('Việt Nam') == 'Việt năm'  # Như regex cũ: \bnam\b khớp cả "Nam"
+
+
+def test_duplicate_and_invalid_rules_warn(tmp_path, rule_warnings):
+    path = tmp_path / 'extra.tsv'
+    path.write_text('# ghi chú\nkhong\tkhông\nkhong\tkhong\nchi mot cot\n\nKhong  Co\tkhông có\n', encoding='utf-8')
+    rules = load_word_rules(str(path))
+    assert rules == {'khong': 'khong', 'khong co': 'không có'}
+    assert len(rule_warnings) == 2
+    assert 'trùng' in rule_warnings[0] and 'không hợp lệ' in rule_warnings[1]
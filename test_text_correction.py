@@ -0,0 +1,194 @@
+"""
+Test sửa chính tả theo batch của VietnameseTextCorrector (_correct_sentences / correct_long_text)
+Tokenizer / model được thay bằng bản giả lập (1 từ = 1 token, "model" sửa từng từ theo FIXES và bỏ qua padding
+theo attention_mask) - không cần torch/transformers hay tải model
+Chạy: python -m pytest -q test_text_correction.py
+"""
+
+import contextlib
+import random
+import types
+
+import pytest
+
+import text_correction
+from text_correction import VietnameseTextCorrector
+
+FIXES = {'toi': 'tôi', 'khong': 'không', 'cong': 'công', 'hoa': 'hòa', 'nguoi': 'người', 'dan': 'dân',
+         'luat': 'luật', 'dieu': 'điều'}
+WORDS = ['toi', 'khong', 'cong', 'hoa', 'nguoi', 'dan', 'luat', 'dieu', 'so', 'mot', 'hai', 'ba']
+PAD_ID = 0
+
+
+class FakeEncoding(dict):
+    def to(self, device):
+        return self
+
+
+class FakeTokenizer:
+    """1 từ (tách theo khoảng trắng) = 1 token; padding bên phải bằng PAD_ID"""
+
+    pad_token_id = PAD_ID
+    eos_token_id = 1
+
+    def __init__(self):
+        self.vocab = {}
+        self.words = {PAD_ID: '<pad>', 1: '</s>'}
+
+    def _ids(self, text, truncation=False, max_length=None):
+        ids = []
+        for word in text.split():
+            if word not in self.vocab:
+                self.vocab[word] = len(self.words)
+                self.words[self.vocab[word]] = word
+            ids.append(self.vocab[word])
+        return ids[:max_length] if truncation and max_length else ids
+
+    def __call__(self, texts, return_tensors=None, truncation=False, max_length=None, padding=False):
+        if isinstance(texts, str):
+            return FakeEncoding(input_ids=self._ids(texts, truncation, max_length))
+        rows = [self._ids(text, truncation, max_length) for text in texts]
+        width = max(len(row) for row in rows) if padding else 0
+        return FakeEncoding(
+            input_ids=[row + [PAD_ID] * (width - len(row)) for row in rows],
+            attention_mask=[[1] * len(row) + [0] * (width - len(row)) for row in rows],
+        )
+
+    def encode(self, text, add_special_tokens=True):
+        return self._ids(text)
+
+    def decode(self, ids, skip_special_tokens=False):
+        return ' '.join(self.words[i] for i in ids if not (skip_special_tokens and i in (PAD_ID, 1)))
+
+    def batch_decode(self, outputs, skip_special_tokens=False):
+        return [self.decode(ids, skip_special_tokens) for ids in outputs]
+
+
+class FakeModel:
+    """Sửa từng từ theo FIXES; chỉ đọc token có attention_mask = 1, ghi lại độ dài các câu của mỗi batch"""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.batches = []
+
+    def generate(self, input_ids, attention_mask, **kwargs):
+        assert kwargs['pad_token_id'] == PAD_ID
+        assert len(set(len(row) for row in input_ids)) == 1  # Đã pad về cùng độ dài
+        lengths = [sum(mask) for mask in attention_mask]
+        self.batches.append(lengths)
+        outputs = []
+        for row, length in zip(input_ids, lengths):
+            words = [FIXES.get(self.tokenizer.words[i], self.tokenizer.words[i]) for i in row[:length]]
+            outputs.append(self.tokenizer._ids(' '.join(words)) + [1, PAD_ID, PAD_ID])
+        return outputs
+
+
+@pytest.fixture
+def corrector(monkeypatch):
+    monkeypatch.setattr(text_correction, 'torch', types.SimpleNamespace(no_grad=contextlib.nullcontext))
+    monkeypatch.setattr(text_correction, 'TORCH_AVAILABLE', True)
+    instance = VietnameseTextCorrector()
+    instance.tokenizer = FakeTokenizer()
+    instance.model = FakeModel(instance.tokenizer)
+    instance.device = 'cpu'
+    instance.initialized = True
+    return instance
+
+
+def fix_sentence(sentence):
+    return ' '.join(FIXES.get(word, word) for word in sentence.split())
+
+
+def random_sentence(rng, length):
+    return ' '.join(rng.choice(WORDS) for _ in range(length))
+
+
+def baseline_long_text(corrector, text):
+    """correct_long_text trước khi sửa theo batch: correct_text (từng câu một) cho từng dòng / câu của dòng dài"""
+    def correct_text(part):
+        return '\n'.join(fix_sentence(sentence) for sentence in corrector._split_into_sentences(part))
+
+    corrected_lines = []
+    for line in text.split('\n'):
+        if not line.strip():
+            corrected_lines.append(line)
+        elif len(line) > 200:
+            parts = [sentence for sentence in corrector._split_into_sentences(line) if sentence.strip()]
+            corrected_lines.append(' '.join(correct_text(part) for part in parts))
+        else:
+            corrected_lines.append(correct_text(line))
+    return '\n'.join(corrected_lines)
+
+
+def test_correct_sentences_keeps_input_order(corrector):
+    rng = random.Random(7)
+    sentences = [random_sentence(rng, rng.randint(1, 20)) for _ in range(60)]
+    sentences[5] = ''
+    sentences[17] = '   '
+    assert corrector._correct_sentences(sentences) == [
+        fix_sentence(sentence) if sentence.strip() else sentence for sentence in sentences
+    ]
+
+
+def test_correct_sentences_buckets_across_boundaries(corrector):
+    # Độ dài 3..9 token với bucket_width=4 -> bucket 0 (3), 1 (4-7), 2 (8-9); bucket 1 có 20 câu > batch 16
+    lengths = [3] * 2 + [4, 5, 6, 7] * 5 + [8, 9]
+    rng = random.Random(3)
+    rng.shuffle(lengths)
+    sentences = [random_sentence(rng, length) for length in lengths]
+
+    corrected = corrector._correct_sentences(sentences, batch_size=16, bucket_width=4)
+
+    assert corrected == [fix_sentence(sentence) for sentence in sentences]
+    batches = corrector.model.batches
+    assert sorted(len(batch) for batch in batches) == [2, 2, 4, 16]
+    for batch in batches:
+        assert len(set(length // 4 for length in batch)) == 1  # Mỗi batch chỉ một bucket
+    assert sum(len(batch) for batch in batches) == len(sentences)
+
+
+def test_correct_sentences_truncates_to_max_length(corrector):
+    sentences = [random_sentence(random.Random(1), 12), 'toi khong']
+    corrected = corrector._correct_sentences(sentences, max_length=8, bucket_width=4)
+    assert corrected[0] == fix_sentence(' '.join(sentences[0].split()[:8]))
+    assert corrected[1] == 'tôi không'
+    assert sorted(length for batch in corrector.model.batches for length in batch) == [2, 8]
+
+
+def test_failed_batch_keeps_original_sentences(corrector, monkeypatch):
+    generate = corrector.model.generate
+
+    def flaky_generate(input_ids, attention_mask, **kwargs):
+        if any(sum(mask) >= 8 for mask in attention_mask):
+            raise RuntimeError('out of memory')
+        return generate(input_ids, attention_mask, **kwargs)
+
+    monkeypatch.setattr(corrector.model, 'generate', flaky_generate)
+    sentences = ['toi khong', random_sentence(random.Random(2), 9), 'nguoi dan']
+    assert corrector._correct_sentences(sentences) == ['tôi không', sentences[1], 'người dân']
+
+
+def test_correct_long_text_matches_per_sentence_baseline(corrector):
+    rng = random.Random(11)
+    long_line = '. '.join(random_sentence(rng, rng.randint(3, 15)) for _ in range(12)) + '.'
+    assert len(long_line) > 200
+    text = '\n'.join([
+        'cong hoa xa hoi chu nghia',
+        '',
+        long_line,
+        'dieu 1. toi khong biet! nguoi dan hoi? luat so hai',
+        '   ',
+        random_sentence(rng, 30),
+        'toi',
+    ])
+
+    assert corrector.correct_long_text(text) == baseline_long_text(corrector, text)
+    # Cả trang sửa theo batch: ít lần generate hơn số câu
+    sentence_count = sum(len(batch) for batch in corrector.model.batches)
+    assert len(corrector.model.batches) < sentence_count
+
+
+def test_correct_text_matches_per_sentence(corrector):
+    text = 'dieu 1. toi khong biet!\nnguoi dan hoi? cong hoa'
+    expected = '\n'.join(fix_sentence(sentence) for sentence in corrector._split_into_sentences(text))
+    assert corrector.correct_text(text) == expected
@@ -4,6 +4,7 @@ Sử dụng ProtonX Legal Text Correction model để chỉnh sửa văn bản s
 Model: protonx-models/protonx-legal-tc
 """
 
+import os
 import re
 
 # Optional imports - không fail nếu không có torch/transformers
@@ -30,19 +31,61 @@ except Exception as e:
     print(f"   Error: {str(e)}")
     TORCH_AVAILABLE = False
 
+def _load_torch_model(model_path, device, local_files_only=False):
+    """PyTorch full precision (mặc định)"""
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_path, local_files_only=local_files_only)
+    model.to(device)
+    model.eval()
+    return model
+
+def _load_int8_model(model_path, device, local_files_only=False):
+    """PyTorch + dynamic int8 quantization cho các lớp Linear (chỉ CPU) - nhẹ hơn ~2-4 lần, nhanh hơn trên CPU"""
+    if device.type != 'cpu':
+        raise ValueError("Backend int8 (dynamic quantization) chỉ chạy trên CPU")
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_path, local_files_only=local_files_only)
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def _load_onnx_model(model_path, device, local_files_only=False):
+    """
+    ONNX Runtime qua optimum (encoder/decoder đã export)
+    model_path chứa sẵn file .onnx -> load trực tiếp; chưa có -> export từ checkpoint PyTorch khi load
+    Export trước một lần: optimum-cli export onnx --model <model_path> --task text2text-generation <onnx_dir>
+    """
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+    has_onnx = os.path.isdir(model_path) and any(name.endswith('.onnx') for name in os.listdir(model_path))
+    provider = 'CUDAExecutionProvider' if device.type == 'cuda' else 'CPUExecutionProvider'
+    return ORTModelForSeq2SeqLM.from_pretrained(
+        model_path,
+        export=not has_onnx,
+        provider=provider,
+        local_files_only=local_files_only
+    )
+
+# Backend inference - chọn qua tham số backend / env TEXT_CORRECTION_BACKEND
+MODEL_BACKENDS = {
+    'torch': _load_torch_model,
+    'int8': _load_int8_model,
+    'onnx': _load_onnx_model,
+}
+
 class VietnameseTextCorrector:
     """Vietnamese Text Corrector using ProtonX Legal TC model"""
     
-    def __init__(self, model_path="protonx-models/protonx-legal-tc", use_gpu=False):
+    def __init__(self, model_path="protonx-models/protonx-legal-tc", use_gpu=False, backend="torch"):
         """
         Initialize the text correction model
         
         Args:
-            model_path: Hugging Face model path
+            model_path: Hugging Face model path hoặc thư mục local (local -> không cần internet)
             use_gpu: Use GPU if available
+            backend: 'torch' (mặc định), 'int8' (dynamic quantization, CPU) hoặc 'onnx' (ONNX Runtime)
         """
+        if backend not in MODEL_BACKENDS:
+            raise ValueError(f"Backend không hợp lệ: {backend} (hỗ trợ: {', '.join(MODEL_BACKENDS)})")
         self.model_path = model_path
         self.use_gpu = use_gpu
+        self.backend = backend
         self.model = None
         self.tokenizer = None
         self.device = None
@@ -62,7 +105,11 @@ class VietnameseTextCorrector:
         try:
             print("🔄 Đang tải ProtonX Text Correction model...")
             print(f"   Model: {self.model_path}")
-            print("   ⚠️  Lần đầu tiên sẽ download model (~500MB-1GB), cần internet!")
+            print(f"   Backend: {self.backend}")
+            # Thư mục local -> chỉ đọc file local, không gọi network
+            local_files_only = os.path.isdir(self.model_path)
+            if not local_files_only:
+                print("   ⚠️  Lần đầu tiên sẽ download model (~500MB-1GB), cần internet!")
             
             # Set device
             self.device = torch.device("cuda" if (self.use_gpu and torch.cuda.is_available()) else "cpu")
@@ -70,19 +117,13 @@ class VietnameseTextCorrector:
             
             # Load tokenizer
             print("   → Đang tải tokenizer...")
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_path, local_files_only=local_files_only)
             print("   ✅ Tokenizer đã tải xong")
             
-            # Load model
+            # Load model theo backend (đã chuyển sang device)
             print("   → Đang tải model (có thể mất vài phút)...")
-            self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_path)
-            print("   ✅ Model đã tải xong")
-            
-            # Move to device
-            print(f"   → Đang chuyển model sang {self.device}...")
-            self.model.to(self.device)
-            self.model.eval()
-            print(f"   ✅ Model đã chuyển sang {self.device}")
+            self.model = MODEL_BACKENDS[self.backend](self.model_path, self.device, local_files_only=local_files_only)
+            print(f"   ✅ Model đã tải xong ({self.backend}, {self.device})")
             
             self.initialized = True
             print("✅ ProtonX Text Correction model đã sẵn sàng!")
@@ -131,43 +172,10 @@ class VietnameseTextCorrector:
             # Split text into sentences/chunks if too long
             # Model max length is 128 tokens
             sentences = self._split_into_sentences(text)
-            print(f"📝 Đã tách thành {len(sentences)} câu")
+            print(f"📝 Đã tách thành {len(sentences)} câu, đang sửa theo batch...")
             
-            corrected_parts = []
-            
-            for idx, sentence in enumerate(sentences):
-                if not sentence.strip():
-                    corrected_parts.append(sentence)
-                    continue
-                
-                print(f"   → Đang sửa câu {idx + 1}/{len(sentences)}: {sentence[:50]}...")
-                
-                # Truncate if too long (max 128 tokens)
-                inputs = self.tokenizer(
-                    sentence,
-                    return_tensors="pt",
-                    truncation=True,
-                    max_length=max_length,
-                    padding=True
-                ).to(self.device)
-                
-                # Generate corrected text
-                with torch.no_grad():
-                    outputs = self.model.generate(
-                        **inputs,
-                        num_beams=10,
-                        max_new_tokens=max_length,
-                        length_penalty=1.0,
-                        early_stopping=True,
-                        repetition_penalty=1.2,
-                        no_repeat_ngram_size=2,
-                        pad_token_id=self.tokenizer.pad_token_id,
-                        eos_token_id=self.tokenizer.eos_token_id,
-                    )
-                
-                corrected = self.tokenizer.decode(outputs[0], skip_special_tokens=True)
-                print(f"      ✅ Đã sửa: {corrected[:50]}...")
-                corrected_parts.append(corrected)
+            # Sửa tất cả câu theo batch (nhóm theo độ dài token) thay vì generate từng câu
+            corrected_parts = self._correct_sentences(sentences, max_length=max_length)
             
             # Join corrected parts
             corrected_text = "\n".join(corrected_parts)
@@ -184,6 +192,74 @@ class VietnameseTextCorrector:
             traceback.print_exc()
             return text  # Return original text on error
     
+    def _generation_kwargs(self, max_length):
+        """Tham số beam search (dùng chung cho generate từng câu và theo batch)"""
+        return dict(
+            num_beams=10,
+            max_new_tokens=max_length,
+            length_penalty=1.0,
+            early_stopping=True,
+            repetition_penalty=1.2,
+            no_repeat_ngram_size=2,
+            pad_token_id=self.tokenizer.pad_token_id,
+            eos_token_id=self.tokenizer.eos_token_id,
+        )
+    
+    def _generate_batch(self, sentences, max_length=128):
+        """Generate cho một batch câu (padding bên phải + attention_mask)"""
+        inputs = self.tokenizer(
+            sentences,
+            return_tensors="pt",
+            truncation=True,
+            max_length=max_length,
+            padding=True
+        ).to(self.device)
+        
+        with torch.no_grad():
+            outputs = self.model.generate(**inputs, **self._generation_kwargs(max_length))
+        
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+    
+    def _correct_sentences(self, sentences, max_length=128, batch_size=16, bucket_width=4):
+        """
+        Sửa list câu theo batch - trả về list câu đã sửa cùng thứ tự
+        
+        Câu được nhóm theo số token (mỗi bucket rộng bucket_width token) để padding trong batch
+        ít nhất; attention_mask che phần padding nên kết quả từng câu giống generate riêng lẻ
+        Batch lỗi -> giữ nguyên các câu gốc của batch đó
+        
+        Args:
+            sentences: List câu (câu rỗng được giữ nguyên, không generate)
+            max_length: Số token tối đa (truncate input, giới hạn output)
+            batch_size: Số câu tối đa mỗi lần generate
+            bucket_width: Độ rộng bucket theo số token
+        """
+        results = list(sentences)
+        todo = [i for i, sentence in enumerate(sentences) if sentence and sentence.strip()]
+        if not todo:
+            return results
+        
+        # Nhóm theo độ dài token sau truncate
+        token_lengths = {
+            i: len(self.tokenizer(sentences[i], truncation=True, max_length=max_length)['input_ids'])
+            for i in todo
+        }
+        buckets = {}
+        for i in sorted(todo, key=lambda i: token_lengths[i]):
+            buckets.setdefault(token_lengths[i] // max(1, bucket_width), []).append(i)
+        
+        for bucket in buckets.values():
+            for start in range(0, len(bucket), batch_size):
+                batch = bucket[start:start + batch_size]
+                try:
+                    corrected = self._generate_batch([sentences[i] for i in batch], max_length=max_length)
+                    for i, corrected_sentence in zip(batch, corrected):
+                        results[i] = corrected_sentence
+                except Exception as e:
+                    print(f"      ⚠️  Lỗi khi sửa batch {len(batch)} câu: {str(e)}, giữ nguyên câu gốc")
+        
+        return results
+    
     def correct_long_text(self, text, chunk_size=128, overlap=20):
         """
         Correct long text by splitting into chunks và xử lý từng phần
@@ -219,44 +295,42 @@ class VietnameseTextCorrector:
             lines = text.split('\n')
             print(f"📝 Đã tách thành {len(lines)} dòng")
             
-            # Process each line (hoặc group of lines)
-            corrected_lines = []
+            # Lập kế hoạch: mỗi dòng -> các nhóm câu cần sửa (giống cách correct_text xử lý từng dòng),
+            # gom tất cả câu của cả trang để sửa theo batch một lần
+            all_sentences = []
+            line_plans = []
             
             for line_idx, line in enumerate(lines):
                 if not line.strip():
-                    corrected_lines.append(line)  # Giữ nguyên dòng trống
+                    line_plans.append(None)  # Giữ nguyên dòng trống
                     continue
                 
-                # Nếu dòng quá dài, chia nhỏ hơn
+                # Nếu dòng quá dài, chia nhỏ hơn thành các câu (nối lại bằng dấu cách)
                 if len(line) > 200:  # Nếu dòng quá 200 ký tự
                     print(f"   → Dòng {line_idx + 1} quá dài ({len(line)} chars), đang chia nhỏ...")
-                    
-                    # Chia dòng thành các câu nhỏ hơn
-                    sentences = self._split_into_sentences(line)
-                    corrected_line_parts = []
-                    
-                    for sentence in sentences:
-                        if not sentence.strip():
-                            continue
-                        
-                        # Sửa từng câu
-                        try:
-                            corrected_sentence = self.correct_text(sentence, max_length=chunk_size)
-                            corrected_line_parts.append(corrected_sentence)
-                        except Exception as e:
-                            print(f"      ⚠️  Lỗi khi sửa câu: {str(e)}")
-                            corrected_line_parts.append(sentence)  # Giữ nguyên nếu lỗi
-                    
-                    corrected_line = " ".join(corrected_line_parts)
-                    corrected_lines.append(corrected_line)
+                    parts = [sentence for sentence in self._split_into_sentences(line) if sentence.strip()]
                 else:
                     # Dòng ngắn, sửa trực tiếp
-                    try:
-                        corrected_line = self.correct_text(line, max_length=chunk_size)
-                        corrected_lines.append(corrected_line)
-                    except Exception as e:
-                        print(f"   ⚠️  Lỗi khi sửa dòng {line_idx + 1}: {str(e)}")
-                        corrected_lines.append(line)  # Giữ nguyên nếu lỗi
+                    parts = [line]
+                
+                part_indices = []
+                for part in parts:
+                    sentences = self._split_into_sentences(part)
+                    part_indices.append(list(range(len(all_sentences), len(all_sentences) + len(sentences))))
+                    all_sentences.extend(sentences)
+                line_plans.append(part_indices)
+            
+            print(f"📝 {len(all_sentences)} câu, đang sửa theo batch...")
+            corrected_sentences = self._correct_sentences(all_sentences, max_length=chunk_size)
+            
+            # Ghép lại theo kế hoạch
+            corrected_lines = []
+            for line, part_indices in zip(lines, line_plans):
+                if part_indices is None:
+                    corrected_lines.append(line)
+                    continue
+                corrected_parts = ["\n".join(corrected_sentences[i] for i in indices) for indices in part_indices]
+                corrected_lines.append(" ".join(corrected_parts))
             
             result = "\n".join(corrected_lines)
             print(f"✅ Đã xử lý xong {len(corrected_lines)} dòng")
@@ -324,11 +398,18 @@ class VietnameseTextCorrector:
 # Global instance (lazy loading)
 _text_corrector = None
 
-def get_text_corrector(use_gpu=False, model_path="protonx-models/protonx-legal-tc"):
-    """Get or create text corrector instance (singleton)"""
+def get_text_corrector(use_gpu=False, model_path=None, backend=None):
+    """
+    Get or create text corrector instance (singleton)
+    Mặc định lấy model/backend từ env TEXT_CORRECTION_MODEL_PATH / TEXT_CORRECTION_BACKEND
+    """
     global _text_corrector
     if _text_corrector is None:
-        _text_corrector = VietnameseTextCorrector(model_path=model_path, use_gpu=use_gpu)
+        _text_corrector = VietnameseTextCorrector(
+            model_path=model_path or os.getenv('TEXT_CORRECTION_MODEL_PATH', 'protonx-models/protonx-legal-tc'),
+            use_gpu=use_gpu,
+            backend=backend or os.getenv('TEXT_CORRECTION_BACKEND', 'torch').lower()
+        )
     return _text_corrector
 
 def correct_vietnamese_text(text, use_correction=True, use_gpu=False):
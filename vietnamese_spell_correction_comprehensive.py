@@ -3,15 +3,22 @@ Vietnamese Spell Correction - Comprehensive Solution
 Tổng hợp TẤT CẢ các giải pháp sửa chính tả tiếng Việt chuyên nghiệp
 """
 
-import re
 import os
 from typing import Optional, List, Dict
 from enum import Enum
 from dotenv import load_dotenv
 
+from rule_engine import WordRuleEngine, apply_punctuation_rules, RULES_DIR
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Rule từ thường gặp + từ ngữ pháp lý, hành chính - build một lần khi import
+_WORD_RULES = WordRuleEngine.from_files('vi_common.tsv', 'vi_legal.tsv')
+
+# Lexicon index khôi phục dấu (build bằng build_lexicon.py) - không có file thì bỏ qua layer này
+DEFAULT_LEXICON_PATH = os.path.join(RULES_DIR, 'vi_lexicon.idx')
+
 class CorrectionMethod(Enum):
     """Các phương pháp correction có sẵn"""
     RULE_BASED = "rule"
@@ -27,6 +34,7 @@ class VietnameseSpellCorrector:
     
     def __init__(self):
         self.methods_available = {}
+        self.diacritic_restorer = None
         self._init_all_methods()
     
     def _init_all_methods(self):
@@ -36,6 +44,9 @@ class VietnameseSpellCorrector:
         self.methods_available['rule'] = True
         print("✅ Rule-based correction: Available")
         
+        # Method 1b: Lexicon + bigram khôi phục dấu (local, nhanh - nếu có index)
+        self.methods_available['lexicon'] = self._check_lexicon()
+        
         # Method 2: ProtonX Model
         self.methods_available['protonx'] = self._check_protonx()
         
@@ -47,6 +58,20 @@ class VietnameseSpellCorrector:
         
         print(f"\n📊 Available methods: {[k for k, v in self.methods_available.items() if v]}")
     
+    def _check_lexicon(self) -> bool:
+        """Load lexicon index (mmap) nếu có - path từ env VIETNAMESE_LEXICON_PATH"""
+        path = os.getenv('VIETNAMESE_LEXICON_PATH', DEFAULT_LEXICON_PATH)
+        if not os.path.exists(path):
+            return False
+        try:
+            from lexicon_index import LexiconIndex, DiacriticRestorer
+            self.diacritic_restorer = DiacriticRestorer(LexiconIndex(path))
+            print(f"✅ Lexicon diacritic restoration: Available ({len(self.diacritic_restorer.index):,} key)")
+            return True
+        except Exception as e:
+            print(f"⚠️  Lexicon index: Not available ({str(e)[:50]})")
+        return False
+    
     def _check_protonx(self) -> bool:
         """Check if ProtonX model is available"""
         try:
@@ -102,6 +127,10 @@ class VietnameseSpellCorrector:
         # Layer 1: Rule-based (luôn chạy để fix lỗi dễ và nhanh)
         corrected = self._rule_based_correction(corrected, aggressive=aggressive)
         
+        # Layer 1b: Khôi phục dấu theo lexicon + ngữ cảnh bigram (local, nếu có index)
+        if self.methods_available.get('lexicon'):
+            corrected = self._lexicon_correction(corrected)
+        
         # Layer 2: ML Model hoặc GPT (fix lỗi phức tạp)
         if method == "protonx" and self.methods_available.get('protonx'):
             corrected = self._protonx_correction(corrected)
@@ -130,102 +159,12 @@ class VietnameseSpellCorrector:
         if not text:
             return text
         
-        # Comprehensive Vietnamese word dictionary
-        # Các từ thường gặp trong văn bản pháp lý, hành chính
-        corrections = {
-            # Từ thường gặp - mất dấu
-            r'\bkhong\b': 'không',
-            r'\bco\b': 'có',
-            r'\btoi\b': 'tôi',
-            r'\bdoi\b': 'đôi',
-            r'\bdao\b': 'đào',
-            r'\bdoan\b': 'đoàn',
-            r'\bdoi\b': 'đội',
-            r'\bvay\b': 'vậy',
-            r'\bday\b': 'đây',
-            r'\bnay\b': 'này',
-            r'\bvoi\b': 'với',
-            r'\bden\b': 'đến',
-            r'\bduoc\b': 'được',
-            r'\bduoi\b': 'dưới',
-            r'\btren\b': 'trên',
-            r'\bgiua\b': 'giữa',
-            r'\bngoai\b': 'ngoài',
-            r'\btruoc\b': 'trước',
-            r'\bsau\b': 'sau',
-            r'\bnam\b': 'năm',
-            r'\bthang\b': 'tháng',
-            r'\bngay\b': 'ngày',
-            r'\bgio\b': 'giờ',
-            r'\bphut\b': 'phút',
-            
-            # Từ pháp lý
-            r'\bquyet dinh\b': 'quyết định',
-            r'\bquyet\b': 'quyết',
-            r'\bdinh\b': 'định',
-            r'\bchu\b': 'chủ',
-            r'\btich\b': 'tịch',
-            r'\bvien\b': 'viện',
-            r'\bvien truong\b': 'viện trưởng',
-            r'\btruong\b': 'trưởng',
-            r'\bpho\b': 'phó',
-            r'\bgiam doc\b': 'giám đốc',
-            r'\bgiam\b': 'giám',
-            r'\bdoc\b': 'đốc',
-            r'\bcong\b': 'công',
-            r'\bty\b': 'ty',
-            r'\bso\b': 'sở',
-            r'\bubnd\b': 'UBND',
-            r'\bcong an\b': 'công an',
-            r'\btu phap\b': 'tư pháp',
-            r'\btu\b': 'tư',
-            r'\bphap\b': 'pháp',
-            r'\bhanh chinh\b': 'hành chính',
-            r'\bhanh\b': 'hành',
-            r'\bchinh\b': 'chính',
-            r'\bnoi\b': 'nội',
-            r'\bvu\b': 'vụ',
-            r'\bcuc\b': 'cục',
-            r'\bphong\b': 'phòng',
-            r'\bchi\b': 'chỉ',
-            r'\bthi\b': 'thị',
-            r'\bthi xa\b': 'thị xã',
-            r'\bxa\b': 'xã',
-            r'\bhuyen\b': 'huyện',
-            r'\btinh\b': 'tỉnh',
-            r'\bthanh pho\b': 'thành phố',
-            r'\bthanh\b': 'thành',
-            r'\bpho\b': 'phố',
-            
-            # Động từ thường gặp
-            r'\bthuc hien\b': 'thực hiện',
-            r'\bthuc\b': 'thực',
-            r'\bchien\b': 'hiện',
-            r'\bkiem tra\b': 'kiểm tra',
-            r'\bkiem\b': 'kiểm',
-            r'\btra\b': 'tra',
-            r'\bxac nhan\b': 'xác nhận',
-            r'\bxac\b': 'xác',
-            r'\bnhan\b': 'nhận',
-            r'\bcap\b': 'cấp',
-            r'\bgiai quyet\b': 'giải quyết',
-            r'\bgiai\b': 'giải',
-            r'\bquyet\b': 'quyết',
-            
-            # Dấu câu và spacing
-            r'\.\s*\.': '.',  # Double dots
-            r',\s*,': ',',    # Double commas
-            r'\s+\.': '.',    # Space before period
-            r'\.\s+': '. ',   # Space after period
-            r'\s+': ' ',      # Multiple spaces
-            r'\s+([.,;:!?])': r'\1',  # Space before punctuation
-        }
-        
-        corrected = text
+        # Comprehensive Vietnamese word dictionary (rules/vi_common.tsv + rules/vi_legal.tsv)
+        # Các từ thường gặp trong văn bản pháp lý, hành chính - áp dụng trong một lần quét
+        corrected = _WORD_RULES.apply(text)
         
-        # Apply corrections
-        for pattern, replacement in corrections.items():
-            corrected = re.sub(pattern, replacement, corrected, flags=re.IGNORECASE)
+        # Dấu câu và spacing (regex compile sẵn)
+        corrected = apply_punctuation_rules(corrected)
         
         # Aggressive mode: Fix more patterns
         if aggressive:
@@ -245,6 +184,14 @@ class VietnameseSpellCorrector:
         # TODO: Add more aggressive patterns
         return text
     
+    def _lexicon_correction(self, text: str) -> str:
+        """Khôi phục dấu cho từ không dấu bằng lexicon index + bigram"""
+        try:
+            return self.diacritic_restorer.restore(text)
+        except Exception as e:
+            print(f"⚠️  Lexicon correction error: {str(e)}")
+            return text
+    
     def _protonx_correction(self, text: str) -> str:
         """ProtonX model correction"""
         try:
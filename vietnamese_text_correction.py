@@ -3,14 +3,18 @@ Vietnamese Text Correction - Multiple Solutions
 Tổng hợp các giải pháp sửa chính tả tiếng Việt cho OCR output
 """
 
-import re
 import os
 from typing import Optional, List
 from dotenv import load_dotenv
 
+from rule_engine import WordRuleEngine, apply_punctuation_rules
+
 # Load environment variables from .env file
 load_dotenv()
 
+# Rule sửa từ thường gặp bị mất dấu - build một lần khi import
+_WORD_RULES = WordRuleEngine.from_files('vi_common.tsv')
+
 class VietnameseTextCorrector:
     """
     Tổng hợp nhiều phương pháp sửa chính tả tiếng Việt
@@ -96,46 +100,11 @@ class VietnameseTextCorrector:
         if not text:
             return text
         
-        # Fix common OCR errors
-        corrections = {
-            # Fix mất dấu trong từ thường gặp
-            r'\bkhong\b': 'không',
-            r'\bco\b': 'có',
-            r'\btoi\b': 'tôi',
-            r'\bdoi\b': 'đôi',
-            r'\bdao\b': 'đào',
-            r'\bdoan\b': 'đoàn',
-            r'\bdoi\b': 'đội',
-            r'\bvay\b': 'vậy',
-            r'\bday\b': 'đây',
-            r'\bnay\b': 'này',
-            r'\bvoi\b': 'với',
-            r'\bden\b': 'đến',
-            r'\bduoc\b': 'được',
-            r'\bduoi\b': 'dưới',
-            r'\btren\b': 'trên',
-            r'\bgiua\b': 'giữa',
-            r'\bngoai\b': 'ngoài',
-            r'\btruoc\b': 'trước',
-            r'\bsau\b': 'sau',
-            r'\bnam\b': 'năm',
-            r'\bthang\b': 'tháng',
-            r'\bngay\b': 'ngày',
-            
-            # Fix dấu câu
-            r'\.\s*\.': '.',  # Double dots
-            r',\s*,': ',',    # Double commas
-            r'\s+\.': '.',    # Space before period
-            r'\.\s+': '. ',   # Space after period
-            
-            # Fix spacing
-            r'\s+': ' ',      # Multiple spaces
-            r'\s+([.,;:!?])': r'\1',  # Space before punctuation
-        }
+        # Layer từ: một lần quét với bảng rule đã load sẵn (rules/vi_common.tsv)
+        corrected = _WORD_RULES.apply(text)
         
-        corrected = text
-        for pattern, replacement in corrections.items():
-            corrected = re.sub(pattern, replacement, corrected, flags=re.IGNORECASE)
+        # Fix dấu câu và spacing (regex compile sẵn)
+        corrected = apply_punctuation_rules(corrected)
         
         return corrected
     